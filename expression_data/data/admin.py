@@ -5,9 +5,42 @@ All objects have a generic Admin interface.
 '''
 
 from django.contrib import admin
-from data.models import GeneExperimentData
+from data.models import GeneExperimentData, IsoformExperimentData, TSSGroupExperimentData, RankedGene, ExperimentSummary, ImportJob, Comparison
 
 class GeneExperimentDataAdmin(admin.ModelAdmin):
     '''Generic admin interface for :class:`~experiments.models.GeneExperimentData' objects.'''
     pass
-admin.site.register(GeneExperimentData, GeneExperimentDataAdmin)
\ No newline at end of file
+admin.site.register(GeneExperimentData, GeneExperimentDataAdmin)
+
+class IsoformExperimentDataAdmin(admin.ModelAdmin):
+    '''Generic admin interface for :class:`~data.models.IsoformExperimentData' objects.'''
+    pass
+admin.site.register(IsoformExperimentData, IsoformExperimentDataAdmin)
+
+class TSSGroupExperimentDataAdmin(admin.ModelAdmin):
+    '''Generic admin interface for :class:`~data.models.TSSGroupExperimentData' objects.'''
+    pass
+admin.site.register(TSSGroupExperimentData, TSSGroupExperimentDataAdmin)
+
+class ComparisonAdmin(admin.ModelAdmin):
+    '''Admin interface for :class:`~data.models.Comparison' objects.'''
+    list_display = ('__unicode__', 'experiment_type', 'experiment_id')
+admin.site.register(Comparison, ComparisonAdmin)
+
+class ImportJobAdmin(admin.ModelAdmin):
+    '''Admin interface for :class:`~data.models.ImportJob' objects, a failed job can be queued again by changing its status.'''
+    list_display = ('__unicode__', 'status', 'rows_processed', 'created', 'finished')
+    list_filter = ('status',)
+admin.site.register(ImportJob, ImportJobAdmin)
+
+class RankedGeneAdmin(admin.ModelAdmin):
+    '''Admin interface for :class:`~data.models.RankedGene' objects, these are computed from the data so they are only listed.'''
+    list_display = ('__unicode__', 'ranking', 'fold_change', 'q_value')
+    list_filter = ('ranking',)
+admin.site.register(RankedGene, RankedGeneAdmin)
+
+class ExperimentSummaryAdmin(admin.ModelAdmin):
+    '''Admin interface for :class:`~data.models.ExperimentSummary' objects, these are computed from the data so they are only listed.'''
+    list_display = ('__unicode__', 'genes', 'tested', 'significant_up', 'significant_down', 'stale', 'updated')
+    list_filter = ('stale',)
+admin.site.register(ExperimentSummary, ExperimentSummaryAdmin)
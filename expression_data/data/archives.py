@@ -0,0 +1,283 @@
+'''This package writes an experiment to a compact binary archive and reads it back, to move experiments between servers without importing the original files again.
+
+An archive holds the metadata of the experiment and its gene, isoform and TSS group data as typed columns, one array for each field:
+
+* float fields are little-endian 64 bit floats, with NULL stored as NaN, as the database does not store NaN.
+* boolean fields are one byte for each row.
+* text fields, including the gene, are fixed width UTF-8 byte strings, with a boolean column named after the field with .null added if any rows are NULL.
+* the comparison of each row is a little-endian 32 bit index into the list of comparisons of the experiment, or -1 for none.
+
+The file starts with **MAGIC**, the length of the header as a little-endian 64 bit integer and the header, a JSON object of:
+
+* **version**, the **VERSION** of the format.
+* **experiment**, the metadata of the experiment, see :func:`~data.archives.experiment_metadata`.
+* **comparisons**, the [sample_1, sample_2] names of each :class:`~data.models.Comparison`.
+* **tables**, for each of the **CUFFLINKS_DATA_TYPES** with data, the number of rows and the dtype, offset and length of each column.
+
+The columns follow the header uncompressed, each at an offset from the end of the header aligned to **ALIGNMENT** bytes,
+so an archive is read by mapping the columns into memory with numpy.memmap rather than parsing it.
+'''
+
+import datetime
+import json
+import struct
+
+import numpy
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+from data.models import Comparison, CUFFLINKS_DATA_TYPES
+from data.queries import stream_query, EXPERIMENT_TYPES
+from data.utilities import CUFFLINKS_FILES, write_gene_experiment_data
+from experiments.models import Sample, Manipulation, SequenceAlignmentSoftware, DifferentialExpressionSoftware, ReferenceGenomeAssembly
+from researchers.models import Researcher
+
+MAGIC = 'EXPDATA\x00'
+VERSION = 1
+ALIGNMENT = 64
+
+#The fields which identify each related object of an experiment, an existing object with these values is used when an archive is read.
+METADATA_KEYS = {
+    Sample: ('description', 'type', 'species'),
+    Manipulation: ('description',),
+    SequenceAlignmentSoftware: ('name', 'version'),
+    DifferentialExpressionSoftware: ('name', 'version'),
+    ReferenceGenomeAssembly: ('source', 'version', 'species'),
+}
+
+#The fields of an experiment which are set when it is saved rather than copied.
+AUTOMATIC_FIELDS = ('id', 'created', 'modified')
+
+def _aligned(offset):
+    '''This function rounds an offset up to a multiple of **ALIGNMENT**.'''
+
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _json_value(value):
+    '''This function returns a field value which can be written as JSON, dates as ISO 8601 strings.'''
+
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+def _object_dict(obj):
+    '''This function returns the field values of a related object of an experiment as a dictionary, without its primary key.'''
+
+    return dict((field.name, _json_value(getattr(obj, field.name))) for field in obj._meta.local_fields if not field.primary_key)
+
+def _matching_object(model, values):
+    '''This function returns the object of a model matching the **METADATA_KEYS** of a dictionary of field values, creating it from the values if there is none.'''
+
+    lookup = dict((name, values[name]) for name in METADATA_KEYS[model])
+    existing = list(model.objects.filter(**lookup).order_by('pk')[:1])
+    if existing:
+        return existing[0]
+    return model.objects.create(**values)
+
+def experiment_metadata(experiment):
+    '''This function returns the metadata of an experiment as a dictionary which can be written as JSON.
+
+    The dictionary has the type of the experiment, the value of each of its fields, the field values of its software, reference genome, samples and manipulations,
+    and the usernames of its researchers.
+    '''
+
+    metadata = {'type': ContentType.objects.get_for_model(experiment).model}
+    for field in experiment._meta.fields:
+        if field.name in AUTOMATIC_FIELDS:
+            continue
+        value = getattr(experiment, field.name)
+        if isinstance(field, models.ForeignKey):
+            value = value and _object_dict(value)
+        metadata[field.name] = _json_value(value)
+    for field in experiment._meta.many_to_many:
+        related = getattr(experiment, field.name).order_by('pk')
+        if field.rel.to is Researcher:
+            metadata[field.name] = list(related.values_list('user__username', flat=True))
+        else:
+            metadata[field.name] = [_object_dict(obj) for obj in related]
+    return metadata
+
+def create_experiment(metadata):
+    '''This function creates an experiment from the dictionary returned by :func:`~data.archives.experiment_metadata`.
+
+    Related objects are matched to existing objects by their **METADATA_KEYS**, or created.
+    Researchers are matched by username, and those without a user on this server are left out.
+    Raises a ValueError for an unknown type of experiment.
+    '''
+
+    if metadata.get('type') not in EXPERIMENT_TYPES:
+        raise ValueError("%s is not an experiment type" % metadata.get('type'))
+    experiment_model = ContentType.objects.get_by_natural_key('experiments', metadata['type']).model_class()
+    values = {}
+    for field in experiment_model._meta.fields:
+        if field.name in AUTOMATIC_FIELDS or metadata.get(field.name) is None:
+            continue
+        values[field.name] = metadata[field.name]
+        if isinstance(field, models.ForeignKey):
+            values[field.name] = _matching_object(field.rel.to, metadata[field.name])
+    experiment = experiment_model.objects.create(**values)
+    for field in experiment_model._meta.many_to_many:
+        if field.rel.to is Researcher:
+            related = Researcher.objects.filter(user__username__in=metadata.get(field.name) or [])
+        else:
+            related = [_matching_object(field.rel.to, values) for values in metadata.get(field.name) or []]
+        getattr(experiment, field.name).add(*related)
+    return experiment
+
+def _data_fields(model):
+    '''This function returns the fields of a data model which are stored as columns, all except the primary key and the experiment.'''
+
+    return [field for field in model._meta.local_fields if field.name not in ('id', 'experiment_type', 'experiment_id')]
+
+def _data_columns(model, experiment, comparisons):
+    '''This function reads the data of an experiment for a model as a dictionary of column names to arrays, described at the top of :mod:`data.archives`.
+
+    The comparisons are a dictionary of the primary key of each :class:`~data.models.Comparison` to its position in the archive.
+    The rows are read by :func:`~data.queries.stream_query` in the order of the gene.
+    '''
+
+    fields = _data_fields(model)
+    values = [[] for field in fields]
+    data = model.objects.for_experiment(experiment).order_by('gene', 'pk').values_list(*[field.attname for field in fields])
+    for rows in stream_query(data):
+        for column, column_values in zip(values, zip(*rows)):
+            column.extend(column_values)
+    columns = {}
+    for field, column in zip(fields, values):
+        if field.name == 'comparison':
+            columns[field.attname] = numpy.array([comparisons.get(value, -1) for value in column], dtype='<i4')
+        elif isinstance(field, models.FloatField):
+            columns[field.attname] = numpy.array([numpy.nan if value is None else value for value in column], dtype='<f8')
+        elif isinstance(field, models.BooleanField):
+            columns[field.attname] = numpy.array(column, dtype=numpy.bool_)
+        else:
+            columns[field.attname] = numpy.array([(value or u'').encode('utf-8') for value in column], dtype=str)
+            missing = numpy.array([value is None for value in column], dtype=numpy.bool_)
+            if missing.any():
+                columns[field.attname + '.null'] = missing
+    return columns
+
+def write_archive(experiment, outputfile):
+    '''This function writes an experiment, its metadata and its gene, isoform and TSS group data to an open file as an archive.
+
+    Returns a dictionary of each data type written to its number of rows.
+    '''
+
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    comparisons = Comparison.objects.filter(experiment_type=experiment_type, experiment_id=experiment.pk).order_by('pk')
+    positions = dict((comparison.pk, position) for position, comparison in enumerate(comparisons))
+    header = {
+        'version': VERSION,
+        'experiment': experiment_metadata(experiment),
+        'comparisons': [[comparison.sample_1, comparison.sample_2] for comparison in comparisons],
+        'tables': {},
+    }
+    arrays = []
+    offset = 0
+    for data_type, description in CUFFLINKS_DATA_TYPES:
+        model = CUFFLINKS_FILES[data_type][0]
+        columns = _data_columns(model, experiment, positions)
+        rows = len(columns['gene_id'])
+        if not rows:
+            continue
+        header['tables'][data_type] = {'rows': rows, 'columns': {}}
+        for name, array in sorted(columns.items()):
+            header['tables'][data_type]['columns'][name] = {'dtype': array.dtype.str, 'offset': offset, 'length': len(array)}
+            arrays.append((offset, array))
+            offset = _aligned(offset + array.nbytes)
+
+    rows = dict((data_type, table['rows']) for data_type, table in header['tables'].items())
+    header = json.dumps(header, sort_keys=True)
+    outputfile.write(MAGIC + struct.pack('<Q', len(header)) + header)
+    start = _aligned(len(MAGIC) + 8 + len(header))
+    position = len(MAGIC) + 8 + len(header)
+    for offset, array in arrays:
+        outputfile.write('\0' * (start + offset - position))
+        outputfile.write(array.tostring())
+        position = start + offset + array.nbytes
+    return rows
+
+def export_archive(experiment, filename):
+    '''This function writes an experiment to an archive file, see :func:`~data.archives.write_archive`.'''
+
+    with open(filename, 'wb') as outputfile:
+        return write_archive(experiment, outputfile)
+
+def read_archive(filename):
+    '''This function reads the header of an archive file and maps its columns into memory without reading them.
+
+    Returns the header and a dictionary of each data type to a dictionary of its column names to read only arrays.
+    Raises a ValueError if the file is not an archive of this version or is too short for its columns.
+    '''
+
+    with open(filename, 'rb') as inputfile:
+        start = inputfile.read(len(MAGIC) + 8)
+        if len(start) != len(MAGIC) + 8 or start[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not an experiment archive" % filename)
+        length = struct.unpack('<Q', start[len(MAGIC):])[0]
+        try:
+            header = json.loads(inputfile.read(length))
+        except ValueError:
+            raise ValueError("%s has an invalid header" % filename)
+    if header.get('version') != VERSION:
+        raise ValueError("%s is an archive of version %s, this server reads version %i" % (filename, header.get('version'), VERSION))
+    start = _aligned(len(MAGIC) + 8 + length)
+    tables = {}
+    for data_type, table in header['tables'].items():
+        tables[data_type] = {}
+        for name, column in table['columns'].items():
+            if column['length']:
+                array = numpy.memmap(filename, dtype=column['dtype'], mode='r', offset=start + column['offset'], shape=(column['length'],))
+            else:
+                array = numpy.zeros(0, dtype=column['dtype'])
+            tables[data_type][name] = array
+    return header, tables
+
+def _table_columns(model, columns, comparisons):
+    '''This function returns the mapped columns of a table of an archive as the columns of the fields of a model, which can be written by :func:`~data.utilities.write_gene_experiment_data`.
+
+    The comparisons are the primary keys of the :class:`~data.models.Comparison` objects created for the archive, in its order.
+    Text columns are decoded, the comparison positions replaced by primary keys and numeric columns used as they are mapped.
+    Raises a ValueError if a column of the model is missing.
+    '''
+
+    values = {}
+    for field in _data_fields(model):
+        if field.attname not in columns:
+            raise ValueError("The archive has no %s column for %s" % (field.attname, model._meta.verbose_name_plural))
+        column = columns[field.attname]
+        if field.name == 'comparison':
+            column = [comparisons[position] if position >= 0 else None for position in column.tolist()]
+        elif column.dtype.kind == 'S':
+            column = [value.decode('utf-8') for value in column.tolist()]
+            if field.attname + '.null' in columns:
+                column = [None if missing else value for value, missing in zip(column, columns[field.attname + '.null'].tolist())]
+        values[field.attname] = column
+    return values
+
+def import_archive(filename, progress=None):
+    '''This function creates a new experiment from an archive file, with its metadata and data.
+
+    The experiment is created with :func:`~data.archives.create_experiment` and its comparisons created.
+    The mapped columns of each table are written by :func:`~data.utilities.write_gene_experiment_data`, which inserts them in batches
+    and builds the columns, rankings and summary of the gene level data.
+    If a progress function is passed it is called with the number of rows processed so far in each table after each batch.
+    If any table cannot be written, the new experiment and any data written for it are removed.
+    Returns the experiment and a list of the result of each table.
+    '''
+
+    header, tables = read_archive(filename)
+    experiment = create_experiment(header['experiment'])
+    results = []
+    try:
+        comparisons = [Comparison.objects.create(experiment=experiment, sample_1=sample_1, sample_2=sample_2).pk for sample_1, sample_2 in header['comparisons']]
+        for data_type, description in CUFFLINKS_DATA_TYPES:
+            if data_type in tables:
+                model = CUFFLINKS_FILES[data_type][0]
+                result = write_gene_experiment_data(experiment, _table_columns(model, tables[data_type], comparisons), progress, model=model)
+                results.append("%s: %s" % (description, result))
+    except:
+        experiment.delete()
+        raise
+    return experiment, results
@@ -0,0 +1,169 @@
+'''This package measures the speed of the data importers, see the **benchmark_import** management command.
+
+Synthetic gene_exp.diff files are generated in the layout of **data/fixtures/sample_gene_exp.diff** by :func:`~data.benchmarks.synthetic_gene_exp_diff`.
+Each file is imported into a temporary :class:`~experiments.models.mRNASeqExperiment` by :func:`~data.utilities.cufflinks_gene_diff_import`,
+recording the time taken, rows per second, number of queries and peak memory.
+The data, experiment and synthetic genes are removed afterwards, but benchmarks are best run against a copy of the database.
+'''
+
+import math
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+
+import django
+from django.db import connection, connections, DEFAULT_DB_ALIAS
+from django.db.backends.util import CursorWrapper
+
+from data.utilities import cufflinks_gene_diff_import
+from experiments.models import mRNASeqExperiment
+from genes.models import Gene
+
+#The names of genes which are not in the database start with this prefix, so they can be removed after a benchmark.
+UNKNOWN_GENE_PREFIX = 'benchmark-gene-'
+
+CUFFLINKS_HEADER = ('test_id', 'gene_id', 'gene', 'locus', 'sample_1', 'sample_2', 'status', 'value_1', 'value_2',
+    'log2(fold_change)', 'test_stat', 'p_value', 'q_value', 'significant')
+
+def synthetic_gene_exp_diff(rows, unknown_fraction=0.1, known_genes=(), seed=0):
+    '''This generator yields the lines of a synthetic gene_exp.diff file with the given number of rows.
+
+    Gene names are taken from known_genes, except for a share of unknown_fraction of the rows which get new gene names.
+    About 10% of rows are NOTEST and 5% of the tested rows are significant.
+    The same seed always generates the same file.
+    '''
+
+    generator = random.Random(seed)
+    known_genes = list(known_genes)
+    yield '\t'.join(CUFFLINKS_HEADER) + '\n'
+    for row in range(rows):
+        if known_genes and generator.random() >= unknown_fraction:
+            gene = known_genes[row % len(known_genes)]
+        else:
+            gene = '%s%i' % (UNKNOWN_GENE_PREFIX, row)
+        start = generator.randint(1, 190000000)
+        if generator.random() < 0.1:
+            status, value_1, value_2, fold_change, test_stat, p_value, q_value = 'NOTEST', 0, 0, 0, 0, 1, 1
+        else:
+            status = 'OK'
+            value_1 = generator.lognormvariate(2, 2)
+            fold_change = generator.gauss(0, 1)
+            value_2 = value_1 * 2 ** fold_change
+            p_value = generator.random() ** 3
+            q_value = min(1, p_value * 10)
+            test_stat = generator.gauss(0, 2)
+        yield '\t'.join([
+            'XLOC_%06i' % row, 'XLOC_%06i' % row, gene, '%i:%i-%i' % (row % 19 + 1, start, start + 5000),
+            'Control', 'Knockdown', status, '%g' % value_1, '%g' % value_2, '%g' % fold_change, '%g' % test_stat,
+            '%g' % p_value, '%g' % q_value, 'yes' if q_value < 0.05 else 'no']).encode('utf-8') + '\n'
+
+class CountingCursorWrapper(CursorWrapper):
+    '''This cursor wrapper counts the statements it runs in the count attribute of its counter, without keeping their SQL and parameters as the debug cursor does.'''
+
+    def __init__(self, cursor, db, counter):
+        super(CountingCursorWrapper, self).__init__(cursor, db)
+        self.counter = counter
+
+    def execute(self, sql, params=()):
+        self.counter.count += 1
+        return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.counter.count += 1
+        return self.cursor.executemany(sql, param_list)
+
+class QueryCounter(object):
+    '''This context manager counts the queries run on a database connection while it is active, in its count attribute, by default on the default database.
+
+    Unlike connection.queries the SQL is not kept, so counting does not add to the time and memory of a benchmark.
+    '''
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.count = 0
+
+    def __enter__(self):
+        self.use_debug_cursor = self.connection.use_debug_cursor
+        self.connection.make_debug_cursor = lambda cursor: CountingCursorWrapper(cursor, self.connection, self)
+        self.connection.use_debug_cursor = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.use_debug_cursor = self.use_debug_cursor
+        del self.connection.make_debug_cursor
+
+def peak_rss():
+    '''This function returns the peak resident memory of this process in kilobytes.'''
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == 'Darwin':
+        usage = usage / 1024
+    return usage
+
+def benchmark_import(rows, unknown_fraction=0.1, seed=0):
+    '''This function times the import of a synthetic gene_exp.diff of the given number of rows.
+
+    Returns a dictionary with the number of rows, seconds, rows_per_second, queries and peak_rss_kb.
+    The queries are counted with a :class:`~data.benchmarks.QueryCounter`, which does not keep their SQL, so it does not inflate the time or memory.
+    '''
+
+    known_genes = Gene.objects.exclude(name__startswith=UNKNOWN_GENE_PREFIX).values_list('pk', flat=True)[:max(1, int(math.ceil(rows * (1 - unknown_fraction))))]
+    inputfile = tempfile.NamedTemporaryFile(suffix='_gene_exp.diff', delete=False)
+    try:
+        inputfile.writelines(synthetic_gene_exp_diff(rows, unknown_fraction, known_genes, seed))
+        inputfile.close()
+        experiment = mRNASeqExperiment.objects.create(name="Import benchmark")
+        try:
+            with QueryCounter() as queries:
+                start = time.time()
+                summary = cufflinks_gene_diff_import(experiment.pk, inputfile.name)
+                seconds = time.time() - start
+        finally:
+            experiment.delete()
+            Gene.objects.filter(name__startswith=UNKNOWN_GENE_PREFIX).delete()
+    finally:
+        os.unlink(inputfile.name)
+    return {
+        'rows': rows,
+        'unknown_fraction': unknown_fraction,
+        'summary': summary,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else None,
+        'queries': queries.count,
+        'peak_rss_kb': peak_rss(),
+    }
+
+def _benchmark_in_process(arguments):
+    '''This function runs :func:`~data.benchmarks.benchmark_import` in a worker process, so that the peak memory is measured for one benchmark only.'''
+
+    return benchmark_import(*arguments)
+
+def run_benchmarks(sizes, unknown_fraction=0.1, seed=0, isolate=True):
+    '''This function runs :func:`~data.benchmarks.benchmark_import` for each number of rows in sizes.
+
+    With isolate, each benchmark runs in a new process with its own database connection.
+    Returns a dictionary describing the environment, with a list of results.
+    '''
+
+    results = []
+    for rows in sizes:
+        if isolate:
+            connection.close()
+            pool = multiprocessing.Pool(1, maxtasksperchild=1)
+            try:
+                results.append(pool.apply(_benchmark_in_process, [(rows, unknown_fraction, seed)]))
+            finally:
+                pool.terminate()
+        else:
+            results.append(benchmark_import(rows, unknown_fraction, seed))
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'results': results,
+    }
@@ -0,0 +1,96 @@
+'''This package caches the responses of views which only change when data are imported, such as the gene pages and the experiment data API.
+
+Each :class:`~genes.models.Gene` and each experiment has a version, a :class:`~data.models.DataVersion` token which is replaced whenever its data change:
+
+* The version of a gene changes when the gene, or one of its :class:`~data.models.GeneExperimentData`, is saved or deleted.
+* The version of an experiment changes when the experiment, or one of its :class:`~data.models.GeneExperimentData`, is saved or deleted,
+  and after each import by :func:`~data.utilities.write_gene_experiment_data`, which writes without signals.
+
+Responses are cached under a key made from their url and the versions of the data they show, see :class:`~data.cache.CachedResponseMixin`,
+so a changed version makes the old responses unreachable rather than removing them, and they expire after **RESPONSE_CACHE_TIMEOUT** seconds.
+The versions are stored in the database, so a change made by one process, such as an import worker, is seen by every other process once it is committed,
+and only the responses are stored in the cache.
+This works with any cache backend, including the local memory cache of each process, which needs no external service.
+'''
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from data.models import DataVersion
+
+def response_timeout():
+    '''This function returns how long responses are cached, the **RESPONSE_CACHE_TIMEOUT** setting, by default one day.'''
+
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 24 * 60 * 60)
+
+def gene_version_key(name):
+    '''This function returns the key of the version of a gene, given its name.'''
+
+    return 'version:gene:%s' % name
+
+def experiment_version_key(experiment_type_id, experiment_id):
+    '''This function returns the key of the version of an experiment, given the id of its content type and its primary key.'''
+
+    return 'version:experiment:%i_%i' % (int(experiment_type_id), int(experiment_id))
+
+def get_versions(keys):
+    '''This function returns the versions of a list of version keys, in the same order, with an empty version for a key which has never changed.'''
+
+    tokens = DataVersion.objects.tokens(keys)
+    return [tokens.get(key, '') for key in keys]
+
+def change_versions(keys):
+    '''This function changes the versions of a list of version keys.
+
+    Within a transaction the new versions are seen by other processes when it is committed.
+    '''
+
+    DataVersion.objects.change(keys)
+
+def invalidate_genes(names):
+    '''This function changes the version of each of the named genes, so their cached responses are no longer used.'''
+
+    change_versions([gene_version_key(name) for name in names])
+
+def invalidate_experiment(experiment_type_id, experiment_id):
+    '''This function changes the version of an experiment, given the id of its content type and its primary key, so its cached responses are no longer used.'''
+
+    change_versions([experiment_version_key(experiment_type_id, experiment_id)])
+
+def response_key(path, versions):
+    '''This function returns the cache key of a response, given its full path including the query string and the versions of the data it shows.'''
+
+    return 'response:%s' % hashlib.md5('\n'.join([path.encode('utf-8')] + [str(version) for version in versions])).hexdigest()
+
+class CachedResponseMixin(object):
+    '''This mixin caches the successful responses to GET requests of a view, keyed by their url and the versions of the data they show.
+
+    Views define :meth:`~data.cache.CachedResponseMixin.get_cache_versions`, which returns the version keys of the data in the response.
+    A cached response is returned without running the view, and template responses are cached once they are rendered.
+    Place this after any access mixins such as LoginRequiredMixin, so that their checks run for cached responses too.
+    Views which stream their response set cache_response to False.
+    '''
+
+    cache_response = True
+
+    def get_cache_versions(self):
+        '''Returns the list of version keys of the data shown in the response, from self.request, self.args and self.kwargs.'''
+        raise NotImplementedError("%s does not define get_cache_versions" % self.__class__.__name__)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.cache_response or request.method != 'GET':
+            return super(CachedResponseMixin, self).dispatch(request, *args, **kwargs)
+        self.request, self.args, self.kwargs = request, args, kwargs
+        key = response_key(request.get_full_path(), get_versions(self.get_cache_versions()))
+        response = cache.get(key)
+        if response is not None:
+            return response
+        response = super(CachedResponseMixin, self).dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(lambda rendered: cache.set(key, rendered, response_timeout()))
+            else:
+                cache.set(key, response, response_timeout())
+        return response
@@ -0,0 +1,219 @@
+'''This package stores the gene level data of each experiment as columns of NumPy arrays in memory-mapped files.
+
+The arrays for an experiment are aligned to a global gene index, so that position i of every column is the same :class:`~genes.models.Gene` in every experiment.
+The gene index only grows, new genes are appended to the end, so the columns of existing experiments stay aligned and are shorter than the index.
+Genes without data in an experiment are NaN.
+
+The files are written in the **EXPRESSION_CACHE_ROOT** setting, which defaults to an expression_cache directory in the MEDIA_ROOT.
+The columns are built after each import by :func:`~data.utilities.write_gene_experiment_data` and removed whenever the :class:`~data.models.GeneExperimentData` of an experiment change.
+Each build is written to a directory named after the version of the experiment it was read at, see :mod:`data.cache`, and only the directory of the current version is read,
+so a build from data read before an import never replaces the columns built for the import.
+Reading a column with :func:`~data.columns.experiment_column` maps the file without copying it, so the pages are shared between worker processes.
+
+With the columns each experiment has a bitset of its significant genes, those with a q-value below **SIGNIFICANT_Q_VALUE**,
+packed eight genes to a byte in the order of the gene index, see :func:`~data.columns.experiment_bitset` and :mod:`data.overlaps`.
+'''
+
+import errno
+import fcntl
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+
+from data.cache import experiment_version_key, get_versions
+from data.models import GeneExperimentData
+from genes.models import Gene
+
+COLUMNS = ('fold_change', 'p_value', 'q_value', 'amount_1', 'amount_2')
+GENE_INDEX = 'genes.npy'
+SIGNIFICANT = 'significant.npy'
+SIGNIFICANT_Q_VALUE = 0.05
+
+def cache_root():
+    '''This function returns the directory of the column files.'''
+
+    return getattr(settings, 'EXPRESSION_CACHE_ROOT', os.path.join(settings.MEDIA_ROOT, 'expression_cache'))
+
+def experiment_directory(experiment_type_id, experiment_id):
+    '''This function returns the directory of the column files for an experiment, given the id of its content type and its primary key.
+
+    It holds a directory of columns for each version of the experiment which has been built, see :func:`~data.columns.version_directory`.
+    '''
+
+    return os.path.join(cache_root(), '%i_%i' % (experiment_type_id, experiment_id))
+
+def version_directory(experiment_type_id, experiment_id, version=None):
+    '''This function returns the directory of the column files for a version of an experiment, by default its current version.'''
+
+    if version is None:
+        version = get_versions([experiment_version_key(experiment_type_id, experiment_id)])[0]
+    return os.path.join(experiment_directory(experiment_type_id, experiment_id), version or 'initial')
+
+def _makedirs(path):
+    '''This function creates a directory and its parents, if they do not exist.'''
+
+    try:
+        os.makedirs(path)
+    except OSError, error:
+        if error.errno != errno.EEXIST:
+            raise
+
+@contextmanager
+def _locked():
+    '''This context manager holds an exclusive lock on the cache directory, so that only one process writes the gene index at a time.'''
+
+    _makedirs(cache_root())
+    with open(os.path.join(cache_root(), 'lock'), 'w') as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+def _save(path, array):
+    '''This function writes an array as a .npy file, replacing the file atomically so readers never see a partial file.'''
+
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npy')
+    try:
+        with os.fdopen(handle, 'wb') as outputfile:
+            numpy.save(outputfile, array)
+        os.chmod(temporary, 0644)
+        os.rename(temporary, path)
+    except:
+        os.unlink(temporary)
+        raise
+
+def gene_index():
+    '''This function returns the global gene index, an array of gene names in the order of the columns.
+
+    The array is empty if the index has not been written yet.
+    '''
+
+    try:
+        return numpy.load(os.path.join(cache_root(), GENE_INDEX), mmap_mode='r')
+    except IOError, error:
+        if error.errno != errno.ENOENT:
+            raise
+        return numpy.array([], dtype=unicode)
+
+def update_gene_index(names=None):
+    '''This function appends any genes which are not in the gene index to its end, and returns the index.
+
+    The names are an iterable of gene names which should be in the index, by default every :class:`~genes.models.Gene`.
+    '''
+
+    if names is None:
+        names = Gene.objects.values_list('pk', flat=True)
+    with _locked():
+        index = gene_index()
+        missing = sorted(set(names).difference(index))
+        if missing:
+            index = numpy.concatenate([index, numpy.array(missing, dtype=unicode)])
+            _save(os.path.join(cache_root(), GENE_INDEX), index)
+        return gene_index()
+
+def gene_positions(index=None):
+    '''This function returns a dictionary of gene names to their position in the gene index.'''
+
+    if index is None:
+        index = gene_index()
+    return dict((name, position) for position, name in enumerate(index))
+
+def build_experiment_columns(experiment, known_genes=None):
+    '''This function writes the columns of the :class:`~data.models.GeneExperimentData` of an experiment.
+
+    The gene index is first updated with the genes of the experiment, or with known_genes, a set of every gene name, if it is passed.
+    If a gene has more than one measurement in the experiment the first one is used.
+    The bitset of significant genes is written from the q-value column.
+    The columns are written to the directory of the current version of the experiment, and the directories of other versions are then removed,
+    except that of a version read by another build in the meantime.
+    Returns the directory of the columns.
+    '''
+
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    #the version is read before the data, so that data changed in between are stamped with the older version and built again when read
+    version = get_versions([experiment_version_key(experiment_type.pk, experiment.pk)])[0]
+    rows = list(GeneExperimentData.objects.for_experiment(experiment).order_by('gene', 'pk').values_list('gene', *COLUMNS))
+    index = update_gene_index(known_genes if known_genes is not None else set(row[0] for row in rows))
+    positions = gene_positions(index)
+    directory = version_directory(experiment_type.pk, experiment.pk, version)
+    _makedirs(cache_root())
+    temporary = tempfile.mkdtemp(dir=cache_root())
+    try:
+        os.chmod(temporary, 0755)
+        if rows:
+            genes = numpy.array([positions[row[0]] for row in rows], dtype=int)
+            values = numpy.array([row[1:] for row in rows], dtype=float)
+            first = numpy.ones(len(genes), dtype=bool)
+            first[1:] = genes[1:] != genes[:-1]
+            genes, values = genes[first], values[first]
+        for column, name in enumerate(COLUMNS):
+            array = numpy.empty(len(index))
+            array.fill(numpy.nan)
+            if rows:
+                array[genes] = values[:, column]
+            numpy.save(os.path.join(temporary, '%s.npy' % name), array)
+            if name == 'q_value':
+                with numpy.errstate(invalid='ignore'):
+                    numpy.save(os.path.join(temporary, SIGNIFICANT), numpy.packbits(array < SIGNIFICANT_Q_VALUE))
+        _makedirs(os.path.dirname(directory))
+        try:
+            os.rename(temporary, directory)
+        except OSError:
+            #another process has built this version in the meantime
+            if not os.path.isdir(directory):
+                raise
+            shutil.rmtree(temporary, ignore_errors=True)
+    except:
+        shutil.rmtree(temporary, ignore_errors=True)
+        raise
+    current = version_directory(experiment_type.pk, experiment.pk)
+    for name in os.listdir(os.path.dirname(directory)):
+        path = os.path.join(os.path.dirname(directory), name)
+        if path not in (directory, current):
+            shutil.rmtree(path, ignore_errors=True)
+    return directory
+
+def invalidate_experiment_columns(experiment_type_id, experiment_id):
+    '''This function removes the columns of an experiment, given the id of its content type and its primary key.
+
+    Processes which have mapped the files keep reading the old data until they load the columns again.
+    '''
+
+    shutil.rmtree(experiment_directory(experiment_type_id, experiment_id), ignore_errors=True)
+
+def experiment_column(experiment, name):
+    '''This function returns one of the **COLUMNS** of an experiment as a read only memory-mapped array, building the columns if needed.
+
+    The array is aligned to :func:`~data.columns.gene_index`, but may be shorter than the index if genes were added after it was built.
+    '''
+
+    if name not in COLUMNS:
+        raise ValueError("%s is not an experiment column" % name)
+    return _load(experiment, '%s.npy' % name)
+
+def experiment_bitset(experiment):
+    '''This function returns the packed bitset of the genes with a q-value below **SIGNIFICANT_Q_VALUE** in an experiment, as a read only memory-mapped array of bytes.
+
+    Bit i, counting from the most significant bit of the first byte, is position i of the gene index, as for numpy.unpackbits.
+    The bitset may be shorter than the index, as for the columns.
+    '''
+
+    return _load(experiment, SIGNIFICANT)
+
+def _load(experiment, filename):
+    '''This function maps one of the files of the columns of the current version of an experiment, building the columns if needed.'''
+
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    try:
+        return numpy.load(os.path.join(version_directory(experiment_type.pk, experiment.pk), filename), mmap_mode='r')
+    except IOError, error:
+        if error.errno != errno.ENOENT:
+            raise
+    return numpy.load(os.path.join(build_experiment_columns(experiment), filename), mmap_mode='r')
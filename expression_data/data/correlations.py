@@ -0,0 +1,160 @@
+'''This package finds the genes whose fold changes are correlated with those of a gene across every experiment.
+
+The fold changes are held in a matrix of genes by experiments, assembled from the :mod:`data.columns` of each experiment and aligned to the global gene index,
+with NaN where a gene was not measured in an experiment.
+Each worker process builds the matrix on first use and rebuilds it when the :mod:`data.cache` version of any experiment changes, such as after an import.
+The correlations of one gene with every other gene are computed in a single vectorized pass over the matrix,
+using the experiments in which both genes were measured, and the best correlated genes are stored in the cache until the versions change.
+
+Pearson correlations use the fold changes and Spearman correlations use the rank of each fold change among the experiments in which that gene was measured.
+Where genes were not measured in every experiment this differs from ranking only the shared experiments, as an exact Spearman correlation would.
+'''
+
+import hashlib
+
+import numpy
+
+from django.core.cache import cache
+from django.contrib.contenttypes.models import ContentType
+
+from data.cache import experiment_version_key, get_versions
+from data.columns import experiment_column, gene_index, gene_positions
+from experiments.models import mRNASeqExperiment, MicroArrayExperiment
+
+METHODS = ('pearson', 'spearman')
+DIRECTIONS = ('positive', 'negative')
+#Correlations over fewer shared experiments are left out.
+MINIMUM_EXPERIMENTS = 3
+#The number of genes stored in the cache for each gene, method and direction.
+MAXIMUM_RESULTS = 1000
+RESULTS_TIMEOUT = 7 * 24 * 60 * 60
+
+def rank_rows(matrix):
+    '''This function returns the rank of each value within its row of a matrix, starting at 1, with tied values given their average rank and NaN left as NaN.'''
+
+    rows, columns = matrix.shape
+    order = numpy.argsort(matrix, axis=1)
+    row_numbers = numpy.arange(rows)[:, numpy.newaxis]
+    sorted_values = matrix[row_numbers, order]
+    #each run of equal values in a row is a group, NaN is never equal so each is its own group
+    starts = numpy.ones(matrix.shape, dtype=bool)
+    starts[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    groups = numpy.cumsum(starts.ravel()) - 1
+    positions = numpy.tile(numpy.arange(1, columns + 1, dtype=float), rows)
+    average_ranks = numpy.bincount(groups, positions) / numpy.bincount(groups)
+    sorted_ranks = average_ranks[groups].reshape(matrix.shape)
+    sorted_ranks[numpy.isnan(sorted_values)] = numpy.nan
+    ranks = numpy.empty(matrix.shape)
+    ranks[row_numbers, order] = sorted_ranks
+    return ranks
+
+def correlate(matrix, values):
+    '''This function returns the Pearson correlation of a vector of values with each row of a matrix, and the number of columns each was computed over.
+
+    Only the columns where both the row and the values are finite are used, so NaN and the infinite fold changes of genes without expression in one sample are left out.
+    The correlation is NaN where fewer than **MINIMUM_EXPERIMENTS** columns are shared or either has no variance.
+    '''
+
+    values = numpy.asarray(values, dtype=float)
+    measured = numpy.isfinite(values)
+    matrix, values = matrix[:, measured], values[measured]
+    shared = numpy.isfinite(matrix)
+    counts = shared.sum(axis=1)
+    y = numpy.where(shared, matrix, 0)
+    x = numpy.where(shared, values, 0)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        #the values are centered on their mean over the shared columns, as the sums of squares of uncentered values lose precision
+        centered_x = numpy.where(shared, x - (x.sum(axis=1) / counts)[:, numpy.newaxis], 0)
+        centered_y = numpy.where(shared, y - (y.sum(axis=1) / counts)[:, numpy.newaxis], 0)
+        variance_x, variance_y = (centered_x ** 2).sum(axis=1), (centered_y ** 2).sum(axis=1)
+        correlations = (centered_x * centered_y).sum(axis=1) / numpy.sqrt(variance_x * variance_y)
+    #rounding of the mean leaves a tiny variance rather than none for some constant rows
+    constant = (variance_x <= 1e-20 * (x ** 2).sum(axis=1)) | (variance_y <= 1e-20 * (y ** 2).sum(axis=1))
+    correlations[constant | (counts < MINIMUM_EXPERIMENTS)] = numpy.nan
+    return correlations, counts
+
+class FoldChangeMatrix(object):
+    '''This class is the matrix of fold changes of every gene in the gene index by every experiment with data, and the ranks of those fold changes for Spearman correlations.'''
+
+    def __init__(self, experiments):
+        '''The experiments are a list of experiments, those without any finite fold changes are left out.'''
+        index = gene_index()
+        columns = []
+        self.experiments = []
+        for experiment in experiments:
+            fold_changes = numpy.asarray(experiment_column(experiment, 'fold_change'))[:len(index)]
+            if numpy.isfinite(fold_changes).any():
+                column = numpy.empty(len(index))
+                column.fill(numpy.nan)
+                column[:len(fold_changes)] = fold_changes
+                columns.append(column)
+                self.experiments.append(experiment)
+        self.genes = index
+        self.positions = gene_positions(self.genes)
+        self.fold_changes = numpy.column_stack(columns) if columns else numpy.empty((len(index), 0))
+        self.ranks = rank_rows(self.fold_changes)
+
+    def correlated_genes(self, gene, method='pearson', direction='positive', count=MAXIMUM_RESULTS):
+        '''Returns up to count dictionaries of the gene, correlation and number of shared experiments of the genes most correlated with a gene, best first.
+
+        The direction is positive for the genes with the largest correlations, or negative for the smallest.
+        Raises a ValueError for an unknown method or direction, or a gene without data.
+        '''
+        if method not in METHODS:
+            raise ValueError("%s is not a correlation method, use one of %s" % (method, ', '.join(METHODS)))
+        if direction not in DIRECTIONS:
+            raise ValueError("%s is not a direction, use one of %s" % (direction, ', '.join(DIRECTIONS)))
+        if gene not in self.positions:
+            raise ValueError("There are no data for %s" % gene)
+        matrix = self.ranks if method == 'spearman' else self.fold_changes
+        position = self.positions[gene]
+        correlations, counts = correlate(matrix, matrix[position])
+        correlations[position] = numpy.nan
+        valid = numpy.flatnonzero(~numpy.isnan(correlations))
+        order = numpy.argsort(-correlations[valid] if direction == 'positive' else correlations[valid], kind='mergesort')
+        return [{'gene': unicode(self.genes[row]), 'correlation': float(correlations[row]), 'experiments': int(counts[row])}
+            for row in valid[order[:count]]]
+
+def all_experiments():
+    '''This function returns every :class:`~experiments.models.mRNASeqExperiment` and :class:`~experiments.models.MicroArrayExperiment`.'''
+
+    return list(mRNASeqExperiment.objects.order_by('pk')) + list(MicroArrayExperiment.objects.order_by('pk'))
+
+def data_version(experiments):
+    '''This function returns a token for the versions of the data of a list of experiments, which changes when any of them change.'''
+
+    keys = [experiment_version_key(ContentType.objects.get_for_model(experiment).pk, experiment.pk) for experiment in experiments]
+    return hashlib.md5('\n'.join(keys + [str(version) for version in get_versions(keys)])).hexdigest()
+
+_matrix = None
+_matrix_version = None
+
+def fold_change_matrix(experiments=None, version=None):
+    '''This function returns the fold change matrix of this process, building it if it does not exist or the data have changed since it was built.'''
+
+    global _matrix, _matrix_version
+    if experiments is None:
+        experiments = all_experiments()
+    if version is None:
+        version = data_version(experiments)
+    if _matrix is None or _matrix_version != version:
+        _matrix = FoldChangeMatrix(experiments)
+        _matrix_version = version
+    return _matrix
+
+def correlated_genes(gene, method='pearson', direction='positive', count=50):
+    '''This function returns up to count genes most correlated with a gene, see :meth:`~data.correlations.FoldChangeMatrix.correlated_genes`.
+
+    The first **MAXIMUM_RESULTS** genes are stored in the cache for each gene, method and direction until the data change.
+    '''
+
+    if not 0 < count <= MAXIMUM_RESULTS:
+        raise ValueError("The count must be between 1 and %i" % MAXIMUM_RESULTS)
+    experiments = all_experiments()
+    version = data_version(experiments)
+    key = 'correlations:%s' % hashlib.md5('\n'.join([version, method, direction, gene.encode('utf-8')])).hexdigest()
+    results = cache.get(key)
+    if results is None:
+        results = fold_change_matrix(experiments, version).correlated_genes(gene, method, direction)
+        cache.set(key, results, RESULTS_TIMEOUT)
+    return results[:count]
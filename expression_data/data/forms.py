@@ -4,20 +4,39 @@
 
 from django import forms
 
-from experiments.models import mRNASeqExperiment
+from data.models import IMPORT_MODES, CUFFLINKS_DATA_TYPES
+from experiments.models import mRNASeqExperiment, MicroArrayExperiment
+
+class ImportForm(forms.Form):
+    '''This is the base form for importing a file into an experiment of the type set by experiment_model.'''
 
-class CufflinksImportForm(forms.Form):
-    '''This form is used as the input for a :class:`~data.views.CufflinksImportFormView`.'''
-    
     experiment = forms.IntegerField(help_text="Enter the identification number for the experiment.")
-    uploaded_file = forms.FileField(help_text="Upload a genes_exp.diff file")
+    mode = forms.ChoiceField(choices=IMPORT_MODES, initial='append', help_text="What to do with data already stored for this experiment.")
     
     def clean_experiment(self):
-        '''This function checks that the entered experiment is a valid :class:`~data.models.mRNASeqExperiment`.'''
+        '''This function checks that the entered experiment is a valid experiment of the type set by experiment_model.'''
         
         data = self.cleaned_data['experiment']
         try: 
-            mRNASeqExperiment.objects.get(pk=data)
-        except mRNASeqExperiment.DoesNotExist:
+            self.experiment_model.objects.get(pk=data)
+        except self.experiment_model.DoesNotExist:
             raise forms.ValidationError("Invalid Experiment ID.")
-        return data
\ No newline at end of file
+        return data
+
+class CufflinksImportForm(ImportForm):
+    '''This form is used as the input for a :class:`~data.views.CufflinksImportFormView`.'''
+    
+    experiment_model = mRNASeqExperiment
+
+    uploaded_file = forms.FileField(help_text="Upload a genes_exp.diff, isoform_exp.diff or tss_group_exp.diff file")
+    data_type = forms.ChoiceField(choices=CUFFLINKS_DATA_TYPES, initial='gene', help_text="Which cuffdiff file is this?")
+
+class MicroArrayImportForm(ImportForm):
+    '''This form is used as the input for a :class:`~data.views.MicroArrayImportFormView`.
+
+    The experiment must be a :class:`~experiments.models.MicroArrayExperiment`.
+    '''
+
+    experiment_model = MicroArrayExperiment
+
+    uploaded_file = forms.FileField(help_text="Upload a limma topTable or GEO2R results table with ID, Gene.symbol, logFC, t, P.Value and adj.P.Val columns")
@@ -0,0 +1,187 @@
+'''This package runs queued :class:`~data.models.ImportJob` objects.
+
+Jobs are queued in the database, so no message broker is needed.
+A worker, started with the **run_import_jobs** management command, claims the oldest queued job with a conditional UPDATE and runs the importer.
+Because a job can only be claimed once, several workers can run at the same time, each importing into a different experiment.
+
+The import itself runs in a single transaction, so while a job runs the number of imported rows and a heartbeat time are written to the job row
+through a second connection to the database, see :func:`~data.jobs.progress_database`, and can be read by the web server straight away.
+SQLite locks the whole database while the import writes, so with SQLite the progress is written to the cache under :func:`~data.jobs.progress_key` instead,
+and a cache backend shared between processes (such as the file based cache) is needed to see it from the web server.
+
+A job left running by a worker which has stopped, for example because it crashed, is marked as failed by the next worker to look for jobs, see :func:`~data.jobs.fail_stale_jobs`,
+and can then be queued again.
+'''
+
+import errno
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from data.models import ImportJob
+from data.utilities import cufflinks_diff_import, microarray_import
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TIMEOUT = 60 * 60 * 24
+#The alias of the second connection to the default database which the progress of jobs is written through.
+PROGRESS_DATABASE = 'import_progress'
+
+def progress_key(job_id):
+    '''This function returns the cache key holding the number of rows imported by a running job.'''
+    return 'import-job-progress-%s' % job_id
+
+def worker_name():
+    '''This function identifies the current worker process as host:pid.'''
+    return '%s:%s' % (socket.gethostname(), os.getpid())
+
+def job_timeout():
+    '''This function returns how many seconds a running job can go without a heartbeat before it is failed, the **IMPORT_JOB_TIMEOUT** setting, by default one hour.'''
+
+    return getattr(settings, 'IMPORT_JOB_TIMEOUT', 60 * 60)
+
+def progress_database():
+    '''This function returns the alias of a second connection to the default database, which the progress of jobs is written through, or None for SQLite.
+
+    The connection is separate from the one the import writes through, so each progress update is committed while the import transaction is still open.
+    '''
+
+    if connections[DEFAULT_DB_ALIAS].vendor == 'sqlite':
+        return None
+    if PROGRESS_DATABASE not in connections.databases:
+        connections.databases[PROGRESS_DATABASE] = dict(connections.databases[DEFAULT_DB_ALIAS])
+    return PROGRESS_DATABASE
+
+def worker_running(worker):
+    '''This function returns whether the process of a worker named by :func:`~data.jobs.worker_name` is running, or None if it is on another host.'''
+
+    host, separator, pid = (worker or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except OSError as error:
+        return error.errno != errno.ESRCH
+    return True
+
+def fail_stale_jobs():
+    '''This function marks running jobs as failed if their worker has stopped, so they are not left running for ever.
+
+    The worker of a job on this host has stopped if its process has exited.
+    A worker on another host has stopped if there has been no heartbeat from the job for :func:`~data.jobs.job_timeout` seconds.
+    The import transaction of a stopped worker is rolled back by the database, so the job can be queued again.
+    Returns the number of jobs failed.
+    '''
+
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=job_timeout())
+    failed = 0
+    for job_id, worker, started, heartbeat in ImportJob.objects.filter(status='running').values_list('pk', 'worker', 'started', 'heartbeat'):
+        running = worker_running(worker)
+        if running is False or (running is None and (heartbeat or started or now) < cutoff):
+            failed += ImportJob.objects.filter(pk=job_id, status='running', worker=worker).update(
+                status='failed', error="The worker %s stopped while running this job." % worker, rows_processed=0, finished=now)
+    return failed
+
+def claim_next_job():
+    '''This function marks the oldest queued :class:`~data.models.ImportJob` as running and returns it.
+
+    Jobs left running by stopped workers are failed first, see :func:`~data.jobs.fail_stale_jobs`.
+    The status is changed with an UPDATE conditional on the job still being queued, so two workers never claim the same job.
+    Returns None if there are no queued jobs.
+    '''
+
+    fail_stale_jobs()
+    for job_id in ImportJob.objects.filter(status='queued').values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started=now, heartbeat=now, worker=worker_name())
+        if claimed:
+            return ImportJob.objects.get(pk=job_id)
+    return None
+
+def run_import_job(job):
+    '''This function imports the file of a claimed :class:`~data.models.ImportJob` and records the outcome on the job.
+
+    Microarray experiments are imported by :func:`~data.utilities.microarray_import`, other experiments by :func:`~data.utilities.cufflinks_diff_import` with the data type of the job.
+    The uploaded file is deleted after a successful import, and kept for a failed import so that the job can be queued again.
+    Progress is written after each batch, see :mod:`data.jobs`.
+    '''
+
+    key = progress_key(job.pk)
+    database = progress_database()
+
+    def progress(rows):
+        job.rows_processed = rows
+        job.heartbeat = timezone.now()
+        if database is None:
+            cache.set(key, rows, PROGRESS_TIMEOUT)
+        else:
+            ImportJob.objects.using(database).filter(pk=job.pk, status='running').update(rows_processed=rows, heartbeat=job.heartbeat)
+
+    try:
+        job.uploaded_file.open('r')
+        try:
+            if job.experiment_type.model == 'microarrayexperiment':
+                job.result = microarray_import(job.experiment_id, job.uploaded_file, progress, job.mode)
+            else:
+                job.result = cufflinks_diff_import(job.experiment_id, job.uploaded_file, progress, job.mode, job.data_type)
+        finally:
+            job.uploaded_file.close()
+    except Exception as error:
+        logger.exception("Import job %s failed", job.pk)
+        job.status = 'failed'
+        job.error = "%s: %s" % (error.__class__.__name__, error)
+        job.rows_processed = 0
+    else:
+        job.status = 'finished'
+        job.uploaded_file.delete(save=False)
+    finally:
+        if database is not None:
+            connections[database].close()
+    job.finished = timezone.now()
+    job.save()
+    cache.delete(key)
+    return job
+
+def process_import_jobs():
+    '''This generator runs queued jobs one after another until the queue is empty, yielding each finished job.'''
+
+    job = claim_next_job()
+    while job is not None:
+        yield run_import_job(job)
+        job = claim_next_job()
+
+def job_status(job):
+    '''This function returns a dictionary describing the progress of an :class:`~data.models.ImportJob`.
+
+    Throughput is given in rows per second since the job started.
+    With SQLite the rows processed by a running job are read from the cache.
+    '''
+
+    rows = job.rows_processed
+    if job.status == 'running':
+        rows = cache.get(progress_key(job.pk), rows)
+    rows_per_second = None
+    if job.started:
+        elapsed = ((job.finished or timezone.now()) - job.started).total_seconds()
+        if elapsed > 0:
+            rows_per_second = rows / elapsed
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'experiment': unicode(job.experiment),
+        'rows_processed': rows,
+        'rows_per_second': rows_per_second,
+        'result': job.result,
+        'error': job.error,
+        'created': job.created.isoformat(),
+        'started': job.started and job.started.isoformat(),
+        'finished': job.finished and job.finished.isoformat(),
+    }
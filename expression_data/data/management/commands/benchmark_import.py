@@ -0,0 +1,42 @@
+'''This command measures the speed of the gene_exp.diff importer with synthetic files, see :mod:`data.benchmarks`.
+
+The results are written as JSON so they can be compared between releases::
+
+    python manage.py benchmark_import --rows 10000,100000,1000000 --output benchmarks.json
+'''
+
+import json
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from data.benchmarks import run_benchmarks
+
+class Command(NoArgsCommand):
+    '''Imports synthetic files of each size and reports the timings as JSON.'''
+
+    help = "Benchmarks the import of synthetic gene_exp.diff files."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--rows', dest='rows', default='10000,100000,1000000',
+            help="Comma separated numbers of rows to benchmark."),
+        make_option('--unknown', type='float', dest='unknown', default=0.1,
+            help="The share of rows for genes which are not in the database."),
+        make_option('--seed', type='int', dest='seed', default=0,
+            help="The random seed used to generate the files."),
+        make_option('--output', dest='output', default=None,
+            help="Write the results to this file instead of the standard output."),
+    )
+
+    def handle_noargs(self, **options):
+        try:
+            sizes = [int(rows) for rows in options['rows'].split(',')]
+        except ValueError:
+            raise CommandError("%s is not a list of numbers of rows." % options['rows'])
+        if not 0 <= options['unknown'] <= 1:
+            raise CommandError("The share of unknown genes must be between 0 and 1.")
+        results = json.dumps(run_benchmarks(sizes, options['unknown'], options['seed']), indent=4)
+        if options['output']:
+            with open(options['output'], 'w') as outputfile:
+                outputfile.write(results)
+        else:
+            self.stdout.write(results + "\n")
@@ -0,0 +1,28 @@
+'''This command writes an experiment, its metadata and its data to a binary archive, see :mod:`data.archives`.
+
+The archive is read on another server with the import_archive command::
+
+    python manage.py export_archive mrnaseqexperiment 1 experiment_1.expdata
+'''
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data.archives import export_archive
+from data.queries import get_experiment
+
+class Command(BaseCommand):
+    '''Writes one experiment to an archive file.'''
+
+    args = "<experiment_type experiment_id filename>"
+    help = "Exports a mrnaseqexperiment or microarrayexperiment with its data as a binary archive."
+
+    def handle(self, *args, **options):
+        if len(args) != 3 or not args[1].isdigit():
+            raise CommandError("Enter an experiment type, an experiment id and a filename.")
+        try:
+            experiment = get_experiment(args[0], int(args[1]))
+        except ValueError as error:
+            raise CommandError(error)
+        rows = export_archive(experiment, args[2])
+        for data_type, count in sorted(rows.items()):
+            self.stdout.write("Wrote %i %s rows.\n" % (count, data_type))
@@ -0,0 +1,43 @@
+'''This command exports the gene level data of an experiment as a TSV or CSV file, see :func:`data.queries.export_experiment_data`.
+
+The rows are written as they are read from the database, so any size of experiment can be exported::
+
+    python manage.py export_experiment mrnaseqexperiment 1 --gzip --output experiment_1.tsv.gz
+'''
+
+import sys
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data.queries import get_experiment, filter_experiment_data, export_experiment_data, EXPORT_FORMATS
+
+class Command(BaseCommand):
+    '''Writes the data of one experiment, ordered by gene.'''
+
+    args = "<experiment_type experiment_id>"
+    help = "Exports the data of a mrnaseqexperiment or microarrayexperiment as a TSV or CSV file."
+    option_list = BaseCommand.option_list + (
+        make_option('--format', type='choice', dest='format', default='tsv', choices=sorted(EXPORT_FORMATS),
+            help="tsv or csv."),
+        make_option('--gzip', action='store_true', dest='gzip', default=False,
+            help="Compress the file with gzip."),
+        make_option('--output', dest='output', default=None,
+            help="Write to this file instead of the standard output."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 2 or not args[1].isdigit():
+            raise CommandError("Enter an experiment type and an experiment id.")
+        try:
+            experiment = get_experiment(args[0], int(args[1]))
+        except ValueError as error:
+            raise CommandError(error)
+        chunks = export_experiment_data(filter_experiment_data(experiment), options['format'], options['gzip'])
+        outputfile = options['output'] and open(options['output'], 'wb') or sys.stdout
+        try:
+            for chunk in chunks:
+                outputfile.write(chunk)
+        finally:
+            if options['output']:
+                outputfile.close()
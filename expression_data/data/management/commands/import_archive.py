@@ -0,0 +1,26 @@
+'''This command creates an experiment from a binary archive written by the export_archive command, see :func:`data.archives.import_archive`.
+
+Each archive is imported as a new experiment::
+
+    python manage.py import_archive experiment_1.expdata
+'''
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data.archives import import_archive
+
+class Command(BaseCommand):
+    '''Maps the columns of each archive and writes them to the database.'''
+
+    args = "<filename filename ...>"
+    help = "Imports experiments with their data from binary archives."
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError("Enter at least one archive filename.")
+        for filename in args:
+            try:
+                experiment, results = import_archive(filename)
+            except (IOError, ValueError) as error:
+                raise CommandError("%s: %s" % (filename, error))
+            self.stdout.write("%s: created %s %i, %s\n" % (filename, experiment._meta.verbose_name, experiment.pk, ' '.join(results)))
@@ -0,0 +1,52 @@
+'''This command imports one or more gene_exp.diff files, see :func:`data.utilities.parallel_cufflinks_gene_diff_import`.
+
+Each argument is an experiment id and a file separated by a colon::
+
+    python manage.py import_cufflinks 1:knockdown_a/gene_exp.diff 2:knockdown_b/gene_exp.diff
+'''
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data.models import IMPORT_MODES, CUFFLINKS_DATA_TYPES
+from data.utilities import parallel_cufflinks_gene_diff_import
+from experiments.models import mRNASeqExperiment
+
+class Command(BaseCommand):
+    '''Parses the files in parallel and writes them to the database.'''
+
+    args = "<experiment_id:filename experiment_id:filename ...>"
+    help = "Imports cufflinks gene_exp.diff, isoform_exp.diff or tss_group_exp.diff files into mRNA-Seq experiments."
+    option_list = BaseCommand.option_list + (
+        make_option('--processes', type='int', dest='processes', default=None,
+            help="Number of processes used to parse files, defaults to the number of cores."),
+        make_option('--mode', type='choice', dest='mode', default='append', choices=[mode for mode, description in IMPORT_MODES],
+            help="append, replace or upsert the data already stored for each experiment."),
+        make_option('--data-type', type='choice', dest='data_type', default='gene', choices=[data_type for data_type, description in CUFFLINKS_DATA_TYPES],
+            help="gene, isoform or tss_group, the kind of cuffdiff file given."),
+    )
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError("Enter at least one experiment_id:filename pair.")
+        tasks = []
+        for arg in args:
+            experiment_id, separator, filename = arg.partition(':')
+            if not separator or not experiment_id.isdigit():
+                raise CommandError("%s is not an experiment_id:filename pair." % arg)
+            tasks.append((int(experiment_id), filename))
+
+        try:
+            results = parallel_cufflinks_gene_diff_import(tasks, options['processes'], options['mode'], options['data_type'])
+        except mRNASeqExperiment.DoesNotExist as error:
+            raise CommandError(error)
+        failed = 0
+        for experiment_id, filename, summary, error in results:
+            if error:
+                failed += 1
+                self.stderr.write("%s: %s\n" % (filename, error))
+            else:
+                self.stdout.write("%s: %s\n" % (filename, summary))
+        if failed:
+            raise CommandError("%i of %i files could not be imported." % (failed, len(tasks)))
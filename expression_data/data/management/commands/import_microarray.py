@@ -0,0 +1,43 @@
+'''This command imports a microarray results table into a microarray experiment, see :func:`data.utilities.microarray_import`.
+
+Columns which differ from a limma topTable or GEO2R table can be mapped to fields::
+
+    python manage.py import_microarray 1 results.txt --column gene_id=Symbol --column amount_1=AveExpr
+'''
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data.models import IMPORT_MODES
+from data.utilities import microarray_import
+from experiments.models import MicroArrayExperiment
+
+class Command(BaseCommand):
+    '''Imports one table, collapsing probes to genes.'''
+
+    args = "<experiment_id filename>"
+    help = "Imports a limma or GEO2R results table into a microarray experiment."
+    option_list = BaseCommand.option_list + (
+        make_option('--mode', type='choice', dest='mode', default='append', choices=[mode for mode, description in IMPORT_MODES],
+            help="append, replace or upsert the data already stored for the experiment."),
+        make_option('--column', action='append', dest='columns', default=[],
+            help="Map a field to a column as field=column, or field= to ignore a field. Can be repeated."),
+        make_option('--sample-1', dest='sample_1', default=None, help="The name of the first group."),
+        make_option('--sample-2', dest='sample_2', default=None, help="The name of the second group."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 2 or not args[0].isdigit():
+            raise CommandError("Enter an experiment id and a filename.")
+        columns = {}
+        for mapping in options['columns']:
+            field, separator, column = mapping.partition('=')
+            if not separator:
+                raise CommandError("%s is not a field=column mapping." % mapping)
+            columns[field] = column or None
+        try:
+            return microarray_import(int(args[0]), args[1], mode=options['mode'], columns=columns,
+                sample_1=options['sample_1'], sample_2=options['sample_2']) + "\n"
+        except (MicroArrayExperiment.DoesNotExist, IOError, ValueError) as error:
+            raise CommandError(error)
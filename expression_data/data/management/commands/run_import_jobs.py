@@ -0,0 +1,32 @@
+'''This command runs queued :class:`~data.models.ImportJob` objects, see :mod:`data.jobs`.
+
+Start one worker per import that should be able to run at the same time::
+
+    python manage.py run_import_jobs
+'''
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from data.jobs import process_import_jobs
+
+class Command(NoArgsCommand):
+    '''Polls the database for queued import jobs and runs them.'''
+
+    help = "Runs queued data import jobs."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--once', action='store_true', dest='once', default=False,
+            help="Exit once there are no queued jobs left."),
+        make_option('--sleep', type='float', dest='sleep', default=5.0,
+            help="Seconds to wait before checking for new jobs."),
+    )
+
+    def handle_noargs(self, **options):
+        while True:
+            for job in process_import_jobs():
+                self.stdout.write("%s: %s\n" % (job, job.result or job.error))
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
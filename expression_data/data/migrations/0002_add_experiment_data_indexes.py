@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+#Composite indexes for looking up the data of an experiment, the data of a gene and the significant results of an experiment.
+INDEXES = (
+    ['experiment_type_id', 'experiment_id', 'gene_id'],
+    ['gene_id', 'experiment_type_id', 'experiment_id'],
+    ['experiment_type_id', 'experiment_id', 'q_value'],
+)
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        for columns in INDEXES:
+            db.create_index('data_geneexperimentdata', columns)
+
+    def backwards(self, orm):
+        for columns in INDEXES:
+            db.delete_index('data_geneexperimentdata', columns)
+
+    models = {
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'data.geneexperimentdata': {
+            'Meta': {'object_name': 'GeneExperimentData'},
+            'amount_1': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'q_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.importjob': {
+            'Meta': {'ordering': "['created']", 'object_name': 'ImportJob'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'data_type': ('django.db.models.fields.CharField', [], {'default': "'gene'", 'max_length': '10'}),
+            'error': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'mode': ('django.db.models.fields.CharField', [], {'default': "'append'", 'max_length': '10'}),
+            'result': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'rows_processed': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'started': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'queued'", 'max_length': '10', 'db_index': 'True'}),
+            'uploaded_file': ('django.db.models.fields.files.FileField', [], {'max_length': '100'}),
+            'worker': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'})
+        },
+        'data.isoformexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'isoform'),)", 'object_name': 'IsoformExperimentData'},
+            'amount_1': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'isoform': ('django.db.models.fields.CharField', [], {'max_length': '30'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'q_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.tssgroupexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'tss_group'),)", 'object_name': 'TSSGroupExperimentData'},
+            'amount_1': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'q_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'tss_group': ('django.db.models.fields.CharField', [], {'max_length': '30'})
+        },
+        'genes.gene': {
+            'Meta': {'object_name': 'Gene'},
+            'band': ('django.db.models.fields.CharField', [], {'max_length': '5', 'null': 'True', 'blank': 'True'}),
+            'chromosome': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'end': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'ensemblID': ('django.db.models.fields.CharField', [], {'max_length': '30', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.SlugField', [], {'max_length': '50', 'primary_key': 'True'}),
+            'start': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '15', 'null': 'True', 'blank': 'True'}),
+            'strand': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'transcript_count': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'type': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['data']
\ No newline at end of file
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+from django.utils import timezone
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'ExperimentSummary'
+        db.create_table('data_experimentsummary', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('experiment_type', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['contenttypes.ContentType'])),
+            ('experiment_id', self.gf('django.db.models.fields.PositiveIntegerField')()),
+            ('genes', self.gf('django.db.models.fields.PositiveIntegerField')(default=0)),
+            ('tested', self.gf('django.db.models.fields.PositiveIntegerField')(default=0)),
+            ('significant_up', self.gf('django.db.models.fields.PositiveIntegerField')(default=0)),
+            ('significant_down', self.gf('django.db.models.fields.PositiveIntegerField')(default=0)),
+            ('statuses', self.gf('django.db.models.fields.TextField')(default='{}')),
+            ('fold_change_histogram', self.gf('django.db.models.fields.TextField')(default='[]')),
+            ('p_value_histogram', self.gf('django.db.models.fields.TextField')(default='[]')),
+            ('stale', self.gf('django.db.models.fields.BooleanField')(default=False)),
+            ('updated', self.gf('django.db.models.fields.DateTimeField')(auto_now=True, blank=True)),
+        ))
+        db.send_create_signal('data', ['ExperimentSummary'])
+
+        # Adding unique constraint on 'ExperimentSummary', fields ['experiment_type', 'experiment_id']
+        db.create_unique('data_experimentsummary', ['experiment_type_id', 'experiment_id'])
+
+        # Experiments which already have data get a stale summary, which is computed when it is first read
+        if not db.dry_run:
+            db.execute("INSERT INTO data_experimentsummary (experiment_type_id, experiment_id, genes, tested, significant_up, significant_down, "
+                "statuses, fold_change_histogram, p_value_histogram, stale, updated) "
+                "SELECT DISTINCT experiment_type_id, experiment_id, 0, 0, 0, 0, '{}', '[]', '[]', %s, %s FROM data_geneexperimentdata",
+                [True, timezone.now()])
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'ExperimentSummary', fields ['experiment_type', 'experiment_id']
+        db.delete_unique('data_experimentsummary', ['experiment_type_id', 'experiment_id'])
+
+        # Deleting model 'ExperimentSummary'
+        db.delete_table('data_experimentsummary')
+
+
+    models = {
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'data.experimentsummary': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id'),)", 'object_name': 'ExperimentSummary'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change_histogram': ('django.db.models.fields.TextField', [], {'default': "'[]'"}),
+            'genes': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'p_value_histogram': ('django.db.models.fields.TextField', [], {'default': "'[]'"}),
+            'significant_down': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'significant_up': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'stale': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'statuses': ('django.db.models.fields.TextField', [], {'default': "'{}'"}),
+            'tested': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'})
+        },
+        'data.geneexperimentdata': {
+            'Meta': {'object_name': 'GeneExperimentData'},
+            'amount_1': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'q_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.importjob': {
+            'Meta': {'ordering': "['created']", 'object_name': 'ImportJob'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'data_type': ('django.db.models.fields.CharField', [], {'default': "'gene'", 'max_length': '10'}),
+            'error': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'mode': ('django.db.models.fields.CharField', [], {'default': "'append'", 'max_length': '10'}),
+            'result': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'rows_processed': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'started': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'queued'", 'max_length': '10', 'db_index': 'True'}),
+            'uploaded_file': ('django.db.models.fields.files.FileField', [], {'max_length': '100'}),
+            'worker': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'})
+        },
+        'data.isoformexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'isoform'),)", 'object_name': 'IsoformExperimentData'},
+            'amount_1': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'isoform': ('django.db.models.fields.CharField', [], {'max_length': '30'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'q_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.rankedgene': {
+            'Meta': {'ordering': "['rank']", 'unique_together': "(('experiment_type', 'experiment_id', 'ranking', 'rank'),)", 'object_name': 'RankedGene'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'rank': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'ranking': ('django.db.models.fields.CharField', [], {'max_length': '10'})
+        },
+        'data.tssgroupexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'tss_group'),)", 'object_name': 'TSSGroupExperimentData'},
+            'amount_1': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '15', 'decimal_places': '6', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'q_value': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '8'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'tss_group': ('django.db.models.fields.CharField', [], {'max_length': '30'})
+        },
+        'genes.gene': {
+            'Meta': {'object_name': 'Gene'},
+            'band': ('django.db.models.fields.CharField', [], {'max_length': '5', 'null': 'True', 'blank': 'True'}),
+            'chromosome': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'end': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'ensemblID': ('django.db.models.fields.CharField', [], {'max_length': '30', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.SlugField', [], {'max_length': '50', 'primary_key': 'True'}),
+            'start': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '15', 'null': 'True', 'blank': 'True'}),
+            'strand': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'transcript_count': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'type': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['data']
\ No newline at end of file
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+#The composite indexes of migration 0002, which are dropped while the columns are changed and created again by migration 0007.
+INDEXES = (
+    ['experiment_type_id', 'experiment_id', 'gene_id'],
+    ['gene_id', 'experiment_type_id', 'experiment_id'],
+    ['experiment_type_id', 'experiment_id', 'q_value'],
+)
+
+#The data tables, which SQLite copies to change their columns, dropping their indexes other than unique constraints.
+TABLES = ('data_geneexperimentdata', 'data_isoformexperimentdata', 'data_tssgroupexperimentdata')
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        for columns in INDEXES:
+            db.delete_index('data_geneexperimentdata', columns)
+
+        # Adding model 'Comparison'
+        db.create_table('data_comparison', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('experiment_type', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['contenttypes.ContentType'])),
+            ('experiment_id', self.gf('django.db.models.fields.PositiveIntegerField')()),
+            ('sample_1', self.gf('django.db.models.fields.CharField')(max_length=50, null=True, blank=True)),
+            ('sample_2', self.gf('django.db.models.fields.CharField')(max_length=50, null=True, blank=True)),
+        ))
+        db.send_create_signal('data', ['Comparison'])
+
+        # Adding unique constraint on 'Comparison', fields ['experiment_type', 'experiment_id', 'sample_1', 'sample_2']
+        db.create_unique('data_comparison', ['experiment_type_id', 'experiment_id', 'sample_1', 'sample_2'])
+
+        # Adding field 'TSSGroupExperimentData.comparison'
+        db.add_column('data_tssgroupexperimentdata', 'comparison',
+                      self.gf('django.db.models.fields.related.ForeignKey')(to=orm['data.Comparison'], null=True, blank=True),
+                      keep_default=False)
+
+        # Adding field 'TSSGroupExperimentData.significant_flag'
+        db.add_column('data_tssgroupexperimentdata', 'significant_flag',
+                      self.gf('django.db.models.fields.BooleanField')(default=False),
+                      keep_default=False)
+
+
+        # Changing field 'TSSGroupExperimentData.p_value'
+        db.alter_column('data_tssgroupexperimentdata', 'p_value', self.gf('django.db.models.fields.FloatField')())
+
+        # Changing field 'TSSGroupExperimentData.q_value'
+        db.alter_column('data_tssgroupexperimentdata', 'q_value', self.gf('django.db.models.fields.FloatField')())
+
+        # Changing field 'TSSGroupExperimentData.amount_1'
+        db.alter_column('data_tssgroupexperimentdata', 'amount_1', self.gf('django.db.models.fields.FloatField')(null=True))
+
+        # Changing field 'TSSGroupExperimentData.amount_2'
+        db.alter_column('data_tssgroupexperimentdata', 'amount_2', self.gf('django.db.models.fields.FloatField')(null=True))
+        # Adding field 'GeneExperimentData.comparison'
+        db.add_column('data_geneexperimentdata', 'comparison',
+                      self.gf('django.db.models.fields.related.ForeignKey')(to=orm['data.Comparison'], null=True, blank=True),
+                      keep_default=False)
+
+        # Adding field 'GeneExperimentData.significant_flag'
+        db.add_column('data_geneexperimentdata', 'significant_flag',
+                      self.gf('django.db.models.fields.BooleanField')(default=False),
+                      keep_default=False)
+
+
+        # Changing field 'GeneExperimentData.p_value'
+        db.alter_column('data_geneexperimentdata', 'p_value', self.gf('django.db.models.fields.FloatField')())
+
+        # Changing field 'GeneExperimentData.q_value'
+        db.alter_column('data_geneexperimentdata', 'q_value', self.gf('django.db.models.fields.FloatField')())
+
+        # Changing field 'GeneExperimentData.amount_1'
+        db.alter_column('data_geneexperimentdata', 'amount_1', self.gf('django.db.models.fields.FloatField')(null=True))
+
+        # Changing field 'GeneExperimentData.amount_2'
+        db.alter_column('data_geneexperimentdata', 'amount_2', self.gf('django.db.models.fields.FloatField')(null=True))
+        # Adding field 'IsoformExperimentData.comparison'
+        db.add_column('data_isoformexperimentdata', 'comparison',
+                      self.gf('django.db.models.fields.related.ForeignKey')(to=orm['data.Comparison'], null=True, blank=True),
+                      keep_default=False)
+
+        # Adding field 'IsoformExperimentData.significant_flag'
+        db.add_column('data_isoformexperimentdata', 'significant_flag',
+                      self.gf('django.db.models.fields.BooleanField')(default=False),
+                      keep_default=False)
+
+
+        # Changing field 'IsoformExperimentData.p_value'
+        db.alter_column('data_isoformexperimentdata', 'p_value', self.gf('django.db.models.fields.FloatField')())
+
+        # Changing field 'IsoformExperimentData.q_value'
+        db.alter_column('data_isoformexperimentdata', 'q_value', self.gf('django.db.models.fields.FloatField')())
+
+        # Changing field 'IsoformExperimentData.amount_1'
+        db.alter_column('data_isoformexperimentdata', 'amount_1', self.gf('django.db.models.fields.FloatField')(null=True))
+
+        # Changing field 'IsoformExperimentData.amount_2'
+        db.alter_column('data_isoformexperimentdata', 'amount_2', self.gf('django.db.models.fields.FloatField')(null=True))
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'Comparison', fields ['experiment_type', 'experiment_id', 'sample_1', 'sample_2']
+        db.delete_unique('data_comparison', ['experiment_type_id', 'experiment_id', 'sample_1', 'sample_2'])
+
+        # Deleting model 'Comparison'
+        db.delete_table('data_comparison')
+
+        # Deleting field 'TSSGroupExperimentData.comparison'
+        db.delete_column('data_tssgroupexperimentdata', 'comparison_id')
+
+        # Deleting field 'TSSGroupExperimentData.significant_flag'
+        db.delete_column('data_tssgroupexperimentdata', 'significant_flag')
+
+
+        # Changing field 'TSSGroupExperimentData.p_value'
+        db.alter_column('data_tssgroupexperimentdata', 'p_value', self.gf('django.db.models.fields.DecimalField')(max_digits=9, decimal_places=8))
+
+        # Changing field 'TSSGroupExperimentData.q_value'
+        db.alter_column('data_tssgroupexperimentdata', 'q_value', self.gf('django.db.models.fields.DecimalField')(max_digits=9, decimal_places=8))
+
+        # Changing field 'TSSGroupExperimentData.amount_1'
+        db.alter_column('data_tssgroupexperimentdata', 'amount_1', self.gf('django.db.models.fields.DecimalField')(null=True, max_digits=15, decimal_places=6))
+
+        # Changing field 'TSSGroupExperimentData.amount_2'
+        db.alter_column('data_tssgroupexperimentdata', 'amount_2', self.gf('django.db.models.fields.DecimalField')(null=True, max_digits=15, decimal_places=6))
+        # Deleting field 'GeneExperimentData.comparison'
+        db.delete_column('data_geneexperimentdata', 'comparison_id')
+
+        # Deleting field 'GeneExperimentData.significant_flag'
+        db.delete_column('data_geneexperimentdata', 'significant_flag')
+
+
+        # Changing field 'GeneExperimentData.p_value'
+        db.alter_column('data_geneexperimentdata', 'p_value', self.gf('django.db.models.fields.DecimalField')(max_digits=9, decimal_places=8))
+
+        # Changing field 'GeneExperimentData.q_value'
+        db.alter_column('data_geneexperimentdata', 'q_value', self.gf('django.db.models.fields.DecimalField')(max_digits=9, decimal_places=8))
+
+        # Changing field 'GeneExperimentData.amount_1'
+        db.alter_column('data_geneexperimentdata', 'amount_1', self.gf('django.db.models.fields.DecimalField')(null=True, max_digits=15, decimal_places=6))
+
+        # Changing field 'GeneExperimentData.amount_2'
+        db.alter_column('data_geneexperimentdata', 'amount_2', self.gf('django.db.models.fields.DecimalField')(null=True, max_digits=15, decimal_places=6))
+        # Deleting field 'IsoformExperimentData.comparison'
+        db.delete_column('data_isoformexperimentdata', 'comparison_id')
+
+        # Deleting field 'IsoformExperimentData.significant_flag'
+        db.delete_column('data_isoformexperimentdata', 'significant_flag')
+
+
+        # Changing field 'IsoformExperimentData.p_value'
+        db.alter_column('data_isoformexperimentdata', 'p_value', self.gf('django.db.models.fields.DecimalField')(max_digits=9, decimal_places=8))
+
+        # Changing field 'IsoformExperimentData.q_value'
+        db.alter_column('data_isoformexperimentdata', 'q_value', self.gf('django.db.models.fields.DecimalField')(max_digits=9, decimal_places=8))
+
+        # Changing field 'IsoformExperimentData.amount_1'
+        db.alter_column('data_isoformexperimentdata', 'amount_1', self.gf('django.db.models.fields.DecimalField')(null=True, max_digits=15, decimal_places=6))
+
+        # Changing field 'IsoformExperimentData.amount_2'
+        db.alter_column('data_isoformexperimentdata', 'amount_2', self.gf('django.db.models.fields.DecimalField')(null=True, max_digits=15, decimal_places=6))
+
+        if db.backend_name == 'sqlite3':
+            for table in TABLES:
+                for column in ('experiment_type_id', 'gene_id'):
+                    db.create_index(table, [column])
+        for columns in INDEXES:
+            db.create_index('data_geneexperimentdata', columns)
+
+    models = {
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'data.comparison': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'sample_1', 'sample_2'),)", 'object_name': 'Comparison'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'blank': 'True'})
+        },
+        'data.experimentsummary': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id'),)", 'object_name': 'ExperimentSummary'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change_histogram': ('django.db.models.fields.TextField', [], {'default': "'[]'"}),
+            'genes': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'p_value_histogram': ('django.db.models.fields.TextField', [], {'default': "'[]'"}),
+            'significant_down': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'significant_up': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'stale': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'statuses': ('django.db.models.fields.TextField', [], {'default': "'{}'"}),
+            'tested': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'})
+        },
+        'data.geneexperimentdata': {
+            'Meta': {'object_name': 'GeneExperimentData'},
+            'amount_1': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'comparison': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['data.Comparison']", 'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.FloatField', [], {}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'significant_flag': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.importjob': {
+            'Meta': {'ordering': "['created']", 'object_name': 'ImportJob'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'data_type': ('django.db.models.fields.CharField', [], {'default': "'gene'", 'max_length': '10'}),
+            'error': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'mode': ('django.db.models.fields.CharField', [], {'default': "'append'", 'max_length': '10'}),
+            'result': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'rows_processed': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'started': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'queued'", 'max_length': '10', 'db_index': 'True'}),
+            'uploaded_file': ('django.db.models.fields.files.FileField', [], {'max_length': '100'}),
+            'worker': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'})
+        },
+        'data.isoformexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'isoform'),)", 'object_name': 'IsoformExperimentData'},
+            'amount_1': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'comparison': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['data.Comparison']", 'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'isoform': ('django.db.models.fields.CharField', [], {'max_length': '30'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.FloatField', [], {}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'significant_flag': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.rankedgene': {
+            'Meta': {'ordering': "['rank']", 'unique_together': "(('experiment_type', 'experiment_id', 'ranking', 'rank'),)", 'object_name': 'RankedGene'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'rank': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'ranking': ('django.db.models.fields.CharField', [], {'max_length': '10'})
+        },
+        'data.tssgroupexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'tss_group'),)", 'object_name': 'TSSGroupExperimentData'},
+            'amount_1': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'comparison': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['data.Comparison']", 'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.FloatField', [], {}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'significant': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'significant_flag': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'tss_group': ('django.db.models.fields.CharField', [], {'max_length': '30'})
+        },
+        'genes.gene': {
+            'Meta': {'object_name': 'Gene'},
+            'band': ('django.db.models.fields.CharField', [], {'max_length': '5', 'null': 'True', 'blank': 'True'}),
+            'chromosome': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'end': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'ensemblID': ('django.db.models.fields.CharField', [], {'max_length': '30', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.SlugField', [], {'max_length': '50', 'primary_key': 'True'}),
+            'start': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '15', 'null': 'True', 'blank': 'True'}),
+            'strand': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'transcript_count': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'type': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['data']
\ No newline at end of file
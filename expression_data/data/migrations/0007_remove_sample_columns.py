@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+#The composite indexes of migration 0002, which are created again once the columns are changed.
+INDEXES = (
+    ['experiment_type_id', 'experiment_id', 'gene_id'],
+    ['gene_id', 'experiment_type_id', 'experiment_id'],
+    ['experiment_type_id', 'experiment_id', 'q_value'],
+)
+
+#The data tables, which SQLite copies to change their columns, dropping their indexes other than unique constraints.
+TABLES = ('data_geneexperimentdata', 'data_isoformexperimentdata', 'data_tssgroupexperimentdata')
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        for table in TABLES:
+            # Deleting fields 'sample_1', 'sample_2' and 'significant', which have moved to the comparison and significant_flag
+            db.delete_column(table, 'sample_2')
+            db.delete_column(table, 'sample_1')
+            db.delete_column(table, 'significant')
+
+            # Renaming field 'significant_flag' to 'significant'
+            db.rename_column(table, 'significant_flag', 'significant')
+
+        if db.backend_name == 'sqlite3':
+            for table in TABLES:
+                for column in ('experiment_type_id', 'gene_id', 'comparison_id'):
+                    db.create_index(table, [column])
+        for columns in INDEXES:
+            db.create_index('data_geneexperimentdata', columns)
+
+    def backwards(self, orm):
+        for columns in INDEXES:
+            db.delete_index('data_geneexperimentdata', columns)
+
+        for table in TABLES:
+            # Renaming field 'significant' to 'significant_flag'
+            db.rename_column(table, 'significant', 'significant_flag')
+
+            # Adding fields 'sample_1', 'sample_2' and 'significant'
+            db.add_column(table, 'sample_1',
+                          self.gf('django.db.models.fields.CharField')(max_length=20, null=True, blank=True),
+                          keep_default=False)
+            db.add_column(table, 'sample_2',
+                          self.gf('django.db.models.fields.CharField')(max_length=20, null=True, blank=True),
+                          keep_default=False)
+            db.add_column(table, 'significant',
+                          self.gf('django.db.models.fields.CharField')(max_length=3, null=True, blank=True),
+                          keep_default=False)
+
+    models = {
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'data.comparison': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'sample_1', 'sample_2'),)", 'object_name': 'Comparison'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'sample_1': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'blank': 'True'}),
+            'sample_2': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'blank': 'True'})
+        },
+        'data.experimentsummary': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id'),)", 'object_name': 'ExperimentSummary'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change_histogram': ('django.db.models.fields.TextField', [], {'default': "'[]'"}),
+            'genes': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'p_value_histogram': ('django.db.models.fields.TextField', [], {'default': "'[]'"}),
+            'significant_down': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'significant_up': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'stale': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'statuses': ('django.db.models.fields.TextField', [], {'default': "'{}'"}),
+            'tested': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'})
+        },
+        'data.geneexperimentdata': {
+            'Meta': {'object_name': 'GeneExperimentData'},
+            'amount_1': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'comparison': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['data.Comparison']", 'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.FloatField', [], {}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'significant': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.importjob': {
+            'Meta': {'ordering': "['created']", 'object_name': 'ImportJob'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'data_type': ('django.db.models.fields.CharField', [], {'default': "'gene'", 'max_length': '10'}),
+            'error': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'mode': ('django.db.models.fields.CharField', [], {'default': "'append'", 'max_length': '10'}),
+            'result': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'rows_processed': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'started': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'queued'", 'max_length': '10', 'db_index': 'True'}),
+            'uploaded_file': ('django.db.models.fields.files.FileField', [], {'max_length': '100'}),
+            'worker': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'})
+        },
+        'data.isoformexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'isoform'),)", 'object_name': 'IsoformExperimentData'},
+            'amount_1': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'comparison': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['data.Comparison']", 'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'isoform': ('django.db.models.fields.CharField', [], {'max_length': '30'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.FloatField', [], {}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'significant': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'})
+        },
+        'data.rankedgene': {
+            'Meta': {'ordering': "['rank']", 'unique_together': "(('experiment_type', 'experiment_id', 'ranking', 'rank'),)", 'object_name': 'RankedGene'},
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'rank': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'ranking': ('django.db.models.fields.CharField', [], {'max_length': '10'})
+        },
+        'data.tssgroupexperimentdata': {
+            'Meta': {'unique_together': "(('experiment_type', 'experiment_id', 'gene', 'tss_group'),)", 'object_name': 'TSSGroupExperimentData'},
+            'amount_1': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'amount_2': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'comparison': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['data.Comparison']", 'null': 'True', 'blank': 'True'}),
+            'experiment_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'experiment_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'fold_change': ('django.db.models.fields.FloatField', [], {}),
+            'gene': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['genes.Gene']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'internal_id': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'locus': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'p_value': ('django.db.models.fields.FloatField', [], {}),
+            'q_value': ('django.db.models.fields.FloatField', [], {}),
+            'significant': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'test_statistic': ('django.db.models.fields.FloatField', [], {'null': 'True', 'blank': 'True'}),
+            'tss_group': ('django.db.models.fields.CharField', [], {'max_length': '30'})
+        },
+        'genes.gene': {
+            'Meta': {'object_name': 'Gene'},
+            'band': ('django.db.models.fields.CharField', [], {'max_length': '5', 'null': 'True', 'blank': 'True'}),
+            'chromosome': ('django.db.models.fields.CharField', [], {'max_length': '3', 'null': 'True', 'blank': 'True'}),
+            'end': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'ensemblID': ('django.db.models.fields.CharField', [], {'max_length': '30', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.SlugField', [], {'max_length': '50', 'primary_key': 'True'}),
+            'start': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'max_length': '15', 'null': 'True', 'blank': 'True'}),
+            'strand': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'transcript_count': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'type': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['data']
\ No newline at end of file
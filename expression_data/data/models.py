@@ -1,14 +1,58 @@
 '''These models control the data saved into the database for a given experiment.
 
 There is a generic base class named Data, which is then further subclassed into specific data models.
+Uploaded files waiting to be imported are tracked as :class:`~data.models.ImportJob` objects.
 '''
 
-from django.db import models
+import uuid
+
+from django.db import models, transaction, IntegrityError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 
+from experiments.models import mRNASeqExperiment, MicroArrayExperiment
 from genes.models import Gene
 
+CUFFLINKS_DATA_TYPES = (
+    ('gene', 'Genes (gene_exp.diff)'),
+    ('isoform', 'Isoforms (isoform_exp.diff)'),
+    ('tss_group', 'TSS groups (tss_group_exp.diff)'),)
+
+RANKINGS = (
+    ('q_value', 'Most significant'),
+    ('up', 'Most increased'),
+    ('down', 'Most decreased'),)
+
+IMPORT_MODES = (
+    ('append', 'Add to existing data'),
+    ('replace', 'Replace existing data'),
+    ('upsert', 'Update changed genes'),)
+
+class ExperimentDataManager(models.Manager):
+    '''This manager provides the common lookups of data objects, written to use the indexes on the data tables.
+
+    The data of an experiment use the (experiment_type, experiment_id, gene) index, the data of a gene use the (gene, experiment_type, experiment_id) index
+    and the significant results of an experiment use the (experiment_type, experiment_id, q_value) index, see the **data** migrations.
+    '''
+
+    def for_experiment(self, experiment):
+        '''Returns the data for an experiment, ordered by gene.'''
+        experiment_type = ContentType.objects.get_for_model(experiment)
+        return self.filter(experiment_type=experiment_type, experiment_id=experiment.pk).order_by('gene')
+
+    def for_gene(self, gene):
+        '''Returns the data for a gene in every experiment, ordered by experiment.
+
+        The experiment type is ordered by its column, as ordering by the foreign key would join the content types.
+        '''
+        return self.filter(gene=gene).extra(order_by=['%s.experiment_type_id' % self.model._meta.db_table, 'experiment_id'])
+
+    def significant(self, experiment, q_value=0.05):
+        '''Returns the data for an experiment with a q-value below the threshold, ordered from the most significant.'''
+        return self.for_experiment(experiment).filter(q_value__lt=q_value).order_by('q_value')
+
 class BaseData(models.Model):
     '''This is the abstract base class for all data objects.
     
@@ -24,6 +68,8 @@ class BaseData(models.Model):
     experiment = generic.GenericForeignKey('experiment_type', 'experiment_id')
 
     gene = models.ForeignKey(Gene, help_text="The gene for these data.")
+
+    objects = ExperimentDataManager()
     
     def __unicode__(self):
         '''The unicode representation is the name.'''
@@ -33,30 +79,304 @@ class BaseData(models.Model):
         '''This is an abstract model.'''
         abstract = True
         
-class GeneExperimentData(BaseData):                
-    '''These data are for gene-level data, aggregated per experiment.
-    
-    These data can be used with :class:`~experiments.models.mRNASeqExperiment` or :class:`~experiments.models.MicroArrayExperiment` experiments.
-    This is an extension of the abstract base model :class:`data.models.BaseData`.
-    The fields in this model are based on the columns in the gene_exp.diff from cufflinks.  See http://cufflinks.cbcb.umd.edu/manual.html#cuffdiff_output for more details.
-    The required fields are **gene**, **experiment**, **fold_change**, **p_value** and **q_value**.
+class Comparison(models.Model):
+    '''This model is a comparison between two groups of samples within an experiment, such as the control and treated groups.
+
+    The names of the groups are stored once for each comparison of an experiment, rather than on every row of its :class:`~data.models.ExperimentData`.
+    Comparisons are created by :func:`~data.utilities.write_gene_experiment_data` for the sample names of the imported rows.
+    '''
+
+    experiment_type = models.ForeignKey(ContentType, limit_choices_to = BaseData.experiment_type_choices, help_text="Experiment Type")
+    experiment_id = models.PositiveIntegerField()
+    experiment = generic.GenericForeignKey('experiment_type', 'experiment_id')
+
+    sample_1 = models.CharField(max_length=50, blank=True, null=True, help_text="The name of the first group in the comparason.")
+    sample_2 = models.CharField(max_length=50, blank=True, null=True, help_text="The name of the second group in the comparason.")
+
+    def __unicode__(self):
+        '''The unicode representation is the names of the two groups.'''
+        return "%s / %s" % (self.sample_1 or '', self.sample_2 or '')
+
+    class Meta:
+        '''Each pair of groups is compared once within an experiment.'''
+        unique_together = ('experiment_type', 'experiment_id', 'sample_1', 'sample_2')
+
+class ExperimentData(BaseData):
+    '''This is the abstract base class for data aggregated per experiment, with the average amount in each group and the statistical test between them.
+
+    These fields are shared by the gene, isoform and TSS group level files written by cuffdiff.
+    The values are stored as floats, so tiny p-values and infinite fold changes are kept, and a missing amount or test statistic is stored as NULL rather than NaN.
+    The names of the groups are stored in the :class:`~data.models.Comparison` of each row.
     '''
     
     locus = models.CharField(max_length=20, blank=True, null=True, help_text="Chromosomal location of this gene.")
     internal_id = models.CharField(max_length=20, blank=True, null=True, help_text="The probe id, or internal identification code for this gene.")
-    sample_1 = models.CharField(max_length=20, blank=True, null=True, help_text="The name of the first group in the comparason.")
-    sample_2 = models.CharField(max_length=20, blank=True, null=True, help_text="The name of the second group in the comparason.")
-    amount_1 = models.DecimalField(max_digits=15, decimal_places=6, blank=True, null=True, help_text="The amount in the first group.")
-    amount_2 = models.DecimalField(max_digits=15, decimal_places=6, blank=True, null=True, help_text="The amount in the second group.")
+    comparison = models.ForeignKey(Comparison, blank=True, null=True, help_text="The groups compared.")
+    amount_1 = models.FloatField(blank=True, null=True, help_text="The amount in the first group.")
+    amount_2 = models.FloatField(blank=True, null=True, help_text="The amount in the second group.")
     status = models.CharField(max_length=20, blank=True, null=True, help_text="The status code of the test.")
     fold_change = models.FloatField(help_text="The log(2) fold change.")
     test_statistic = models.FloatField(blank=True, null=True, help_text="The value of the test statistic used to compute significance.")
-    p_value = models.DecimalField(max_digits=9, decimal_places=8, help_text="Unadjusted p-value.")
-    q_value = models.DecimalField(max_digits=9, decimal_places=8, help_text="Multiple Comparason Adjusted p-value (Typically FDR)")
-    significant = models.CharField(max_length=3, blank=True, null=True, help_text="Is the q-value < 0.05?")
+    p_value = models.FloatField(help_text="Unadjusted p-value.")
+    q_value = models.FloatField(help_text="Multiple Comparason Adjusted p-value (Typically FDR)")
+    significant = models.BooleanField(default=False, help_text="Is the q-value < 0.05?")
+    
+    class Meta:
+        '''This is an abstract model.'''
+        abstract = True
+
+class GeneExperimentData(ExperimentData):                
+    '''These data are for gene-level data, aggregated per experiment.
+    
+    These data can be used with :class:`~experiments.models.mRNASeqExperiment` or :class:`~experiments.models.MicroArrayExperiment` experiments.
+    This is an extension of the abstract base model :class:`data.models.ExperimentData`.
+    The fields in this model are based on the columns in the gene_exp.diff from cufflinks.  See http://cufflinks.cbcb.umd.edu/manual.html#cuffdiff_output for more details.
+    The required fields are **gene**, **experiment**, **fold_change**, **p_value** and **q_value**.
+    '''
     
     class Meta:
         '''Updated the verbose name of the datum.'''
         verbose_name_plural = 'Experiment Level Data for a Gene' 
         verbose_name = 'Experiment Level Datum for a Gene' 
-    
\ No newline at end of file
+
+class IsoformExperimentData(ExperimentData):
+    '''These data are for isoform-level data from the isoform_exp.diff of cufflinks, aggregated per experiment.
+
+    These data are used with :class:`~experiments.models.mRNASeqExperiment` experiments.
+    This is an extension of the abstract base model :class:`data.models.ExperimentData`, where the internal_id is the cufflinks gene id.
+    Each isoform of a gene is stored once per experiment and comparison, which also indexes these data by experiment, gene, comparison and isoform.
+    '''
+
+    isoform = models.CharField(max_length=30, help_text="The cufflinks transcript id of this isoform.")
+
+    def __unicode__(self):
+        '''The unicode representation is the gene and isoform.'''
+        return "%s (%s)" % (self.gene, self.isoform)
+
+    class Meta:
+        '''An isoform is unique within an experiment and comparison and the verbose name is updated.'''
+        unique_together = ('experiment_type', 'experiment_id', 'gene', 'comparison', 'isoform')
+        verbose_name_plural = 'Experiment Level Data for an Isoform'
+        verbose_name = 'Experiment Level Datum for an Isoform'
+
+class TSSGroupExperimentData(ExperimentData):
+    '''These data are for transcription start site level data from the tss_group_exp.diff of cufflinks, aggregated per experiment.
+
+    These data are used with :class:`~experiments.models.mRNASeqExperiment` experiments.
+    This is an extension of the abstract base model :class:`data.models.ExperimentData`, where the internal_id is the cufflinks gene id.
+    Each TSS group of a gene is stored once per experiment and comparison, which also indexes these data by experiment, gene, comparison and TSS group.
+    '''
+
+    tss_group = models.CharField(max_length=30, help_text="The cufflinks id of this group of isoforms sharing a transcription start site.")
+
+    def __unicode__(self):
+        '''The unicode representation is the gene and TSS group.'''
+        return "%s (%s)" % (self.gene, self.tss_group)
+
+    class Meta:
+        '''A TSS group is unique within an experiment and comparison and the verbose name is updated.'''
+        unique_together = ('experiment_type', 'experiment_id', 'gene', 'comparison', 'tss_group')
+        verbose_name_plural = 'Experiment Level Data for a TSS Group'
+        verbose_name = 'Experiment Level Datum for a TSS Group'
+
+class RankedGene(BaseData):
+    '''These are the significant genes of an experiment, in order of one of the **RANKINGS**.
+
+    The rankings are computed from the :class:`~data.models.GeneExperimentData` of the experiment by :func:`~data.rankings.compute_rankings`.
+    The fold change and q-value are copied from those data, so the first entries of a ranking can be read without touching the data table.
+    '''
+
+    ranking = models.CharField(max_length=10, choices=RANKINGS, help_text="The order of this list.")
+    rank = models.PositiveIntegerField(help_text="The position of this gene in the ranking, starting at 1.")
+    fold_change = models.FloatField(help_text="The log(2) fold change.")
+    q_value = models.FloatField(help_text="Multiple Comparason Adjusted p-value (Typically FDR)")
+
+    def __unicode__(self):
+        '''The unicode representation is the rank and gene.'''
+        return "%i. %s" % (self.rank, self.gene_id)
+
+    class Meta:
+        '''The ranks are unique within each ranking of an experiment, and this index is used to read the top of a ranking.'''
+        unique_together = ('experiment_type', 'experiment_id', 'ranking', 'rank')
+        ordering = ['rank']
+
+class ExperimentSummaryManager(models.Manager):
+    '''This manager marks the summaries of experiments as out of date.'''
+
+    def mark_stale(self, experiment_type_id, experiment_id):
+        '''Marks the summary of an experiment, given the id of its content type and its primary key, as out of date, creating an empty one if there is none.'''
+        if not self.filter(experiment_type=experiment_type_id, experiment_id=experiment_id).update(stale=True):
+            self.create(experiment_type_id=experiment_type_id, experiment_id=experiment_id, stale=True)
+
+class ExperimentSummary(models.Model):
+    '''This model holds the summary statistics of the :class:`~data.models.GeneExperimentData` of an experiment, so experiments can be listed without reading their data.
+
+    The summaries are written by :func:`~data.utilities.write_gene_experiment_data` as it imports the data, see :mod:`data.summaries`.
+    When data are changed in any other way the summary is marked as stale and computed again when it is next read.
+    The status counts and histograms are stored as JSON.
+    '''
+
+    experiment_type = models.ForeignKey(ContentType, limit_choices_to = BaseData.experiment_type_choices, help_text="Experiment Type")
+    experiment_id = models.PositiveIntegerField()
+    experiment = generic.GenericForeignKey('experiment_type', 'experiment_id')
+
+    genes = models.PositiveIntegerField(default=0, help_text="The number of genes measured.")
+    tested = models.PositiveIntegerField(default=0, help_text="The number of genes tested, with an OK status.")
+    significant_up = models.PositiveIntegerField(default=0, help_text="The number of significant genes with a positive fold change.")
+    significant_down = models.PositiveIntegerField(default=0, help_text="The number of significant genes with a negative fold change.")
+    statuses = models.TextField(default='{}', help_text="The number of genes with each status.")
+    fold_change_histogram = models.TextField(default='[]', help_text="The number of genes in each bin of log(2) fold change.")
+    p_value_histogram = models.TextField(default='[]', help_text="The number of genes in each bin of p-value.")
+    stale = models.BooleanField(default=False, help_text="Have the data changed since this summary was computed?")
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = ExperimentSummaryManager()
+
+    def __unicode__(self):
+        '''The unicode representation is the experiment.'''
+        return "Summary of %s" % self.experiment
+
+    class Meta:
+        '''There is one summary for each experiment.'''
+        unique_together = ('experiment_type', 'experiment_id')
+        verbose_name_plural = 'Experiment Summaries'
+
+class ImportJob(models.Model):
+    '''This model is a queued import of an uploaded file into an experiment.
+
+    Jobs are created by :class:`~data.views.CufflinksImportFormView` and run by the **run_import_jobs** management command, see :mod:`data.jobs`.
+    The experiment is defined by a Generic ForeignKey as for :class:`~data.models.BaseData`.
+    '''
+
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('finished', 'Finished'),
+        ('failed', 'Failed'),)
+
+    experiment_type = models.ForeignKey(ContentType, limit_choices_to = BaseData.experiment_type_choices, help_text="Experiment Type")
+    experiment_id = models.PositiveIntegerField()
+    experiment = generic.GenericForeignKey('experiment_type', 'experiment_id')
+
+    uploaded_file = models.FileField(upload_to='imports/%Y/%m/%d', help_text="The file to be imported.")
+    data_type = models.CharField(max_length=10, choices=CUFFLINKS_DATA_TYPES, default='gene', help_text="Which cufflinks file this is, not used for microarray experiments.")
+    mode = models.CharField(max_length=10, choices=IMPORT_MODES, default='append', help_text="What happens to data already stored for this experiment.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True, help_text="The state of this job.")
+    worker = models.CharField(max_length=100, blank=True, null=True, help_text="The worker process which ran this job.")
+    rows_processed = models.PositiveIntegerField(default=0, help_text="How many rows have been imported.")
+    result = models.CharField(max_length=100, blank=True, null=True, help_text="The summary returned by the importer.")
+    error = models.TextField(blank=True, null=True, help_text="Why the import failed.")
+
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    heartbeat = models.DateTimeField(blank=True, null=True, help_text="When the worker running this job last reported its progress.")
+    finished = models.DateTimeField(blank=True, null=True)
+
+    def __unicode__(self):
+        '''The unicode representation is the job number and the experiment.'''
+        return "Import %s into %s" % (self.pk, self.experiment)
+
+    @models.permalink
+    def get_absolute_url(self):
+        '''The permalink for the status of a job is /data/import_jobs/<id>.'''
+        return ('import-job-status', [int(self.id)])
+
+    class Meta:
+        '''Jobs are run in the order they were queued.'''
+        ordering = ['created']
+
+class DataVersionManager(models.Manager):
+    '''This manager reads and changes the versions of data.'''
+
+    #The number of versions read or changed by each query.
+    batch_size = 500
+
+    def tokens(self, keys):
+        '''Returns a dictionary of the version keys to their tokens, leaving out keys which have no version yet.'''
+        keys = list(keys)
+        tokens = {}
+        for start in range(0, len(keys), self.batch_size):
+            tokens.update(self.filter(name__in=keys[start:start + self.batch_size]).values_list('name', 'token'))
+        return tokens
+
+    def change(self, keys):
+        '''Replaces the token of each of the version keys with a new one, creating versions which do not exist.
+
+        A version created by another process in the meantime is updated instead.
+        '''
+        keys = list(set(keys))
+        token = uuid.uuid4().hex
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            if self.filter(name__in=batch).update(token=token) == len(batch):
+                continue
+            missing = set(batch).difference(self.filter(name__in=batch).values_list('name', flat=True))
+            savepoint = transaction.savepoint(using=self.db)
+            try:
+                self.bulk_create([self.model(name=key, token=token) for key in missing])
+                transaction.savepoint_commit(savepoint, using=self.db)
+            except IntegrityError:
+                transaction.savepoint_rollback(savepoint, using=self.db)
+                for key in missing:
+                    if not self.get_or_create(name=key, defaults={'token': token})[1]:
+                        self.filter(name=key).update(token=token)
+        transaction.commit_unless_managed(using=self.db)
+
+class DataVersion(models.Model):
+    '''This model holds the version of some data, such as a gene or an experiment, a token which is replaced whenever the data change, see :mod:`data.cache`.
+
+    Versions are stored in the database rather than the cache, so a change made by one process, such as an import worker, is seen by every other process once it is committed.
+    '''
+
+    name = models.CharField(max_length=100, primary_key=True, help_text="The version key, such as version:experiment:<type>_<id>.")
+    token = models.CharField(max_length=32, help_text="Changed whenever the data change.")
+
+    objects = DataVersionManager()
+
+    def __unicode__(self):
+        '''The unicode representation is the version key.'''
+        return self.name
+
+@receiver(post_save, sender=GeneExperimentData)
+@receiver(post_delete, sender=GeneExperimentData)
+def invalidate_derived_data(sender, instance, **kwargs):
+    '''This signal receiver removes the data derived from the :class:`~data.models.GeneExperimentData` of an experiment when one of them is saved or deleted.
+
+    These are the cached columns, see :mod:`data.columns`, and the :class:`~data.models.RankedGene` lists, see :mod:`data.rankings`.
+    Both are rebuilt when they are next read, and the :class:`~data.models.ExperimentSummary` is marked as stale.
+    The versions of the gene and experiment are also changed, so their cached responses are no longer used, see :mod:`data.cache`.
+    '''
+    from data.cache import invalidate_experiment, invalidate_genes
+    from data.columns import invalidate_experiment_columns
+    invalidate_experiment_columns(instance.experiment_type_id, instance.experiment_id)
+    invalidate_experiment(instance.experiment_type_id, instance.experiment_id)
+    invalidate_genes([instance.gene_id])
+    RankedGene.objects.filter(experiment_type=instance.experiment_type_id, experiment_id=instance.experiment_id).delete()
+    ExperimentSummary.objects.mark_stale(instance.experiment_type_id, instance.experiment_id)
+
+@receiver(post_save, sender=mRNASeqExperiment)
+@receiver(post_save, sender=MicroArrayExperiment)
+@receiver(post_delete, sender=mRNASeqExperiment)
+@receiver(post_delete, sender=MicroArrayExperiment)
+def invalidate_experiment_responses(sender, instance, **kwargs):
+    '''This signal receiver changes the version of an experiment when it is saved or deleted, as its details are shown on the gene pages, see :mod:`data.cache`.'''
+    from data.cache import invalidate_experiment
+    invalidate_experiment(ContentType.objects.get_for_model(instance).pk, instance.pk)
+
+@receiver(post_delete, sender=mRNASeqExperiment)
+@receiver(post_delete, sender=MicroArrayExperiment)
+def delete_experiment_comparisons(sender, instance, **kwargs):
+    '''This signal receiver deletes the :class:`~data.models.Comparison` objects of an experiment when it is deleted.
+
+    The data of the experiment are deleted first, each model with a single DELETE statement, as otherwise deleting the comparisons would delete their data one row at a time.
+    '''
+    from data.utilities import delete_experiment_data
+    for model in (GeneExperimentData, IsoformExperimentData, TSSGroupExperimentData):
+        delete_experiment_data(model, instance)
+    Comparison.objects.filter(experiment_type=ContentType.objects.get_for_model(instance), experiment_id=instance.pk).delete()
+
+@receiver(post_delete, sender=mRNASeqExperiment)
+@receiver(post_delete, sender=MicroArrayExperiment)
+def delete_experiment_summary(sender, instance, **kwargs):
+    '''This signal receiver deletes the :class:`~data.models.ExperimentSummary` of an experiment when it is deleted.'''
+    ExperimentSummary.objects.filter(experiment_type=ContentType.objects.get_for_model(instance), experiment_id=instance.pk).delete()
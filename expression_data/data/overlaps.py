@@ -0,0 +1,112 @@
+'''This package compares the significant genes of several experiments, returning their intersection, union, the genes unique to each experiment and the regions of a Venn diagram.
+
+The significant genes of each experiment are a bitset over the global gene index of :mod:`data.columns`, packed eight genes to a byte.
+For the default thresholds the bitsets are the ones written with the columns, see :func:`~data.columns.experiment_bitset`,
+and for other thresholds they are computed from the q-value and fold change columns.
+As every bitset is aligned to the same index, the comparisons are bitwise operations over arrays of bytes rather than joins of the data tables.
+'''
+
+import numpy
+
+from data.columns import experiment_bitset, experiment_column, gene_index, SIGNIFICANT_Q_VALUE
+
+DIRECTIONS = ('any', 'up', 'down')
+MAXIMUM_EXPERIMENTS = 32
+#Venn diagram regions are returned for up to this many experiments, as there are 2**n - 1 of them.
+MAXIMUM_VENN_SETS = 5
+
+#The number of set bits in each byte.
+POPCOUNT = numpy.array([bin(byte).count('1') for byte in range(256)], dtype=numpy.uint16)
+
+def significant_genes(experiment, q_value=SIGNIFICANT_Q_VALUE, fold_change=0, direction='any', size=None):
+    '''This function returns the packed bitset of the genes of an experiment with a q-value below q_value and an absolute log(2) fold change of at least fold_change.
+
+    The direction is one of **DIRECTIONS**, where up and down only include genes with a positive or negative fold change.
+    The bitset is padded with zeros to size bits, by default the length of the gene index.
+    '''
+
+    if direction not in DIRECTIONS:
+        raise ValueError("%s is not a direction, use one of %s" % (direction, ', '.join(DIRECTIONS)))
+    if size is None:
+        size = len(gene_index())
+    if q_value == SIGNIFICANT_Q_VALUE and fold_change == 0 and direction == 'any':
+        bits = experiment_bitset(experiment)
+    else:
+        q_values = numpy.asarray(experiment_column(experiment, 'q_value'))
+        fold_changes = numpy.asarray(experiment_column(experiment, 'fold_change'))
+        with numpy.errstate(invalid='ignore'):
+            selected = (q_values < q_value) & (numpy.abs(fold_changes) >= fold_change)
+            if direction == 'up':
+                selected &= fold_changes > 0
+            elif direction == 'down':
+                selected &= fold_changes < 0
+        bits = numpy.packbits(selected)
+    padded = numpy.zeros((size + 7) // 8, dtype=numpy.uint8)
+    length = min(len(bits), len(padded))
+    padded[:length] = bits[:length]
+    return padded
+
+def count_genes(bits):
+    '''This function returns the number of genes in a packed bitset.'''
+
+    return int(POPCOUNT[bits].sum())
+
+def gene_names(bits, index=None):
+    '''This function returns the names of the genes in a packed bitset, in the order of the gene index.'''
+
+    if index is None:
+        index = gene_index()
+    positions = numpy.flatnonzero(numpy.unpackbits(bits)[:len(index)])
+    return [unicode(name) for name in index[positions]]
+
+def compare_gene_sets(bitsets, index=None):
+    '''This function compares a list of packed bitsets of the same length, as returned by :func:`~data.overlaps.significant_genes`.
+
+    Returns a dictionary of:
+
+    * **counts**, the number of genes in each set.
+    * **intersection** and **union**, the genes in every set and in any set.
+    * **unique**, for each set the genes which are in no other set.
+    * **pairwise**, a matrix of the number of genes shared by each pair of sets.
+    * **regions**, if there are up to **MAXIMUM_VENN_SETS** sets, each region of their Venn diagram as the positions of the sets it is within and its genes.
+    '''
+
+    if index is None:
+        index = gene_index()
+    sets = numpy.vstack(bitsets)
+    union = numpy.bitwise_or.reduce(sets)
+    result = {
+        'counts': [count_genes(bits) for bits in sets],
+        'intersection': gene_names(numpy.bitwise_and.reduce(sets), index),
+        'union': gene_names(union, index),
+        'unique': [],
+        'pairwise': [[count_genes(first & second) for second in sets] for first in sets],
+    }
+    for position in range(len(sets)):
+        others = numpy.delete(sets, position, axis=0)
+        shared = numpy.bitwise_or.reduce(others) if len(others) else numpy.zeros_like(union)
+        result['unique'].append(gene_names(sets[position] & ~shared, index))
+    if len(sets) <= MAXIMUM_VENN_SETS:
+        result['regions'] = []
+        for mask in range(1, 2 ** len(sets)):
+            within = [position for position in range(len(sets)) if mask & (1 << position)]
+            bits = numpy.bitwise_and.reduce(sets[within])
+            outside = [position for position in range(len(sets)) if not mask & (1 << position)]
+            if outside:
+                bits = bits & ~numpy.bitwise_or.reduce(sets[outside])
+            result['regions'].append({'sets': within, 'genes': gene_names(bits, index)})
+    return result
+
+def compare_experiments(experiments, q_value=SIGNIFICANT_Q_VALUE, fold_change=0, direction='any'):
+    '''This function compares the significant genes of a list of experiments, see :func:`~data.overlaps.significant_genes` and :func:`~data.overlaps.compare_gene_sets`.
+
+    Raises a ValueError for no experiments or more than **MAXIMUM_EXPERIMENTS**.
+    '''
+
+    if not 0 < len(experiments) <= MAXIMUM_EXPERIMENTS:
+        raise ValueError("Between 1 and %i experiments can be compared" % MAXIMUM_EXPERIMENTS)
+    for experiment in experiments:
+        #building missing columns can extend the gene index, so this is done before reading it
+        experiment_bitset(experiment)
+    index = gene_index()
+    return compare_gene_sets([significant_genes(experiment, q_value, fold_change, direction, len(index)) for experiment in experiments], index)
@@ -0,0 +1,102 @@
+'''This package prepares the points of volcano and MA plots of an experiment, downsampled so the size of the data does not grow with the experiment.
+
+The significant genes and any labelled genes are returned as exact points, up to **MAXIMUM_POINTS** significant genes with the smallest q-values and **MAXIMUM_LABELS** labelled genes.
+The other genes, which are most of an experiment, are counted in a grid of two dimensional bins over the range of the plot,
+and only the bins containing genes are returned.
+The values are read from the :mod:`data.columns` of the experiment rather than from the database.
+
+The plots are:
+
+* volcano, the log(2) fold change against -log10 of the q-value.  Q-values of zero are plotted at the smallest non-zero q-value.
+* ma, the log(2) of the mean amount plus one against the log(2) fold change.
+'''
+
+import numpy
+
+from data.columns import experiment_column, gene_index, gene_positions, SIGNIFICANT_Q_VALUE
+
+PLOTS = ('volcano', 'ma')
+AXES = {'volcano': ('log2(fold_change)', '-log10(q_value)'), 'ma': ('log2(mean amount + 1)', 'log2(fold_change)')}
+BINS = 64
+MAXIMUM_BINS = 200
+#The most significant genes sent as exact points, the others are binned.
+MAXIMUM_POINTS = 2000
+#The most genes which can be labelled in a plot.
+MAXIMUM_LABELS = 100
+#Values are rounded to this many decimal places, which is finer than a plot can show.
+DECIMALS = 4
+
+def plot_coordinates(experiment, plot='volcano'):
+    '''This function returns arrays of the x and y coordinates of every gene of the gene index in a plot of an experiment, and their q-values.
+
+    Genes without data in the experiment have NaN coordinates.
+    '''
+
+    if plot not in PLOTS:
+        raise ValueError("%s is not a plot, use one of %s" % (plot, ', '.join(PLOTS)))
+    fold_changes = numpy.asarray(experiment_column(experiment, 'fold_change'))
+    q_values = numpy.asarray(experiment_column(experiment, 'q_value'))
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        if plot == 'volcano':
+            positive = q_values[q_values > 0]
+            smallest = len(positive) and positive.min() or 1
+            return fold_changes, -numpy.log10(numpy.where(q_values > 0, q_values, smallest)), q_values
+        amounts = (numpy.asarray(experiment_column(experiment, 'amount_1')) + numpy.asarray(experiment_column(experiment, 'amount_2'))) / 2
+        return numpy.log2(amounts + 1), fold_changes, q_values
+
+def _rounded(values):
+    '''This function returns an array as a list of floats rounded to **DECIMALS** places.'''
+
+    return numpy.round(values, DECIMALS).tolist()
+
+def plot_data(experiment, plot='volcano', q_value=SIGNIFICANT_Q_VALUE, genes=None, bins=BINS, points=MAXIMUM_POINTS):
+    '''This function returns the data of a volcano or MA plot of an experiment as a dictionary of:
+
+    * **plot**, **x** and **y**, the plot and the labels of its axes.
+    * **significant**, the number of genes with a q-value below q_value.
+    * **points**, the exact points of at most points genes with the smallest q-values below q_value and of the named genes, as lists of their gene, x, y and whether they are significant.
+    * **bins**, the other genes counted in a grid of bins by bins, as the x and y edges of the bins and a list of [x bin, y bin, count] of each bin with genes.
+
+    Genes without finite coordinates, such as those with a fold change to or from zero, are left out.
+    Raises a ValueError for an unknown plot, too many bins or more than **MAXIMUM_LABELS** named genes.
+    '''
+
+    if not 0 < bins <= MAXIMUM_BINS:
+        raise ValueError("The number of bins must be between 1 and %i" % MAXIMUM_BINS)
+    if genes and len(genes) > MAXIMUM_LABELS:
+        raise ValueError("At most %i genes can be labelled" % MAXIMUM_LABELS)
+    x, y, q_values = plot_coordinates(experiment, plot)
+    index = gene_index()[:len(x)]
+    finite = numpy.isfinite(x) & numpy.isfinite(y)
+    with numpy.errstate(invalid='ignore'):
+        significant = finite & (q_values < q_value)
+    exact = significant.copy()
+    if significant.sum() > points:
+        candidates = numpy.flatnonzero(significant)
+        exact[candidates[numpy.argsort(q_values[candidates], kind='mergesort')[points:]]] = False
+    if genes:
+        positions = gene_positions(index)
+        exact[[positions[gene] for gene in genes if gene in positions]] = True
+        exact &= finite
+    binned = finite & ~exact
+    ranges = [[float(values[finite].min()), float(values[finite].max())] if finite.any() else [0.0, 1.0] for values in (x, y)]
+    counts, x_edges, y_edges = numpy.histogram2d(x[binned], y[binned], bins=bins, range=ranges)
+    x_bins, y_bins = numpy.nonzero(counts)
+    x_label, y_label = AXES[plot]
+    return {
+        'plot': plot,
+        'x': x_label,
+        'y': y_label,
+        'significant': int(significant.sum()),
+        'points': {
+            'genes': [unicode(gene) for gene in index[exact]],
+            'x': _rounded(x[exact]),
+            'y': _rounded(y[exact]),
+            'significant': significant[exact].tolist(),
+        },
+        'bins': {
+            'x': _rounded(x_edges),
+            'y': _rounded(y_edges),
+            'counts': numpy.column_stack([x_bins, y_bins, counts[x_bins, y_bins]]).astype(int).tolist(),
+        },
+    }
@@ -0,0 +1,227 @@
+'''This package contains the read queries over the :class:`~data.models.GeneExperimentData` of an experiment, used by the data API.
+
+Whole experiments are exported with :func:`~data.queries.export_experiment_data`, which streams rows from a server side cursor rather than loading them.
+
+Pages of data use keyset pagination.  Rather than an OFFSET, each page continues after the ordering key of the last row of the previous page,
+which is passed as an opaque cursor.  The rows are ordered by an indexed column and the primary key, so each page is an index range scan
+and costs the same whichever page it is.
+'''
+
+import base64
+import csv
+import json
+import math
+import uuid
+import zlib
+from cStringIO import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+
+from data.models import GeneExperimentData
+
+#The fields of each row returned by the API, in order.
+DATA_FIELDS = ('gene', 'internal_id', 'locus', 'sample_1', 'sample_2', 'status', 'amount_1', 'amount_2',
+    'fold_change', 'test_statistic', 'p_value', 'q_value', 'significant')
+
+#The model names of the types of experiment which have data.
+EXPERIMENT_TYPES = ('mrnaseqexperiment', 'microarrayexperiment')
+
+#The lookup of each of the DATA_FIELDS, the sample names are read from the comparison of each row.
+DATA_LOOKUPS = tuple({'sample_1': 'comparison__sample_1', 'sample_2': 'comparison__sample_2'}.get(field, field) for field in DATA_FIELDS)
+
+#The DATA_FIELDS which are booleans, exported as yes or no.
+BOOLEAN_FIELDS = ('significant',)
+
+#The orderings of pages, each of which is the leading column of an index after the experiment.
+ORDERINGS = ('gene', 'q_value')
+
+MAXIMUM_PAGE_SIZE = 10000
+
+#The delimiter of each export format.
+EXPORT_FORMATS = {'tsv': '\t', 'csv': ','}
+EXPORT_CHUNK_SIZE = 2000
+
+def get_experiment(experiment_type, experiment_id):
+    '''This function returns an experiment given the model name of its type, such as mrnaseqexperiment or microarrayexperiment, and its primary key.
+
+    Raises a ValueError for an unknown type or experiment.
+    '''
+
+    if experiment_type not in EXPERIMENT_TYPES:
+        raise ValueError("%s is not an experiment type" % experiment_type)
+    experiment_model = ContentType.objects.get_by_natural_key('experiments', experiment_type).model_class()
+    try:
+        return experiment_model.objects.get(pk=experiment_id)
+    except experiment_model.DoesNotExist:
+        raise ValueError("There is no experiment %s" % experiment_id)
+
+def _finite_values(value):
+    '''This function returns a copy of a value for JSON, with infinite floats replaced by the strings inf and -inf, as in a gene_exp.diff file, and NaN by None.'''
+
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if math.isinf(value):
+            return value > 0 and 'inf' or '-inf'
+        return value
+    if isinstance(value, dict):
+        return dict((key, _finite_values(item)) for key, item in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return [_finite_values(item) for item in value]
+    return value
+
+def encode_json(value, **kwargs):
+    '''This function encodes a value as JSON for a response of the data API, passing any keyword arguments to json.dumps.
+
+    Infinite fold changes are stored, but json.dumps would write them as Infinity, which is not valid JSON.
+    They are written as the strings inf and -inf, and NaN as null.
+    '''
+
+    return json.dumps(_finite_values(value), allow_nan=False, **kwargs)
+
+def encode_cursor(value, pk):
+    '''This function encodes the ordering value and primary key of the last row of a page as a cursor string.'''
+
+    return base64.urlsafe_b64encode(json.dumps([value, pk]))
+
+def decode_cursor(cursor):
+    '''This function decodes a cursor string to the ordering value and primary key it was made from.  Raises a ValueError for an invalid cursor.'''
+
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        return value, int(pk)
+    except (TypeError, ValueError):
+        raise ValueError("%s is not a valid cursor" % cursor)
+
+def filter_experiment_data(experiment, genes=None, q_value=None, fold_change_min=None, fold_change_max=None):
+    '''This function returns the :class:`~data.models.GeneExperimentData` of an experiment, filtered by a list of gene names,
+    a q-value threshold (rows below it are returned) and a minimum and maximum fold change.
+    '''
+
+    data = GeneExperimentData.objects.for_experiment(experiment)
+    if genes:
+        data = data.filter(gene__in=genes)
+    if q_value is not None:
+        data = data.filter(q_value__lt=q_value)
+    if fold_change_min is not None:
+        data = data.filter(fold_change__gte=fold_change_min)
+    if fold_change_max is not None:
+        data = data.filter(fold_change__lte=fold_change_max)
+    return data
+
+def experiment_data_page(data, order='gene', cursor=None, limit=1000):
+    '''This function returns a page of rows from a QuerySet of :class:`~data.models.GeneExperimentData`, such as one from :func:`~data.queries.filter_experiment_data`.
+
+    The rows are ordered by the order field, one of **ORDERINGS**, then by primary key, and start after the cursor of the previous page.
+    Returns a list of dictionaries of the **DATA_FIELDS** and the cursor of the next page, which is None on the last page.
+    '''
+
+    if order not in ORDERINGS:
+        raise ValueError("%s is not an ordering, use one of %s" % (order, ', '.join(ORDERINGS)))
+    if not 0 < limit <= MAXIMUM_PAGE_SIZE:
+        raise ValueError("The page size must be between 1 and %i" % MAXIMUM_PAGE_SIZE)
+    data = data.order_by(order, 'pk')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        data = data.filter(**{'%s__gte' % order: value}).exclude(**{order: value, 'pk__lte': pk})
+    rows = [dict(zip(('pk',) + DATA_FIELDS, row)) for row in data.values_list('pk', *DATA_LOOKUPS)[:limit + 1]]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][order], rows[-1]['pk'])
+    for row in rows:
+        del row['pk']
+    return rows, next_cursor
+
+def stream_query(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    '''This generator yields the rows of a values_list QuerySet as tuples in lists of up to chunk_size rows, without loading the whole result.
+
+    The default cursors of PostgreSQL and MySQL fetch the whole result into memory, so on PostgreSQL the rows are read from a named, server side cursor
+    and on MySQL from an unbuffered MySQLdb SSCursor.  Other databases are read with fetchmany from a normal cursor, which SQLite already reads lazily.
+    The values are as returned by the database driver.
+
+    A streamed response is read after Django has sent request_finished and closed the database connection, so reading the rows opens a new connection.
+    It is closed when the generator finishes unless it is used within a managed transaction.
+    '''
+
+    connection = connections[queryset.db]
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    if connection.vendor == 'postgresql':
+        connection.cursor()
+        cursor = connection.connection.cursor(name='stream_%s' % uuid.uuid4().hex)
+        cursor.itersize = chunk_size
+    elif connection.vendor == 'mysql':
+        from MySQLdb.cursors import SSCursor
+        connection.cursor()
+        cursor = connection.connection.cursor(SSCursor)
+    else:
+        cursor = connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+        if not connection.is_managed():
+            connection.close()
+
+def _format_value(value, boolean=False):
+    '''This function formats a value for a TSV or CSV file, with an empty cell for None and yes or no for a boolean field, as in a gene_exp.diff file.
+
+    Boolean fields are given by the boolean argument rather than the type of the value, as the database driver may return them as 0 or 1.
+    '''
+
+    if value is None:
+        return ''
+    if boolean:
+        return value and 'yes' or 'no'
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+def export_experiment_data(data, format='tsv', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    '''This function returns a generator which yields a QuerySet of :class:`~data.models.GeneExperimentData`, such as one from :func:`~data.queries.filter_experiment_data`,
+    as a TSV or CSV file in chunks of bytes.
+
+    The file has a header of the **DATA_FIELDS** and a line for each row, in the order of the QuerySet.
+    The header is yielded before the query runs, then each chunk of chunk_size rows as it is read by :func:`~data.queries.stream_query`.
+    With compress the chunks are a gzip file, compressed as they are written.
+    Raises a ValueError for a format which is not one of the **EXPORT_FORMATS**.
+    '''
+
+    if format not in EXPORT_FORMATS:
+        raise ValueError("%s is not an export format, use one of %s" % (format, ', '.join(sorted(EXPORT_FORMATS))))
+    return _export_chunks(data, EXPORT_FORMATS[format], compress, chunk_size)
+
+def _export_chunks(data, delimiter, compress, chunk_size):
+    '''This generator yields the chunks of an export, see :func:`~data.queries.export_experiment_data`.'''
+
+    compressor = compress and zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\n')
+    booleans = [field in BOOLEAN_FIELDS for field in DATA_FIELDS]
+
+    def chunk(rows, flush=False):
+        writer.writerows(rows)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor:
+            text = compressor.compress(text)
+            if flush:
+                text += compressor.flush(zlib.Z_SYNC_FLUSH)
+        return text
+
+    yield chunk([DATA_FIELDS], flush=True)
+    for rows in stream_query(data.values_list(*DATA_LOOKUPS), chunk_size):
+        text = chunk([_format_value(value, boolean) for value, boolean in zip(row, booleans)] for row in rows)
+        if text:
+            yield text
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,66 @@
+'''This package computes and reads the ranked lists of significant genes in an experiment, stored as :class:`~data.models.RankedGene` objects.
+
+For each experiment there is a list for each of the **RANKINGS**, of the genes with a q-value below **RANKING_THRESHOLD**:
+
+* q_value, from the smallest q-value, ties broken by the largest absolute fold change.
+* up, the genes with a positive fold change, from the largest.
+* down, the genes with a negative fold change, from the most negative.
+
+The lists are computed from the :mod:`data.columns` of an experiment with NumPy, after each import by :func:`~data.utilities.write_gene_experiment_data`.
+They are removed when the data of the experiment change and recomputed when next read, so the top of a list is read with one indexed query.
+'''
+
+import numpy
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from data.columns import experiment_column, gene_index
+from data.models import GeneExperimentData, RankedGene, RANKINGS
+
+RANKING_THRESHOLD = 0.05
+
+def compute_rankings(experiment):
+    '''This function replaces the :class:`~data.models.RankedGene` lists of an experiment with lists computed from its current data.
+
+    Returns the number of ranked entries written.
+    '''
+
+    from data.utilities import delete_experiment_data, insert_rows
+
+    fold_changes = numpy.asarray(experiment_column(experiment, 'fold_change'))
+    q_values = numpy.asarray(experiment_column(experiment, 'q_value'))
+    names = gene_index()[:len(q_values)]
+    with numpy.errstate(invalid='ignore'):
+        significant = numpy.flatnonzero(q_values < RANKING_THRESHOLD)
+        orders = {
+            'q_value': significant[numpy.lexsort((-numpy.abs(fold_changes[significant]), q_values[significant]))],
+            'up': significant[fold_changes[significant] > 0][numpy.argsort(-fold_changes[significant][fold_changes[significant] > 0], kind='mergesort')],
+            'down': significant[fold_changes[significant] < 0][numpy.argsort(fold_changes[significant][fold_changes[significant] < 0], kind='mergesort')],
+        }
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    rows = []
+    for ranking, description in RANKINGS:
+        rows += [(experiment_type.pk, experiment.pk, ranking, rank, names[gene], float(fold_changes[gene]), float(q_values[gene]))
+            for rank, gene in enumerate(orders[ranking], 1)]
+    with transaction.commit_on_success():
+        delete_experiment_data(RankedGene, experiment)
+        return insert_rows(RankedGene, ['experiment_type_id', 'experiment_id', 'ranking', 'rank', 'gene_id', 'fold_change', 'q_value'], rows)
+
+def top_genes(experiment, ranking='q_value', count=50, q_value=RANKING_THRESHOLD):
+    '''This function returns the first count :class:`~data.models.RankedGene` objects of a ranking in an experiment, with a q-value below q_value.
+
+    The q_value can not be larger than **RANKING_THRESHOLD**.
+    The rankings are computed first if the data of the experiment changed since they were last computed.
+    '''
+
+    if ranking not in dict(RANKINGS):
+        raise ValueError("%s is not a ranking, use one of %s" % (ranking, ', '.join(name for name, description in RANKINGS)))
+    if q_value > RANKING_THRESHOLD:
+        raise ValueError("Only genes with a q-value below %g are ranked" % RANKING_THRESHOLD)
+    ranked = RankedGene.objects.for_experiment(experiment).filter(ranking=ranking).order_by('rank')
+    if not RankedGene.objects.for_experiment(experiment).exists() and GeneExperimentData.objects.significant(experiment, RANKING_THRESHOLD).exists():
+        compute_rankings(experiment)
+    if q_value < RANKING_THRESHOLD:
+        ranked = ranked.filter(q_value__lt=q_value)
+    return list(ranked[:count])
@@ -0,0 +1,149 @@
+'''This package computes the :class:`~data.models.ExperimentSummary` of an experiment, the counts of its genes and histograms of their fold changes and p-values.
+
+Summaries are added up with a :class:`~data.summaries.SummaryCounter` as rows are read, so :func:`~data.utilities.write_gene_experiment_data` fills them in while importing:
+a replacing import counts only the new rows, and an appending import adds them to the stored summary.
+An upserting import, or any change to the data outside of an import, marks the summary as stale,
+and stale summaries are computed again from the data in one pass when they are read with :func:`~data.summaries.experiment_summary` or :func:`~data.summaries.experiment_summaries`.
+
+Significant genes are those with a q-value below **SIGNIFICANT_Q_VALUE**, as for the :mod:`data.columns` bitsets.
+The fold change histogram has bins of **FOLD_CHANGE_EDGES**, with values beyond the edges, including infinite fold changes, counted in the first or last bin.
+The p-value histogram has bins of **P_VALUE_EDGES**.
+'''
+
+import json
+from collections import defaultdict
+
+import numpy
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from data.columns import SIGNIFICANT_Q_VALUE
+from data.models import ExperimentSummary, GeneExperimentData
+from data.queries import stream_query
+
+FOLD_CHANGE_EDGES = numpy.linspace(-10, 10, 41)
+P_VALUE_EDGES = numpy.linspace(0, 1, 21)
+
+class SummaryCounter(object):
+    '''This class adds up the summary of the rows of an experiment.'''
+
+    def __init__(self, summary=None):
+        '''The counts start from those of an :class:`~data.models.ExperimentSummary`, if one is passed.'''
+        self.genes = summary and summary.genes or 0
+        self.tested = summary and summary.tested or 0
+        self.significant_up = summary and summary.significant_up or 0
+        self.significant_down = summary and summary.significant_down or 0
+        self.statuses = defaultdict(int, summary and json.loads(summary.statuses) or {})
+        self.fold_changes = numpy.zeros(len(FOLD_CHANGE_EDGES) - 1, dtype=int)
+        self.p_values = numpy.zeros(len(P_VALUE_EDGES) - 1, dtype=int)
+        if summary:
+            self.fold_changes += json.loads(summary.fold_change_histogram)
+            self.p_values += json.loads(summary.p_value_histogram)
+
+    def add_columns(self, statuses, fold_changes, p_values, q_values):
+        '''Adds rows given as a list of statuses and sequences of their fold changes, p-values and q-values.'''
+        fold_changes = numpy.array(fold_changes, dtype=float)
+        p_values = numpy.array(p_values, dtype=float)
+        q_values = numpy.array(q_values, dtype=float)
+        self.genes += len(statuses)
+        for status in statuses:
+            self.statuses[status or ''] += 1
+        self.tested += sum(1 for status in statuses if status == 'OK')
+        with numpy.errstate(invalid='ignore'):
+            significant = q_values < SIGNIFICANT_Q_VALUE
+            self.significant_up += int((significant & (fold_changes > 0)).sum())
+            self.significant_down += int((significant & (fold_changes < 0)).sum())
+        fold_changes = numpy.clip(fold_changes[~numpy.isnan(fold_changes)], FOLD_CHANGE_EDGES[0], FOLD_CHANGE_EDGES[-1])
+        self.fold_changes += numpy.histogram(fold_changes, FOLD_CHANGE_EDGES)[0]
+        self.p_values += numpy.histogram(p_values[~numpy.isnan(p_values)], P_VALUE_EDGES)[0]
+
+    def add(self, rows):
+        '''Adds rows given as dictionaries of field values, such as those written by :func:`~data.utilities.write_gene_experiment_data`.'''
+        self.add_columns([row.get('status') for row in rows], [row['fold_change'] for row in rows],
+            [row['p_value'] for row in rows], [row['q_value'] for row in rows])
+
+    def save(self, experiment):
+        '''Stores these counts as the :class:`~data.models.ExperimentSummary` of an experiment, which is no longer stale.'''
+        experiment_type = ContentType.objects.get_for_model(experiment)
+        values = {
+            'genes': self.genes,
+            'tested': self.tested,
+            'significant_up': self.significant_up,
+            'significant_down': self.significant_down,
+            'statuses': json.dumps(dict(self.statuses), sort_keys=True),
+            'fold_change_histogram': json.dumps(self.fold_changes.tolist()),
+            'p_value_histogram': json.dumps(self.p_values.tolist()),
+            'stale': False,
+            'updated': timezone.now(),
+        }
+        summaries = ExperimentSummary.objects.filter(experiment_type=experiment_type, experiment_id=experiment.pk)
+        if not summaries.update(**values):
+            ExperimentSummary.objects.create(experiment_type=experiment_type, experiment_id=experiment.pk, **values)
+
+def stored_counter(experiment):
+    '''This function returns a :class:`~data.summaries.SummaryCounter` starting from the stored summary of an experiment,
+    or None if the summary is stale or there is none but the experiment has data.
+    '''
+
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    try:
+        summary = ExperimentSummary.objects.get(experiment_type=experiment_type, experiment_id=experiment.pk)
+    except ExperimentSummary.DoesNotExist:
+        if GeneExperimentData.objects.for_experiment(experiment).exists():
+            return None
+        return SummaryCounter()
+    if summary.stale:
+        return None
+    return SummaryCounter(summary)
+
+def compute_summary(experiment):
+    '''This function computes the summary of an experiment from its data in one pass and stores it.  Returns the :class:`~data.models.ExperimentSummary`.
+
+    This commits, so it is not called within the transaction of an import.
+    '''
+
+    counter = SummaryCounter()
+    data = GeneExperimentData.objects.for_experiment(experiment).order_by().values_list('status', 'fold_change', 'p_value', 'q_value')
+    with transaction.commit_on_success():
+        for rows in stream_query(data):
+            counter.add_columns(*[list(column) for column in zip(*rows)])
+        counter.save(experiment)
+    return ExperimentSummary.objects.get(experiment_type=ContentType.objects.get_for_model(experiment), experiment_id=experiment.pk)
+
+def experiment_summary(experiment):
+    '''This function returns the :class:`~data.models.ExperimentSummary` of an experiment, computing it if it is stale or missing.'''
+
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    try:
+        summary = ExperimentSummary.objects.get(experiment_type=experiment_type, experiment_id=experiment.pk)
+    except ExperimentSummary.DoesNotExist:
+        return compute_summary(experiment)
+    if summary.stale:
+        return compute_summary(experiment)
+    return summary
+
+def experiment_summaries():
+    '''This function returns the summaries of every experiment with one, computing any which are stale.
+
+    Unless some are stale this is a single query of the summary table.
+    '''
+
+    return [summary.stale and compute_summary(summary.experiment) or summary for summary in ExperimentSummary.objects.order_by('pk')]
+
+def summary_dict(summary):
+    '''This function returns an :class:`~data.models.ExperimentSummary` as a dictionary, for JSON responses.'''
+
+    return {
+        'experiment_type': ContentType.objects.get_for_id(summary.experiment_type_id).model,
+        'experiment_id': summary.experiment_id,
+        'genes': summary.genes,
+        'tested': summary.tested,
+        'significant_up': summary.significant_up,
+        'significant_down': summary.significant_down,
+        'statuses': json.loads(summary.statuses),
+        'fold_change_histogram': {'edges': FOLD_CHANGE_EDGES.tolist(), 'counts': json.loads(summary.fold_change_histogram)},
+        'p_value_histogram': {'edges': P_VALUE_EDGES.tolist(), 'counts': json.loads(summary.p_value_histogram)},
+        'updated': summary.updated.isoformat(),
+    }
@@ -5,22 +5,54 @@ This package contains the unit tests for the :mod:`data` app.
 There are tests for each model in this app.
 """
 
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from datetime import timedelta
+from cStringIO import StringIO
+
+import numpy
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
 from django.test.client import Client
+from django.test.utils import override_settings
+from django.db import connection, load_backend
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
-from data.models import GeneExperimentData
-from data.utilities import cufflinks_gene_diff_import
-from experiments.models import mRNASeqExperiment
+from data.cache import change_versions, experiment_version_key, get_versions
+from data.archives import create_experiment, export_archive, import_archive, read_archive
+from data import columns
+from data.columns import build_experiment_columns, experiment_column, experiment_directory, gene_index, gene_positions, version_directory
+from data.jobs import fail_stale_jobs, job_timeout, process_import_jobs, worker_name
+from data.benchmarks import benchmark_import, synthetic_gene_exp_diff, QueryCounter, UNKNOWN_GENE_PREFIX
+from data.models import GeneExperimentData, IsoformExperimentData, TSSGroupExperimentData, RankedGene, ExperimentSummary, ImportJob, Comparison, DataVersion
+from data.correlations import correlate, correlated_genes, rank_rows
+from data.overlaps import compare_experiments, count_genes, gene_names, significant_genes
+from data.plots import plot_data, MAXIMUM_LABELS
+from data.summaries import compute_summary, experiment_summaries, experiment_summary
+from data.queries import filter_experiment_data, export_experiment_data, _format_value, DATA_FIELDS
+from data.rankings import top_genes
+from data.utilities import cufflinks_gene_diff_import, cufflinks_diff_import, parallel_cufflinks_gene_diff_import, check_cufflinks_gene_diff, parse_cufflinks_gene_diff, read_cufflinks_gene_diff, read_cufflinks_gene_diff_chunks, RereadableLines, write_gene_experiment_data, InvalidRowsError, microarray_import, query_plan
+from experiments.models import mRNASeqExperiment, MicroArrayExperiment, DifferentialExpressionSoftware, ReferenceGenomeAssembly, Sample
 from genes.models import Gene
 
-MODELS = [GeneExperimentData,]
+MODELS = [GeneExperimentData, IsoformExperimentData, TSSGroupExperimentData, RankedGene, ExperimentSummary, ImportJob, Comparison]
 
 class GenericModelTests(TestCase):
     '''This bas class sets up the setUP and tearDown functions for model tests.'''
 
     def setUp(self):
-        '''Instantiate the test client.  Creates a test user.'''
+        '''Instantiate the test client.  Creates a test user and a temporary directory for the expression columns, and empties the cache of responses.'''
+        cache.clear()
         self.client = Client()
         self.test_user = User.objects.create_user('testuser', 'blah@blah.com', 'testpassword')
         self.test_user.is_superuser = True
@@ -29,12 +61,28 @@ class GenericModelTests(TestCase):
         self.assertEqual(self.test_user.is_superuser, True)
         login = self.client.login(username='testuser', password='testpassword')
         self.failUnless(login, 'Could not log in')
+        self.cache_settings = override_settings(EXPRESSION_CACHE_ROOT=tempfile.mkdtemp())
+        self.cache_settings.enable()
     
     def tearDown(self):
         '''Depopulate created model instances from test database.'''
         for model in MODELS:
             for obj in model.objects.all():
                 obj.delete()
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_settings.options['EXPRESSION_CACHE_ROOT'])
+
+    def import_changed_sample(self, experiment, changes):
+        '''Imports the sample gene_exp.diff into an experiment, with the fold change and q-value of some genes changed.
+
+        The changes are a dictionary of gene names to their (fold change, q-value) as strings.
+        '''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = [line.split('\t') for line in inputfile]
+        for line in lines:
+            if line[2] in changes:
+                line[9], line[12] = changes[line[2]]
+        cufflinks_gene_diff_import(experiment.pk, ['\t'.join(line) for line in lines])
                 
 class GeneExperimentTests(GenericModelTests):
     '''This class tests various aspects of the :class:`~data.models.GeneExperimentData` model.'''
@@ -62,13 +110,12 @@ class GeneExperimentTests(GenericModelTests):
         	q_value = 0.995959851,
         	locus = '1:3054232-3054733',
         	internal_id = 'XLOC_000001',
-        	sample_1 = 'Control',
-        	sample_2 = 'Treated',
+        	comparison = Comparison.objects.create(experiment=mRNASeqExperiment.objects.get(pk=1), sample_1='Control', sample_2='Treated'),
         	amount_1 = 0.0778978,
         	amount_2 = 0.0881688,
         	status = 'OK',
         	test_statistic = -0.0754818,
-        	significant = 'no') 
+        	significant = False) 
         test_datum.save()
         self.assertEqual(test_datum.pk, 1) #presumes one model loaded in fixture data       
         
@@ -82,8 +129,39 @@ class GeneExperimentTests(GenericModelTests):
         	q_value = 0.995959851) 
         self.assertEqual(test_datum.__unicode__(), "Pikfyve")
         
+class IsoformExperimentTests(GenericModelTests):
+    '''This class tests various aspects of the :class:`~data.models.IsoformExperimentData` model.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def test_create_new_isoform_experiment_datum_minimum(self):
+        '''This test creates a :class:`~data.models.IsoformExperimentData` with the required information only.'''
+
+        test_datum = IsoformExperimentData(experiment=mRNASeqExperiment.objects.get(pk=1),
+            gene=Gene.objects.get(pk='Pikfyve'),
+            isoform='TCONS_00000001',
+            fold_change = 0.419048218,
+            p_value = 0.110512214,
+            q_value = 0.995959851)
+        test_datum.save()
+        self.assertEqual(test_datum.pk, 1)
+        self.assertEqual(test_datum.__unicode__(), "Pikfyve (TCONS_00000001)")
+
+    def test_tss_group_experiment_datum_unicode(self):
+        '''This tests the unicode representation of a :class:`~data.models.TSSGroupExperimentData`.'''
+
+        test_datum = TSSGroupExperimentData(experiment=mRNASeqExperiment.objects.get(pk=1),
+            gene=Gene.objects.get(pk='Pikfyve'),
+            tss_group='TSS1',
+            fold_change = 0.419048218,
+            p_value = 0.110512214,
+            q_value = 0.995959851)
+        self.assertEqual(test_datum.__unicode__(), "Pikfyve (TSS1)")
+
 class DataViewTests(GenericModelTests):
     '''This class tests the views present in the :mod:data package.'''        
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
         
     def test_cufflinks_import_form_view(self):
         """This tests the cufflinks-import view, ensuring that templates are loaded correctly.  
@@ -94,8 +172,64 @@ class DataViewTests(GenericModelTests):
         self.assertEqual(test_response.status_code, 200)
         self.assertTemplateUsed(test_response, 'base.html')
         self.assertTemplateUsed(test_response, 'import_form.html') 
-     
-        
+
+    def test_microarray_import_form_view(self):
+        """This tests the microarray-import view, ensuring that templates are loaded correctly."""
+
+        test_response = self.client.get('/data/microarray_import/')
+        self.assertEqual(test_response.status_code, 200)
+        self.assertTemplateUsed(test_response, 'import_form.html')
+
+    def test_cufflinks_import_form_upload(self):
+        """This tests that a file posted to the cufflinks-import view is queued as an :class:`~data.models.ImportJob` and imported by a worker."""
+
+        with open("data/fixtures/sample_gene_exp.diff") as upload:
+            test_response = self.client.post('/data/cufflinks_import/', {'experiment': 1, 'uploaded_file': upload, 'data_type': 'gene', 'mode': 'append'})
+        self.assertRedirects(test_response, '/data/import_jobs/1')
+        self.assertEqual(GeneExperimentData.objects.count(), 0)
+        self.assertEqual(json.loads(self.client.get('/data/import_jobs/1').content)['status'], 'queued')
+
+        finished_jobs = list(process_import_jobs())
+        self.assertEqual(len(finished_jobs), 1)
+        self.assertEqual(GeneExperimentData.objects.count(), 9)
+        status = json.loads(self.client.get('/data/import_jobs/1').content)
+        self.assertEqual(status['status'], 'finished')
+        self.assertEqual(status['rows_processed'], 9)
+        self.assertEqual(status['result'], "Added 9 measurements and created 9 new genes.")
+        self.assertFalse(ImportJob.objects.get(pk=1).uploaded_file)
+
+    def test_import_job_failure(self):
+        """This tests that an :class:`~data.models.ImportJob` with an invalid file is marked as failed and imports nothing."""
+
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        lines[4] = lines[4].replace('0.0033394', 'abc')
+        job = ImportJob(experiment=mRNASeqExperiment.objects.get(pk=1))
+        job.uploaded_file.save('invalid_gene_exp.diff', ContentFile(''.join(lines)))
+        failed_job = list(process_import_jobs())[0]
+        failed_job.uploaded_file.delete(save=False)
+        self.assertEqual(failed_job.status, 'failed')
+        self.assertTrue(failed_job.error)
+        self.assertEqual(GeneExperimentData.objects.count(), 0)
+        self.assertEqual(json.loads(self.client.get('/data/import_jobs/1').content)['status'], 'failed')
+
+    def test_stale_import_jobs(self):
+        '''This tests that running jobs are failed if their worker process on this host has exited, or a worker on another host has not sent a heartbeat in time.'''
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        long_ago = timezone.now() - timedelta(seconds=job_timeout() + 60)
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        jobs = dict((name, ImportJob.objects.create(experiment=experiment, uploaded_file='imports/%s_gene_exp.diff' % name, status='running',
+            worker=worker, started=long_ago, heartbeat=heartbeat)) for name, worker, heartbeat in [
+            ('exited', '%s:%i' % (socket.gethostname(), exited.pid), timezone.now()),
+            ('running', worker_name(), long_ago),
+            ('remote', 'otherhost:1', long_ago),
+            ('remote_heartbeat', 'otherhost:2', timezone.now())])
+        self.assertEqual(fail_stale_jobs(), 2)
+        statuses = dict((name, ImportJob.objects.get(pk=job.pk).status) for name, job in jobs.items())
+        self.assertEqual(statuses, {'exited': 'failed', 'running': 'running', 'remote': 'failed', 'remote_heartbeat': 'running'})
+        self.assertTrue('stopped' in ImportJob.objects.get(pk=jobs['remote'].pk).error)
+
 class UtilityTests(GenericModelTests):
     '''This class tests the functions in the :mod:`data.utilities` package.'''
 
@@ -108,4 +242,855 @@ class UtilityTests(GenericModelTests):
         after = GeneExperimentData.objects.count()
         self.assertEqual(after - before, 9)
         self.assertEqual(import_result, "Added 9 measurements and created 9 new genes.")
-    
\ No newline at end of file
+
+    def test_cufflinks_gene_diff_import_existing_genes(self):
+        '''This tests that :func:`data.utlities.cufflinks_gene_diff_import` only creates genes which are not already present.'''
+        Gene.objects.create(name='Oprk1')
+        import_result = cufflinks_gene_diff_import(1, "data/fixtures/sample_gene_exp.diff")
+        self.assertEqual(import_result, "Added 9 measurements and created 8 new genes.")
+        self.assertEqual(GeneExperimentData.objects.filter(gene='Oprk1').count(), 1)
+
+    def test_genes_created_by_another_import(self):
+        '''This tests that genes created by another import after the known genes were read are not created again, whether the data are written from columns or rows.'''
+        Gene.objects.create(name='Oprk1')
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        self.assertEqual(write_gene_experiment_data(experiment, read_cufflinks_gene_diff(lines), known_genes=set()),
+            "Added 9 measurements and created 8 new genes.")
+        second_experiment = mRNASeqExperiment.objects.create(name="second experiment")
+        self.assertEqual(write_gene_experiment_data(second_experiment, parse_cufflinks_gene_diff(lines), known_genes=set(['Oprk1'])),
+            "Added 9 measurements and created 0 new genes.")
+        self.assertEqual(Comparison.objects.count(), 2)
+
+    def test_cufflinks_gene_diff_import_query_count(self):
+        '''This tests that :func:`data.utlities.cufflinks_gene_diff_import` does not issue queries for each row.'''
+        ContentType.objects.get_for_model(mRNASeqExperiment) #the content type is cached after its first lookup
+        with self.assertNumQueries(18): #these create the comparison, read the data and versions back to build the expression columns, clear the rankings, store the summary and change the versions
+            cufflinks_gene_diff_import(1, "data/fixtures/sample_gene_exp.diff")
+
+    def test_cufflinks_gene_diff_import_lines(self):
+        '''This tests that :func:`data.utlities.cufflinks_gene_diff_import` accepts an iterable of lines instead of a filename.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        import_result = cufflinks_gene_diff_import(1, iter(lines[:4]))
+        self.assertEqual(import_result, "Added 3 measurements and created 3 new genes.")
+
+    def test_parse_cufflinks_gene_diff(self):
+        '''This tests that :func:`data.utlities.parse_cufflinks_gene_diff` converts values and reports the line of an invalid value.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        rows = list(parse_cufflinks_gene_diff(lines))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[3]['gene_id'], 'AC129937.1')
+        self.assertEqual(rows[3]['fold_change'], -2.62316)
+        lines[4] = lines[4].replace('0.0033394', 'abc')
+        self.assertRaisesRegexp(ValueError, 'Line 5', parse_cufflinks_gene_diff, lines)
+
+    def test_parallel_cufflinks_gene_diff_import(self):
+        '''This tests that :func:`data.utlities.parallel_cufflinks_gene_diff_import` imports several files and skips invalid ones.'''
+        second_experiment = mRNASeqExperiment.objects.create(name="second experiment")
+        results = parallel_cufflinks_gene_diff_import([
+            (1, "data/fixtures/sample_gene_exp.diff"),
+            (second_experiment.pk, "data/fixtures/sample_gene_exp.diff"),
+            (1, "data/fixtures/missing_gene_exp.diff")], processes=2)
+        self.assertEqual(results[0][2], "Added 9 measurements and created 9 new genes.")
+        self.assertEqual(results[1][2], "Added 9 measurements and created 0 new genes.")
+        self.assertEqual(results[2][2], None)
+        self.assertTrue(results[2][3])
+        self.assertEqual(GeneExperimentData.objects.filter(experiment_id=second_experiment.pk).count(), 9)
+        self.assertEqual(GeneExperimentData.objects.count(), 18)
+
+    def test_cufflinks_gene_diff_import_replace(self):
+        '''This tests that importing twice with the replace mode of :func:`data.utlities.cufflinks_gene_diff_import` does not duplicate data.'''
+        cufflinks_gene_diff_import(1, "data/fixtures/sample_gene_exp.diff")
+        import_result = cufflinks_gene_diff_import(1, "data/fixtures/sample_gene_exp.diff", mode='replace')
+        self.assertEqual(import_result, "Removed 9 measurements. Added 9 measurements and created 0 new genes.")
+        self.assertEqual(GeneExperimentData.objects.count(), 9)
+
+    def test_cufflinks_gene_diff_import_upsert(self):
+        '''This tests that the upsert mode of :func:`data.utlities.cufflinks_gene_diff_import` only writes changed genes and removes duplicates.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        cufflinks_gene_diff_import(1, lines[:3])
+        cufflinks_gene_diff_import(1, lines)
+        lines[1] = lines[1].replace('0.939831', '0.5')
+        import_result = cufflinks_gene_diff_import(1, lines, mode='upsert')
+        self.assertEqual(import_result, "Added 0 measurements, updated 1 measurements and created 0 new genes.")
+        self.assertEqual(GeneExperimentData.objects.count(), 9)
+        self.assertEqual(float(GeneExperimentData.objects.get(gene='Gm16088').p_value), 0.5)
+        import_result = cufflinks_gene_diff_import(1, lines, mode='upsert')
+        self.assertEqual(import_result, "Added 0 measurements, updated 0 measurements and created 0 new genes.")
+
+    def test_cufflinks_gene_diff_import_upsert_comparisons(self):
+        '''This tests that the upsert mode of :func:`data.utlities.cufflinks_gene_diff_import` matches the rows of a file of two sample pairs by gene and comparison, and uses the first of repeated rows.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        lines = lines + [line.replace('Knockdown', 'Treated') for line in lines[1:]]
+        cufflinks_gene_diff_import(1, lines)
+        self.assertEqual(GeneExperimentData.objects.count(), 18)
+        lines[10] = lines[10].replace('0.939831', '0.5')
+        import_result = cufflinks_gene_diff_import(1, lines, mode='upsert')
+        self.assertEqual(import_result, "Added 0 measurements, updated 1 measurements and created 0 new genes.")
+        self.assertEqual(GeneExperimentData.objects.count(), 18)
+        self.assertEqual(float(GeneExperimentData.objects.get(gene='Gm16088', comparison__sample_2='Treated').p_value), 0.5)
+        self.assertEqual(float(GeneExperimentData.objects.get(gene='Gm16088', comparison__sample_2='Knockdown').p_value), 0.939831)
+        new_lines = [line.replace('Knockdown', 'Untreated') for line in lines[1:3]]
+        import_result = cufflinks_gene_diff_import(1, lines + new_lines + [new_lines[0].replace('0.939831', '0.5')], mode='upsert')
+        self.assertEqual(import_result, "Added 2 measurements, updated 0 measurements and created 0 new genes.")
+        self.assertEqual(float(GeneExperimentData.objects.get(gene='Gm16088', comparison__sample_2='Untreated').p_value), 0.939831)
+
+    def test_cufflinks_gene_diff_import_values(self):
+        '''This tests that :func:`data.utlities.cufflinks_gene_diff_import` stores tiny p-values, infinite fold changes, large amounts, the significant flag and one comparison of the samples.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        lines[1] = lines[1].replace('0.178686\t-0.0754818\t0.939831\t1\tno', '-inf\t-0.0754818\t1e-300\t2.5e-299\tyes')
+        self.assertRaisesRegexp(InvalidRowsError, 'Line 2: invalid value', cufflinks_gene_diff_import, 1, [line.replace('0.0881688', 'inf') for line in lines])
+        lines[1] = lines[1].replace('0.0881688', '2.5e9')
+        cufflinks_gene_diff_import(1, lines)
+        datum = GeneExperimentData.objects.get(gene='Gm16088')
+        self.assertEqual(datum.fold_change, float('-inf'))
+        self.assertEqual(datum.p_value, 1e-300)
+        self.assertEqual(datum.q_value, 2.5e-299)
+        self.assertEqual(datum.amount_1, 0.0778978)
+        self.assertEqual(datum.amount_2, 2.5e9)
+        self.assertEqual(datum.significant, True)
+        self.assertEqual(GeneExperimentData.objects.filter(significant=True).count(), 1)
+        self.assertEqual(unicode(datum.comparison), 'Control / Knockdown')
+        cufflinks_gene_diff_import(1, lines, mode='replace')
+        self.assertEqual(Comparison.objects.count(), 1)
+        lines[1] = lines[1].replace('Knockdown', 'Treated')
+        import_result = cufflinks_gene_diff_import(1, lines, mode='upsert')
+        self.assertEqual(import_result, "Added 1 measurements, updated 0 measurements and created 0 new genes.")
+        self.assertEqual(sorted(GeneExperimentData.objects.filter(gene='Gm16088').values_list('comparison__sample_2', flat=True)), ['Knockdown', 'Treated'])
+        self.assertEqual(Comparison.objects.count(), 2)
+
+    def test_parse_cufflinks_gene_diff_coercion(self):
+        '''This tests that :func:`data.utlities.parse_cufflinks_gene_diff` accepts cuffdiff special values and reports every invalid row at once.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        lines[1] = lines[1].replace('0.178686\t-0.0754818\t0.939831\t1', 'inf\t\tnan\t')
+        rows = list(parse_cufflinks_gene_diff(lines))
+        self.assertEqual(rows[0]['fold_change'], float('inf'))
+        self.assertEqual(rows[0]['test_statistic'], None)
+        self.assertEqual(rows[0]['p_value'], 1.0)
+        self.assertEqual(rows[0]['q_value'], 1.0)
+
+        lines[5] = lines[5].replace('0.729736', 'nan')
+        lines[6] = lines[6].replace('0.999997', '1.5')
+        lines[8] = lines[8].replace('\tOK\t', '\tMAYBE\t')
+        try:
+            parse_cufflinks_gene_diff(lines)
+        except InvalidRowsError as error:
+            self.assertEqual([message.split(':')[0] for message in error.errors], ['Line 6', 'Line 7', 'Line 9'])
+        else:
+            self.fail("The invalid rows were not reported")
+
+    def test_read_cufflinks_gene_diff_chunks(self):
+        '''This tests that a gene_exp.diff is read in chunks matching the whole file, and that checking it reports the invalid rows of every chunk.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        chunks = list(read_cufflinks_gene_diff_chunks(lines, size=4))
+        self.assertEqual([len(chunk['gene_id']) for chunk in chunks], [4, 4, 1])
+        whole = read_cufflinks_gene_diff(lines)
+        self.assertEqual(sum([chunk['gene_id'] for chunk in chunks], []), whole['gene_id'])
+        self.assertEqual(numpy.concatenate([chunk['q_value'] for chunk in chunks]).tolist(), whole['q_value'].tolist())
+        genes, samples = check_cufflinks_gene_diff(RereadableLines(iter(lines)), size=4)
+        self.assertEqual(genes, set(whole['gene_id']))
+        self.assertEqual(samples, set([('Control', 'Knockdown')]))
+        lines[2] = lines[2].replace('NOTEST', 'MAYBE')
+        lines[8] = lines[8].replace('\tOK\t', '\tMAYBE\t')
+        try:
+            check_cufflinks_gene_diff(lines, size=4)
+        except InvalidRowsError as error:
+            self.assertEqual([message.split(':')[0] for message in error.errors], ['Line 3', 'Line 9'])
+        else:
+            self.fail("The invalid rows were not reported")
+
+    def test_microarray_import(self):
+        '''This tests that :func:`data.utlities.microarray_import` skips probes without genes and keeps the most significant probe for each gene.'''
+        experiment = MicroArrayExperiment.objects.create(name="test array", platform="GPL1261")
+        import_result = microarray_import(experiment.pk, "data/fixtures/sample_microarray_results.txt", sample_1='Control', sample_2='Knockdown')
+        self.assertEqual(import_result, "Added 6 measurements and created 6 new genes.")
+        datum = GeneExperimentData.objects.get(gene='Copg1')
+        self.assertEqual(datum.experiment, experiment)
+        self.assertEqual(datum.internal_id, '1415676_a_at')
+        self.assertEqual(datum.fold_change, 1.71)
+        self.assertEqual(datum.significant, True)
+        self.assertEqual(datum.comparison.sample_2, 'Knockdown')
+        self.assertEqual(GeneExperimentData.objects.get(gene='Psph').significant, False)
+
+    def test_microarray_import_columns(self):
+        '''This tests that :func:`data.utlities.microarray_import` uses a column mapping and reports missing columns.'''
+        experiment = MicroArrayExperiment.objects.create(name="test array", platform="GPL1261")
+        with open("data/fixtures/sample_microarray_results.txt") as inputfile:
+            lines = inputfile.read().replace('Gene.symbol', 'Symbol').splitlines()
+        self.assertRaisesRegexp(InvalidRowsError, 'missing column Gene.symbol', microarray_import, experiment.pk, lines)
+        import_result = microarray_import(experiment.pk, lines, columns={'gene_id': 'Symbol', 'test_statistic': None})
+        self.assertEqual(import_result, "Added 6 measurements and created 6 new genes.")
+        self.assertEqual(GeneExperimentData.objects.get(gene='Psph').test_statistic, None)
+
+    def test_cufflinks_isoform_diff_import(self):
+        '''This tests that :func:`data.utlities.cufflinks_diff_import` imports an isoform_exp.diff, which can not be appended again, and upserts it by gene and isoform.'''
+        import_result = cufflinks_diff_import(1, "data/fixtures/sample_isoform_exp.diff", data_type='isoform')
+        self.assertEqual(import_result, "Added 4 measurements and created 3 new genes.")
+        self.assertEqual(IsoformExperimentData.objects.filter(gene='Lypla1').count(), 2)
+        datum = IsoformExperimentData.objects.get(isoform='TCONS_00000003')
+        self.assertEqual(datum.internal_id, 'XLOC_000005')
+        self.assertEqual(GeneExperimentData.objects.count(), 0)
+        self.assertRaisesRegexp(ValueError, 'use the replace or upsert mode', cufflinks_diff_import, 1, "data/fixtures/sample_isoform_exp.diff", data_type='isoform')
+        import_result = cufflinks_diff_import(1, "data/fixtures/sample_isoform_exp.diff", mode='upsert', data_type='isoform')
+        self.assertEqual(import_result, "Added 0 measurements, updated 0 measurements and created 0 new genes.")
+        import_result = cufflinks_diff_import(1, "data/fixtures/sample_isoform_exp.diff", mode='replace', data_type='isoform')
+        self.assertEqual(import_result, "Removed 4 measurements. Added 4 measurements and created 0 new genes.")
+        with open("data/fixtures/sample_isoform_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        lines = lines + [line.replace('Knockdown', 'Treated') for line in lines[1:]]
+        import_result = cufflinks_diff_import(1, lines, mode='replace', data_type='isoform')
+        self.assertEqual(import_result, "Removed 4 measurements. Added 8 measurements and created 0 new genes.")
+        self.assertEqual(IsoformExperimentData.objects.filter(isoform='TCONS_00000003').count(), 2)
+
+    def test_synthetic_gene_exp_diff(self):
+        '''This tests that :func:`data.benchmarks.synthetic_gene_exp_diff` generates a file in the layout of the sample gene_exp.diff.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            header = inputfile.readline()
+        lines = list(synthetic_gene_exp_diff(50, 0.5, ['Gene1', 'Gene2']))
+        self.assertEqual(lines[0], header)
+        self.assertEqual(len(list(parse_cufflinks_gene_diff(lines))), 50)
+        self.assertEqual(lines, list(synthetic_gene_exp_diff(50, 0.5, ['Gene1', 'Gene2'])))
+
+    def test_benchmark_import(self):
+        '''This tests that :func:`data.benchmarks.benchmark_import` reports the import speed and removes the benchmark data, and that queries are counted without keeping their SQL.'''
+        result = benchmark_import(100, unknown_fraction=1)
+        self.assertEqual(result['summary'], "Added 100 measurements and created 100 new genes.")
+        self.assertTrue(result['queries'] > 0)
+        with QueryCounter() as queries:
+            Gene.objects.count()
+            list(Gene.objects.all())
+        self.assertEqual(queries.count, 2)
+        self.assertEqual(connection.queries, [])
+        self.assertTrue(result['peak_rss_kb'] > 0)
+        self.assertEqual(GeneExperimentData.objects.count(), 0)
+        self.assertEqual(Comparison.objects.count(), 0)
+        self.assertFalse(Gene.objects.filter(name__startswith=UNKNOWN_GENE_PREFIX).exists())
+        self.assertEqual(mRNASeqExperiment.objects.count(), 1)
+
+class ColumnTests(GenericModelTests):
+    '''This class tests the memory-mapped expression columns in :mod:`data.columns`.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def test_import_builds_columns(self):
+        '''This tests that importing an experiment writes its columns, aligned to the gene index.'''
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        cufflinks_gene_diff_import(experiment.pk, "data/fixtures/sample_gene_exp.diff")
+        with self.assertNumQueries(1): #the version of the experiment
+            fold_changes = experiment_column(experiment, 'fold_change')
+        self.assertTrue(isinstance(fold_changes, numpy.memmap))
+        positions = gene_positions()
+        for datum in GeneExperimentData.objects.for_experiment(experiment):
+            self.assertEqual(fold_changes[positions[datum.gene_id]], datum.fold_change)
+            self.assertEqual(experiment_column(experiment, 'q_value')[positions[datum.gene_id]], float(datum.q_value))
+        self.assertTrue(numpy.isnan(fold_changes[positions['Pikfyve']]))
+        self.assertRaises(ValueError, experiment_column, experiment, 'locus')
+
+    def test_gene_index_is_stable(self):
+        '''This tests that genes added by a later import are appended to the gene index, so existing columns stay aligned.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        cufflinks_gene_diff_import(1, lines[:4])
+        index = list(gene_index())
+        cufflinks_gene_diff_import(1, "data/fixtures/sample_gene_exp.diff", mode='replace')
+        self.assertEqual(list(gene_index()[:len(index)]), index)
+        self.assertTrue(len(gene_index()) > len(index))
+
+    def test_columns_invalidated(self):
+        '''This tests that saving or deleting a :class:`~data.models.GeneExperimentData` removes the columns of its experiment, which are rebuilt when read.'''
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        cufflinks_gene_diff_import(experiment.pk, "data/fixtures/sample_gene_exp.diff")
+        datum = GeneExperimentData.objects.get(gene='Gm1992')
+        directory = experiment_directory(datum.experiment_type_id, experiment.pk)
+        self.assertTrue(os.path.isdir(directory))
+        datum.fold_change = 5
+        datum.save()
+        self.assertFalse(os.path.isdir(directory))
+        self.assertEqual(experiment_column(experiment, 'fold_change')[gene_positions()['Gm1992']], 5)
+        datum.delete()
+        self.assertFalse(os.path.isdir(directory))
+        self.assertTrue(numpy.isnan(experiment_column(experiment, 'fold_change')[gene_positions()['Gm1992']]))
+
+    def test_stale_build(self):
+        '''This tests that columns built from data read before an import do not replace the columns built by the import, and are not read.'''
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        cufflinks_gene_diff_import(experiment.pk, lines[:4])
+        experiment_type = ContentType.objects.get_for_model(experiment)
+        stale_versions = get_versions([experiment_version_key(experiment_type.pk, experiment.pk)])
+        cufflinks_gene_diff_import(experiment.pk, "data/fixtures/sample_gene_exp.diff", mode='replace')
+        directory = version_directory(experiment_type.pk, experiment.pk)
+        #the build reads the version from before the import, as if it had started before the import was committed
+        original_get_versions = columns.get_versions
+        def get_versions_before_import(keys):
+            if stale_versions:
+                return [stale_versions.pop()]
+            return original_get_versions(keys)
+        columns.get_versions = get_versions_before_import
+        try:
+            stale_directory = build_experiment_columns(experiment)
+        finally:
+            columns.get_versions = original_get_versions
+        self.assertNotEqual(stale_directory, directory)
+        self.assertTrue(os.path.isdir(directory))
+        self.assertEqual(os.path.dirname(experiment_column(experiment, 'fold_change').filename), directory)
+
+class RankingTests(GenericModelTests):
+    '''This class tests the ranked lists of significant genes in :mod:`data.rankings`.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def setUp(self):
+        '''Imports the sample gene_exp.diff with some genes made significant.'''
+        super(RankingTests, self).setUp()
+        self.experiment = mRNASeqExperiment.objects.get(pk=1)
+        self.import_changed_sample(self.experiment, {'Gm16088': ('2.5', '0.01'), 'U6': ('-1.5', '0.001'), 'Gm1992': ('0.5', '0.001'), 'Oprk1': ('-3', '0.04')})
+
+    def test_rankings(self):
+        '''This tests that the import computes each ranking of the significant genes.'''
+        self.assertEqual([gene.gene_id for gene in top_genes(self.experiment)], ['U6', 'Gm1992', 'Gm16088', 'Oprk1'])
+        self.assertEqual([gene.gene_id for gene in top_genes(self.experiment, 'up')], ['Gm16088', 'Gm1992'])
+        self.assertEqual([gene.gene_id for gene in top_genes(self.experiment, 'down')], ['Oprk1', 'U6'])
+        self.assertEqual([gene.rank for gene in top_genes(self.experiment, 'q_value', 2)], [1, 2])
+        self.assertEqual([gene.gene_id for gene in top_genes(self.experiment, 'q_value', 10, 0.005)], ['U6', 'Gm1992'])
+        self.assertRaises(ValueError, top_genes, self.experiment, 'p_value')
+        self.assertRaises(ValueError, top_genes, self.experiment, 'q_value', 10, 0.5)
+
+    def test_rankings_invalidated(self):
+        '''This tests that changing the data of an experiment removes its rankings, which are computed again when read.'''
+        datum = GeneExperimentData.objects.get(gene='Atp6v1h')
+        datum.q_value = 0.0001
+        datum.fold_change = -5
+        datum.save()
+        self.assertEqual(RankedGene.objects.count(), 0)
+        self.assertEqual([gene.gene_id for gene in top_genes(self.experiment, 'down')], ['Atp6v1h', 'Oprk1', 'U6'])
+        self.assertEqual(top_genes(self.experiment)[0].gene_id, 'Atp6v1h')
+
+    def test_top_genes_view(self):
+        '''This tests that the experiment-top-genes view returns the first genes of a ranking.'''
+        test_response = self.client.get('/data/mrnaseqexperiment/1/top', {'ranking': 'down', 'count': 1})
+        self.assertEqual(test_response.status_code, 200)
+        self.assertEqual(json.loads(test_response.content)['results'], [{'rank': 1, 'gene': 'Oprk1', 'fold_change': -3, 'q_value': 0.04}])
+        for parameters in [{'ranking': 'p_value'}, {'count': 0}, {'q_value': '0.5'}]:
+            self.assertEqual(self.client.get('/data/mrnaseqexperiment/1/top', parameters).status_code, 400)
+
+class OverlapTests(GenericModelTests):
+    '''This class tests the comparisons of significant genes between experiments in :mod:`data.overlaps`.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def setUp(self):
+        '''Imports the sample gene_exp.diff into two experiments, with different significant genes.'''
+        super(OverlapTests, self).setUp()
+        self.first = mRNASeqExperiment.objects.get(pk=1)
+        self.second = mRNASeqExperiment.objects.create(name="Second Experiment")
+        self.import_changed_sample(self.first, {'Gm16088': ('2.5', '0.01'), 'U6': ('-1.5', '0.001'), 'Gm1992': ('0.5', '0.001')})
+        self.import_changed_sample(self.second, {'U6': ('-2', '0.01'), 'Gm1992': ('1', '0.2'), 'Oprk1': ('3', '0.001')})
+
+    def test_significant_genes(self):
+        '''This tests that the bitsets select the genes passing the thresholds.'''
+        self.assertEqual(gene_names(significant_genes(self.first)), sorted(['Gm16088', 'U6', 'Gm1992'], key=list(gene_index()).index))
+        self.assertEqual(count_genes(significant_genes(self.first, q_value=0.005)), 2)
+        self.assertEqual(gene_names(significant_genes(self.first, fold_change=1)), sorted(['Gm16088', 'U6'], key=list(gene_index()).index))
+        self.assertEqual(gene_names(significant_genes(self.first, direction='down')), ['U6'])
+        self.assertEqual(count_genes(significant_genes(self.second, q_value=0.5)), 3)
+        self.assertRaises(ValueError, significant_genes, self.first, direction='sideways')
+
+    def test_compare_experiments(self):
+        '''This tests the intersection, union, unique genes and Venn regions of two experiments.'''
+        comparison = compare_experiments([self.first, self.second])
+        self.assertEqual(comparison['counts'], [3, 2])
+        self.assertEqual(comparison['intersection'], ['U6'])
+        self.assertEqual(sorted(comparison['union']), ['Gm16088', 'Gm1992', 'Oprk1', 'U6'])
+        self.assertEqual([sorted(genes) for genes in comparison['unique']], [['Gm16088', 'Gm1992'], ['Oprk1']])
+        self.assertEqual(comparison['pairwise'], [[3, 1], [1, 2]])
+        self.assertEqual([(region['sets'], sorted(region['genes'])) for region in comparison['regions']],
+            [([0], ['Gm16088', 'Gm1992']), ([1], ['Oprk1']), ([0, 1], ['U6'])])
+        comparison = compare_experiments([self.first, self.second], direction='up', q_value=0.5)
+        self.assertEqual(comparison['intersection'], ['Gm1992'])
+        self.assertRaises(ValueError, compare_experiments, [])
+
+    def test_overlap_view(self):
+        '''This tests that the experiment-overlap view compares the experiments in its parameters.'''
+        test_response = self.client.get('/data/overlap', {'experiments': 'mrnaseqexperiment:1,mrnaseqexperiment:%i' % self.second.pk})
+        self.assertEqual(test_response.status_code, 200)
+        comparison = json.loads(test_response.content)
+        self.assertEqual(comparison['intersection'], ['U6'])
+        self.assertEqual(comparison['experiments'][1], {'type': 'mrnaseqexperiment', 'id': self.second.pk, 'name': 'Second Experiment'})
+        for parameters in [{}, {'experiments': 'mrnaseqexperiment'}, {'experiments': 'mrnaseqexperiment:99'},
+            {'experiments': 'mrnaseqexperiment:1', 'q_value': 'low'}, {'experiments': 'mrnaseqexperiment:1', 'direction': 'sideways'}]:
+            self.assertEqual(self.client.get('/data/overlap', parameters).status_code, 400)
+
+class CorrelationTests(GenericModelTests):
+    '''This class tests the correlations of fold changes between genes in :mod:`data.correlations`.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def setUp(self):
+        '''Imports the sample gene_exp.diff into four experiments, with the fold changes of some genes changed.'''
+        super(CorrelationTests, self).setUp()
+        fold_changes = {'Gm16088': [1, 2, 3, 4], 'U6': [2, 4, 6, 8], 'Gm1992': [4, 3, 2, 1], 'Oprk1': [1, 3, 2, 4]}
+        for position in range(4):
+            experiment = position and mRNASeqExperiment.objects.create(name="Experiment %i" % position) or mRNASeqExperiment.objects.get(pk=1)
+            self.import_changed_sample(experiment, dict((gene, (str(values[position]), '1')) for gene, values in fold_changes.items()))
+
+    def test_rank_rows(self):
+        '''This tests that ties share their average rank and NaN is not ranked.'''
+        ranks = rank_rows(numpy.array([[3, 1, 2, 1], [numpy.nan, 5, 4, 5]]))
+        self.assertEqual(ranks[0].tolist(), [4, 1.5, 3, 1.5])
+        self.assertTrue(numpy.isnan(ranks[1, 0]))
+        self.assertEqual(ranks[1, 1:].tolist(), [2.5, 1, 2.5])
+
+    def test_correlate(self):
+        '''This tests that the correlations match numpy.corrcoef over the shared columns, leaving out NaN and infinite values.'''
+        matrix = numpy.array([[1, 2, 3, 4, 5], [2, 1, 4, 3, numpy.nan], [1, 1, 1, 1, 1], [1, numpy.nan, numpy.nan, numpy.nan, 2]])
+        correlations, counts = correlate(matrix, numpy.array([1, 3, 2, 5, 4]))
+        self.assertAlmostEqual(correlations[0], numpy.corrcoef([1, 2, 3, 4, 5], [1, 3, 2, 5, 4])[0, 1])
+        self.assertAlmostEqual(correlations[1], numpy.corrcoef([2, 1, 4, 3], [1, 3, 2, 5])[0, 1])
+        self.assertEqual(counts.tolist(), [5, 4, 5, 2])
+        self.assertTrue(numpy.isnan(correlations[2]))
+        self.assertTrue(numpy.isnan(correlations[3]))
+        infinite = numpy.array([[1, 2, 3, numpy.inf, 5, 4], [2, -numpy.inf, 4, 3, 6, 5]])
+        correlations, counts = correlate(infinite, numpy.array([1, 3, 2, 5, 4, numpy.inf]))
+        self.assertAlmostEqual(correlations[0], numpy.corrcoef([1, 2, 3, 5], [1, 3, 2, 4])[0, 1])
+        self.assertAlmostEqual(correlations[1], numpy.corrcoef([2, 4, 3, 6], [1, 2, 5, 4])[0, 1])
+        self.assertEqual(counts.tolist(), [4, 4])
+
+    def test_correlated_genes(self):
+        '''This tests the genes most correlated with a gene, by either method and in either direction.'''
+        results = correlated_genes('Gm16088')
+        self.assertEqual([result['gene'] for result in results], ['U6', 'Oprk1', 'Gm1992'])
+        self.assertAlmostEqual(results[0]['correlation'], 1)
+        self.assertAlmostEqual(results[1]['correlation'], 0.8)
+        self.assertEqual(results[0]['experiments'], 4)
+        self.assertEqual(correlated_genes('Gm16088', 'spearman', 'negative', 1)[0]['gene'], 'Gm1992')
+        self.assertRaises(ValueError, correlated_genes, 'Gm16088', 'kendall')
+        self.assertRaises(ValueError, correlated_genes, 'Pikfour')
+
+    def test_correlations_refreshed(self):
+        '''This tests that the cached correlations change after an import.'''
+        self.assertEqual(correlated_genes('Gm16088', count=1)[0]['gene'], 'U6')
+        self.import_changed_sample(mRNASeqExperiment.objects.create(name="Experiment 4"), {'Gm16088': ('5', '1'), 'U6': ('-10', '1'), 'Oprk1': ('5', '1')})
+        self.assertEqual(correlated_genes('Gm16088', count=1)[0]['gene'], 'Oprk1')
+
+    def test_correlation_view(self):
+        '''This tests that the gene-correlations view returns the most correlated genes.'''
+        test_response = self.client.get('/data/correlations/Gm16088', {'count': 2})
+        self.assertEqual(test_response.status_code, 200)
+        self.assertEqual([result['gene'] for result in json.loads(test_response.content)['results']], ['U6', 'Oprk1'])
+        for parameters in [{'method': 'kendall'}, {'direction': 'up'}, {'count': 0}]:
+            self.assertEqual(self.client.get('/data/correlations/Gm16088', parameters).status_code, 400)
+
+class PlotTests(GenericModelTests):
+    '''This class tests the downsampled volcano and MA plots in :mod:`data.plots`.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def setUp(self):
+        '''Imports the sample gene_exp.diff with two significant genes.'''
+        super(PlotTests, self).setUp()
+        self.experiment = mRNASeqExperiment.objects.get(pk=1)
+        self.import_changed_sample(self.experiment, {'Gm16088': ('2.5', '0.01'), 'U6': ('-1.5', '0')})
+
+    def test_volcano(self):
+        '''This tests that significant and labelled genes are exact points and every other gene is counted in a bin.'''
+        data = plot_data(self.experiment, genes=['Oprk1', 'Pikfour'])
+        points = dict(zip(data['points']['genes'], zip(data['points']['x'], data['points']['y'], data['points']['significant'])))
+        self.assertEqual(points['Gm16088'], (2.5, 2.0, True))
+        self.assertEqual(points['U6'], (-1.5, 2.0, True)) #a q-value of zero is plotted at the smallest q-value
+        self.assertEqual(points['Oprk1'], (0, 0, False))
+        self.assertEqual(sum(count for x_bin, y_bin, count in data['bins']['counts']), GeneExperimentData.objects.count() - 3)
+        self.assertEqual(len(data['bins']['x']), 65)
+        self.assertRaises(ValueError, plot_data, self.experiment, 'scatter')
+        self.assertRaises(ValueError, plot_data, self.experiment, bins=0)
+
+    def test_maximum_points(self):
+        '''This tests that only the significant genes with the smallest q-values are exact points, with the others binned, and that too many labels are refused.'''
+        data = plot_data(self.experiment, genes=['Oprk1'], points=1)
+        self.assertEqual(data['significant'], 2)
+        self.assertEqual(sorted(data['points']['genes']), ['Oprk1', 'U6'])
+        self.assertEqual(sum(count for x_bin, y_bin, count in data['bins']['counts']), GeneExperimentData.objects.count() - 2)
+        self.assertRaises(ValueError, plot_data, self.experiment, genes=['Gene%i' % number for number in range(MAXIMUM_LABELS + 1)])
+
+    def test_ma(self):
+        '''This tests the coordinates of an MA plot.'''
+        data = plot_data(self.experiment, 'ma', genes=['Gm16041'], bins=10)
+        datum = GeneExperimentData.objects.get(gene='Gm16041')
+        position = data['points']['genes'].index('Gm16041')
+        self.assertAlmostEqual(data['points']['x'][position], numpy.log2(float(datum.amount_1 + datum.amount_2) / 2 + 1), 4)
+        self.assertAlmostEqual(data['points']['y'][position], datum.fold_change, 4)
+        self.assertEqual(len(data['bins']['y']), 11)
+
+    def test_plot_view(self):
+        '''This tests that the experiment-plot view returns the plot data.'''
+        test_response = self.client.get('/data/mrnaseqexperiment/1/plot', {'plot': 'ma', 'gene': 'Oprk1'})
+        self.assertEqual(test_response.status_code, 200)
+        self.assertEqual(sorted(json.loads(test_response.content)['points']['genes']), ['Gm16088', 'Oprk1', 'U6'])
+        for parameters in [{'plot': 'scatter'}, {'bins': 1000}, {'q_value': 'low'}, {'gene': ','.join('Gene%i' % number for number in range(MAXIMUM_LABELS + 1))}]:
+            self.assertEqual(self.client.get('/data/mrnaseqexperiment/1/plot', parameters).status_code, 400)
+
+class SummaryTests(GenericModelTests):
+    '''This class tests the experiment summaries in :mod:`data.summaries`.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def setUp(self):
+        '''Reads the lines of the sample gene_exp.diff.'''
+        super(SummaryTests, self).setUp()
+        self.experiment = mRNASeqExperiment.objects.get(pk=1)
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            self.lines = inputfile.readlines()
+
+    def get_summary(self):
+        '''Returns the stored summary of the experiment.'''
+        return ExperimentSummary.objects.get(experiment_type=ContentType.objects.get_for_model(self.experiment), experiment_id=self.experiment.pk)
+
+    def assertSummaryMatchesData(self):
+        '''Checks that the stored summary is current and equal to one computed from the data.'''
+        summary = self.get_summary()
+        self.assertFalse(summary.stale)
+        data = GeneExperimentData.objects.for_experiment(self.experiment)
+        self.assertEqual(summary.genes, data.count())
+        self.assertEqual(summary.tested, data.filter(status='OK').count())
+        self.assertEqual(summary.significant_up, data.filter(q_value__lt=0.05, fold_change__gt=0).count())
+        self.assertEqual(summary.significant_down, data.filter(q_value__lt=0.05, fold_change__lt=0).count())
+        self.assertEqual(json.loads(summary.statuses), dict((status, data.filter(status=status).count()) for status in set(data.values_list('status', flat=True))))
+        self.assertEqual(sum(json.loads(summary.fold_change_histogram)), summary.genes)
+        self.assertEqual(sum(json.loads(summary.p_value_histogram)), summary.genes)
+        computed = compute_summary(self.experiment)
+        for field in ('genes', 'tested', 'significant_up', 'significant_down', 'statuses', 'fold_change_histogram', 'p_value_histogram'):
+            self.assertEqual(getattr(computed, field), getattr(summary, field))
+
+    def test_import_summary(self):
+        '''This tests that importing, appending to and replacing the data of an experiment keep its summary correct.'''
+        self.lines[2] = self.lines[2].replace('NOTEST', 'OK')
+        self.lines[3] = '\t'.join(self.lines[3].split('\t')[:9] + ['-2', '0', '1', '0.01', 'yes\n'])
+        cufflinks_gene_diff_import(self.experiment.pk, self.lines[:4])
+        self.assertSummaryMatchesData()
+        self.assertEqual(self.get_summary().significant_down, 1)
+        cufflinks_gene_diff_import(self.experiment.pk, self.lines[:1] + self.lines[4:])
+        self.assertSummaryMatchesData()
+        self.assertEqual(self.get_summary().genes, 9)
+        cufflinks_gene_diff_import(self.experiment.pk, self.lines[:3], mode='replace')
+        self.assertSummaryMatchesData()
+        self.assertEqual(json.loads(self.get_summary().statuses), {'NOTEST': 1, 'OK': 1})
+        cufflinks_gene_diff_import(self.experiment.pk, self.lines, mode='upsert')
+        self.assertSummaryMatchesData()
+
+    def test_stale_summary(self):
+        '''This tests that changing the data marks the summary as stale, that it is computed again when read, and that it is deleted with the experiment.'''
+        cufflinks_gene_diff_import(self.experiment.pk, "data/fixtures/sample_gene_exp.diff")
+        with self.assertNumQueries(1):
+            self.assertEqual([summary.genes for summary in experiment_summaries()], [9])
+        GeneExperimentData.objects.get(gene='U6').delete()
+        self.assertTrue(self.get_summary().stale)
+        self.assertEqual(experiment_summary(self.experiment).genes, 8)
+        self.assertFalse(self.get_summary().stale)
+        self.experiment.delete()
+        self.assertEqual(ExperimentSummary.objects.count(), 0)
+        self.assertEqual(Comparison.objects.count(), 0)
+        self.assertEqual(GeneExperimentData.objects.count(), 0)
+
+    def test_summary_views(self):
+        '''This tests the experiment-summary and experiment-summaries views.'''
+        cufflinks_gene_diff_import(self.experiment.pk, "data/fixtures/sample_gene_exp.diff")
+        test_response = self.client.get('/data/mrnaseqexperiment/1/summary')
+        self.assertEqual(test_response.status_code, 200)
+        summary = json.loads(test_response.content)
+        self.assertEqual(summary['genes'], 9)
+        self.assertEqual(len(summary['fold_change_histogram']['edges']), len(summary['fold_change_histogram']['counts']) + 1)
+        test_response = self.client.get('/data/summaries')
+        self.assertEqual(json.loads(test_response.content)['results'], [summary])
+        self.assertEqual(self.client.get('/data/mrnaseqexperiment/99/summary').status_code, 400)
+
+class ArchiveTests(GenericModelTests):
+    '''This class tests writing experiments to and reading them from binary archives with :mod:`data.archives`.'''
+
+    fixtures = ['experiment_test_fixture', ]
+
+    def setUp(self):
+        '''Imports the sample gene and isoform files into an experiment with some metadata, and picks a filename for its archive.'''
+        super(ArchiveTests, self).setUp()
+        self.experiment = mRNASeqExperiment.objects.get(pk=1)
+        self.experiment.differential_expression_software = DifferentialExpressionSoftware.objects.create(name='cuffdiff', version='2.0.2')
+        self.experiment.reference_genome = ReferenceGenomeAssembly.objects.create(source='UCSC', version='mm10', species='mouse', release_date='2011-12-01')
+        self.experiment.save()
+        self.experiment.samples.add(Sample.objects.create(description='Liver', type='tissue', species='mouse'))
+        self.experiment.researchers.add(self.test_user.get_profile())
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        lines[1] = lines[1].replace('0.178686\t-0.0754818\t0.939831\t1\tno', '-inf\t\t1e-300\t2.5e-299\tyes')
+        cufflinks_gene_diff_import(self.experiment.pk, lines)
+        cufflinks_diff_import(self.experiment.pk, "data/fixtures/sample_isoform_exp.diff", data_type='isoform')
+        self.filename = os.path.join(self.cache_settings.options['EXPRESSION_CACHE_ROOT'], 'experiment.expdata')
+
+    def data_values(self, model, experiment):
+        '''Returns the values of every field of the data of an experiment for a model, in the order of the gene.'''
+        fields = [field.name for field in model._meta.local_fields if field.name not in ('id', 'experiment_type', 'experiment_id', 'comparison')]
+        return list(model.objects.for_experiment(experiment).order_by('gene', 'pk').values_list('comparison__sample_1', 'comparison__sample_2', *fields))
+
+    def test_archive(self):
+        '''This tests that an experiment read from its archive has the same metadata and data, and that related objects are reused.'''
+        self.assertEqual(export_archive(self.experiment, self.filename), {'gene': 9, 'isoform': IsoformExperimentData.objects.count()})
+        header, tables = read_archive(self.filename)
+        self.assertTrue(isinstance(tables['gene']['fold_change'], numpy.memmap))
+        self.assertEqual(header['comparisons'], [['Control', 'Knockdown']])
+        experiment, results = import_archive(self.filename)
+        self.assertNotEqual(experiment.pk, self.experiment.pk)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(experiment.name, self.experiment.name)
+        self.assertEqual(experiment.differential_expression_software, self.experiment.differential_expression_software)
+        self.assertEqual(experiment.reference_genome, self.experiment.reference_genome)
+        self.assertEqual(list(experiment.samples.all()), list(self.experiment.samples.all()))
+        self.assertEqual(list(experiment.researchers.all()), [self.test_user.get_profile()])
+        for model in (GeneExperimentData, IsoformExperimentData):
+            self.assertEqual(self.data_values(model, experiment), self.data_values(model, self.experiment))
+        datum = GeneExperimentData.objects.get(experiment_id=experiment.pk, gene='Gm16088')
+        self.assertEqual((datum.fold_change, datum.p_value, datum.test_statistic, datum.significant), (float('-inf'), 1e-300, None, True))
+        self.assertEqual(experiment_summary(experiment).genes, 9)
+        self.assertEqual(top_genes(experiment)[0].gene_id, 'Gm16088')
+
+    def test_invalid_archive(self):
+        '''This tests that reading a file which is not an archive, is cut short or is not of an experiment raises a ValueError and creates no experiment.'''
+        self.assertRaises(ValueError, read_archive, "data/fixtures/sample_gene_exp.diff")
+        self.assertRaises(ValueError, create_experiment, {'type': 'sample', 'description': 'Liver'})
+        export_archive(self.experiment, self.filename)
+        with open(self.filename, 'rb') as inputfile:
+            content = inputfile.read()
+        with open(self.filename, 'wb') as outputfile:
+            outputfile.write(content[:len(content) // 2])
+        self.assertRaises(ValueError, import_archive, self.filename)
+        self.assertEqual(mRNASeqExperiment.objects.count(), 1)
+        self.assertEqual(Comparison.objects.count(), 1)
+
+    def test_archive_commands(self):
+        '''This tests that the export_archive and import_archive commands copy an experiment.'''
+        call_command('export_archive', 'mrnaseqexperiment', '1', self.filename, stdout=StringIO())
+        call_command('import_archive', self.filename, stdout=StringIO())
+        self.assertEqual(mRNASeqExperiment.objects.count(), 2)
+        self.assertEqual(GeneExperimentData.objects.count(), 18)
+
+class ExperimentDataViewTests(GenericModelTests):
+    '''This class tests the keyset paginated experiment-data view.'''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def setUp(self):
+        '''Imports the sample gene_exp.diff.'''
+        super(ExperimentDataViewTests, self).setUp()
+        cufflinks_gene_diff_import(1, "data/fixtures/sample_gene_exp.diff")
+
+    def get_all_pages(self, url, parameters):
+        '''Follows the next links from a url, returning all the rows.'''
+        rows = []
+        while url:
+            test_response = self.client.get(url, parameters)
+            self.assertEqual(test_response.status_code, 200)
+            page = json.loads(test_response.content)
+            self.assertTrue(len(page['results']) <= parameters.get('limit', 1000))
+            rows += page['results']
+            url, parameters = page['next'], {}
+        return rows
+
+    def test_pages(self):
+        '''This tests that following the pages returns every row once, in order of gene or q-value.'''
+        genes = sorted(GeneExperimentData.objects.values_list('gene', flat=True))
+        rows = self.get_all_pages('/data/mrnaseqexperiment/1', {'limit': 4})
+        self.assertEqual([row['gene'] for row in rows], genes)
+        self.assertEqual(rows[0]['sample_1'], 'Control')
+        rows = self.get_all_pages('/data/mrnaseqexperiment/1', {'limit': 3, 'order': 'q_value'})
+        self.assertEqual(sorted(row['gene'] for row in rows), genes)
+        q_values = [row['q_value'] for row in rows]
+        self.assertEqual(q_values, sorted(q_values))
+
+    def test_filters(self):
+        '''This tests the gene, q-value and fold change filters.'''
+        rows = self.get_all_pages('/data/mrnaseqexperiment/1', {'gene': 'Gm1992,U6,Pikfyve'})
+        self.assertEqual([row['gene'] for row in rows], ['Gm1992', 'U6'])
+        rows = self.get_all_pages('/data/mrnaseqexperiment/1', {'q_value': '0.9999999', 'fold_change_min': '-1', 'fold_change_max': '1', 'limit': 2})
+        expected = GeneExperimentData.objects.filter(q_value__lt=0.9999999, fold_change__gte=-1, fold_change__lte=1)
+        self.assertEqual(sorted(row['gene'] for row in rows), sorted(expected.values_list('gene', flat=True)))
+
+    def test_tsv(self):
+        '''This tests that a page can be downloaded as TSV with a Link header to the next page, with floats at full precision and the significant field as yes or no.'''
+        test_response = self.client.get('/data/mrnaseqexperiment/1', {'format': 'tsv', 'limit': 2})
+        self.assertEqual(test_response['Content-Type'], 'text/tab-separated-values')
+        lines = test_response.content.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('gene\tinternal_id'))
+        self.assertTrue('rel="next"' in test_response['Link'])
+        GeneExperimentData.objects.filter(gene='Gm1992').update(fold_change=0.12345678901234567)
+        lines = self.client.get('/data/mrnaseqexperiment/1', {'format': 'tsv', 'gene': 'Gm1992'}).content.splitlines()
+        row = dict(zip(lines[0].split('\t'), lines[1].split('\t')))
+        self.assertEqual(float(row['fold_change']), 0.12345678901234567)
+        self.assertTrue(row['significant'] in ('yes', 'no'))
+
+    def test_errors(self):
+        '''This tests that invalid parameters, unknown experiments and models which are not experiments are a bad request.'''
+        for url, parameters in [('/data/mrnaseqexperiment/1', {'order': 'locus'}), ('/data/mrnaseqexperiment/1', {'cursor': 'abc'}),
+            ('/data/mrnaseqexperiment/1', {'q_value': 'low'}), ('/data/mrnaseqexperiment/1', {'limit': 0}),
+            ('/data/mrnaseqexperiment/99', {}), ('/data/gene/1', {}), ('/data/sample/1', {})]:
+            self.assertEqual(self.client.get(url, parameters).status_code, 400)
+
+    def test_infinite_values(self):
+        '''This tests that infinite fold changes are returned as inf or -inf by the JSON views, which a strict parser accepts.'''
+        with open("data/fixtures/sample_gene_exp.diff") as inputfile:
+            lines = inputfile.readlines()
+        lines[1] = lines[1].replace('0.178686\t-0.0754818\t0.939831\t1\tno', '-inf\t\t1e-300\t2.5e-299\tyes')
+        cufflinks_gene_diff_import(1, lines, mode='replace')
+
+        def invalid_constant(constant):
+            raise ValueError("%s is not valid JSON" % constant)
+
+        for url, parameters in [('/data/mrnaseqexperiment/1', {'gene': 'Gm16088'}), ('/data/mrnaseqexperiment/1/top', {'ranking': 'down'}),
+            ('/data/mrnaseqexperiment/1/plot', {'gene': 'Gm16088'}), ('/data/mrnaseqexperiment/1/summary', {}), ('/data/correlations/Gm16088', {})]:
+            test_response = self.client.get(url, parameters)
+            self.assertEqual(test_response.status_code, 200)
+            json.loads(test_response.content, parse_constant=invalid_constant)
+        rows = json.loads(self.client.get('/data/mrnaseqexperiment/1', {'gene': 'Gm16088'}).content)['results']
+        self.assertEqual((rows[0]['fold_change'], rows[0]['test_statistic']), ('-inf', None))
+        results = json.loads(self.client.get('/data/mrnaseqexperiment/1/top', {'ranking': 'down'}).content)['results']
+        self.assertTrue('-inf' in [result['fold_change'] for result in results])
+
+    def test_cached(self):
+        '''This tests that pages are cached until the data of the experiment change, by a save or by an import.'''
+        self.client.get('/data/mrnaseqexperiment/1', {'gene': 'U6'})
+        with self.assertNumQueries(3): #the session, the user and the version of the experiment
+            test_response = self.client.get('/data/mrnaseqexperiment/1', {'gene': 'U6'})
+        self.assertEqual(json.loads(test_response.content)['results'][0]['fold_change'], 0)
+        datum = GeneExperimentData.objects.get(gene='U6')
+        datum.fold_change = 2.5
+        datum.save()
+        test_response = self.client.get('/data/mrnaseqexperiment/1', {'gene': 'U6'})
+        self.assertEqual(json.loads(test_response.content)['results'][0]['fold_change'], 2.5)
+        cufflinks_gene_diff_import(1, "data/fixtures/sample_gene_exp.diff", mode='replace')
+        test_response = self.client.get('/data/mrnaseqexperiment/1', {'gene': 'U6'})
+        self.assertEqual(json.loads(test_response.content)['results'][0]['fold_change'], 0)
+
+    def test_cached_version_changed_elsewhere(self):
+        '''This tests that a cached page is not used once the version of its experiment is changed in the database, as by another process, even if the cache is emptied.'''
+        key = experiment_version_key(ContentType.objects.get_for_model(mRNASeqExperiment).pk, 1)
+        self.client.get('/data/mrnaseqexperiment/1', {'gene': 'U6'})
+        GeneExperimentData.objects.filter(gene='U6').update(fold_change=2.5)
+        cache.delete_many([key])
+        self.assertEqual(json.loads(self.client.get('/data/mrnaseqexperiment/1', {'gene': 'U6'}).content)['results'][0]['fold_change'], 0)
+        cursor = connection.cursor()
+        cursor.execute("UPDATE data_dataversion SET token = %s WHERE name = %s", ['changed', key])
+        self.assertEqual(json.loads(self.client.get('/data/mrnaseqexperiment/1', {'gene': 'U6'}).content)['results'][0]['fold_change'], 2.5)
+
+    def test_export(self):
+        '''This tests that the experiment-data-export view streams every row as TSV, CSV or gzip.'''
+        test_response = self.client.get('/data/mrnaseqexperiment/1/export')
+        self.assertEqual(test_response['Content-Type'], 'text/tab-separated-values')
+        self.assertEqual(test_response['Content-Disposition'], 'attachment; filename=mrnaseqexperiment_1.tsv')
+        lines = test_response.content.splitlines()
+        self.assertEqual(lines[0].split('\t'), list(DATA_FIELDS))
+        self.assertEqual([line.split('\t')[0] for line in lines[1:]], sorted(GeneExperimentData.objects.values_list('gene', flat=True)))
+        self.assertEqual(set(line.split('\t')[-1] for line in lines[1:]), set(['no']))
+        self.assertEqual([_format_value(value, boolean=True) for value in (1, 0, True, False)], ['yes', 'no', 'yes', 'no'])
+        test_response = self.client.get('/data/mrnaseqexperiment/1/export', {'format': 'csv', 'gzip': 1, 'gene': 'U6'})
+        self.assertEqual(test_response['Content-Type'], 'application/x-gzip')
+        lines = gzip.GzipFile(fileobj=StringIO(test_response.content)).read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('U6,XLOC_'))
+        self.assertEqual(self.client.get('/data/mrnaseqexperiment/1/export', {'format': 'xls'}).status_code, 400)
+
+    def test_export_streams(self):
+        '''This tests that an export yields the header before reading any rows, then the rows in chunks.'''
+        chunks = export_experiment_data(GeneExperimentData.objects.for_experiment(mRNASeqExperiment.objects.get(pk=1)), chunk_size=2)
+        with self.assertNumQueries(0):
+            self.assertEqual(chunks.next(), '\t'.join(DATA_FIELDS) + '\n')
+        self.assertEqual(len(list(chunks)), 5)
+
+    def test_export_experiment_command(self):
+        '''This tests that the export_experiment command writes a gzip file.'''
+        filename = os.path.join(self.cache_settings.options['EXPRESSION_CACHE_ROOT'], 'export.tsv.gz')
+        call_command('export_experiment', 'mrnaseqexperiment', '1', gzip=True, output=filename)
+        self.assertEqual(len(gzip.open(filename).read().splitlines()), GeneExperimentData.objects.count() + 1)
+
+class DataVersionTests(TransactionTestCase):
+    '''This class tests that the versions of :mod:`data.cache` are shared between database connections, as they are between processes.'''
+
+    def test_versions_from_another_connection(self):
+        '''This tests that a version changed and committed by another connection is read by this one, and a new version by another connection is created.
+
+        This needs a database which can be opened by a second connection, so it is skipped for an in-memory SQLite database.
+        '''
+        if connection.settings_dict['NAME'] == ':memory:':
+            return
+        other = load_backend(connection.settings_dict['ENGINE']).DatabaseWrapper(dict(connection.settings_dict), 'other')
+        try:
+            change_versions(['version:test'])
+            version = get_versions(['version:test'])[0]
+            other.cursor().execute("UPDATE data_dataversion SET token = %s WHERE name = %s", ['changed', 'version:test'])
+            other._commit()
+            self.assertEqual(get_versions(['version:test']), ['changed'])
+            other.cursor().execute("INSERT INTO data_dataversion (name, token) VALUES (%s, %s)", ['version:other', 'created'])
+            other._commit()
+            change_versions(['version:test', 'version:other', 'version:new'])
+            versions = get_versions(['version:test', 'version:other', 'version:new'])
+            self.assertEqual(len(set(versions)), 1)
+            self.assertFalse(set(versions) & set(['changed', 'created', version]))
+        finally:
+            other.close()
+        self.assertEqual(DataVersion.objects.count(), 3)
+
+class QueryPlanTests(TransactionTestCase):
+    '''This class tests that the lookups of :class:`~data.models.ExperimentDataManager` use the indexes added in the data migrations.
+
+    The query plans are only checked on SQLite, where an indexed lookup is shown as SEARCH ... USING INDEX and a full table scan as SCAN.
+    This is a TransactionTestCase as the SQLite driver commits before running EXPLAIN.
+    '''
+
+    fixtures = ['experiment_test_fixture', 'gene_test_fixture', ]
+
+    def assertUsesIndex(self, queryset, columns):
+        '''Checks that the query plan searches the data table by an index on these columns, without scanning or sorting it.'''
+        if connection.vendor != 'sqlite':
+            return
+        plan = ' '.join(query_plan(queryset))
+        self.assertTrue('USING INDEX' in plan or 'USING COVERING INDEX' in plan, plan)
+        self.assertTrue('(%s)' % columns in plan, plan)
+        self.assertFalse('SCAN' in plan, plan)
+        self.assertFalse('TEMP B-TREE' in plan, plan)
+
+    def test_for_experiment_query_plan(self):
+        '''This tests that the data for an experiment are read from the (experiment_type, experiment_id, gene) index.'''
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        self.assertUsesIndex(GeneExperimentData.objects.for_experiment(experiment), 'experiment_type_id=? AND experiment_id=?')
+
+    def test_for_gene_query_plan(self):
+        '''This tests that the data for a gene are read in experiment order from the (gene, experiment_type, experiment_id) index.'''
+        self.assertUsesIndex(GeneExperimentData.objects.for_gene('Pikfyve'), 'gene_id=?')
+
+    def test_significant_query_plan(self):
+        '''This tests that the significant data of an experiment are read in order from the (experiment_type, experiment_id, q_value) index.'''
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        self.assertUsesIndex(GeneExperimentData.objects.significant(experiment), 'experiment_type_id=? AND experiment_id=? AND q_value<?')
+
+    def test_experiment_data_page_query_plan(self):
+        '''This tests that a page after a cursor starts from the (experiment_type, experiment_id, gene) index rather than scanning earlier rows.'''
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        data = filter_experiment_data(experiment).order_by('gene', 'pk').filter(gene__gte='Gm1992').exclude(gene='Gm1992', pk__lte=10)
+        self.assertUsesIndex(data, 'experiment_type_id=? AND experiment_id=? AND gene_id>?')
+
+    def test_significant(self):
+        '''This tests that :meth:`~data.models.ExperimentDataManager.significant` returns the data below the q-value threshold, most significant first.'''
+        experiment = mRNASeqExperiment.objects.get(pk=1)
+        cache_settings = override_settings(EXPRESSION_CACHE_ROOT=tempfile.mkdtemp())
+        with cache_settings:
+            cufflinks_gene_diff_import(experiment.pk, "data/fixtures/sample_gene_exp.diff")
+        shutil.rmtree(cache_settings.options['EXPRESSION_CACHE_ROOT'])
+        q_values = [datum.q_value for datum in GeneExperimentData.objects.significant(experiment, 0.9999999)]
+        self.assertTrue(q_values)
+        self.assertEqual(q_values, sorted(q_values))
+        self.assertTrue(all(q_value < 0.9999999 for q_value in q_values))
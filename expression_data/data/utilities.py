@@ -1,65 +1,758 @@
 '''This package contains utility functions for the :mod:`data` app.
 
 These functions import data from a variety of tables into the database.
+Rows are written with batched inserts rather than one query per row, see :func:`~data.utilities.bulk_insert`.
 '''
 
 import csv
+import itertools
+import tempfile
 
-from data.models import GeneExperimentData
-from experiments.models import mRNASeqExperiment
+import numpy
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction, DEFAULT_DB_ALIAS, IntegrityError
+
+from data.models import GeneExperimentData, IsoformExperimentData, TSSGroupExperimentData, RankedGene, ExperimentSummary, Comparison, IMPORT_MODES
+from data.cache import invalidate_experiment
+from data.columns import build_experiment_columns, invalidate_experiment_columns
+from data.rankings import compute_rankings
+from data.summaries import SummaryCounter, compute_summary, stored_counter
+from experiments.models import mRNASeqExperiment, MicroArrayExperiment
 from genes.models import Gene
+from genes.search import invalidate_gene_search
 
-def cufflinks_gene_diff_import(experiment_id, filename):
-    '''This function imports the data from a gene_exp.diff into :class:`~data.models.GeneExperimentData` objects.
-    
-    This function requires a valid experiment_id and a file.
+BATCH_SIZE = 1000
+
+#The GeneExperimentData field, gene_exp.diff column and type for each column in a gene_exp.diff file, numeric and boolean columns are read as NumPy arrays.
+#The sample names are stored as a Comparison by write_gene_experiment_data.
+CUFFLINKS_GENE_COLUMNS = (
+    ('gene_id', 'gene', None),
+    ('locus', 'locus', None),
+    ('internal_id', 'test_id', None),
+    ('sample_1', 'sample_1', None),
+    ('sample_2', 'sample_2', None),
+    ('status', 'status', None),
+    ('amount_1', 'value_1', float),
+    ('amount_2', 'value_2', float),
+    ('fold_change', 'log2(fold_change)', float),
+    ('test_statistic', 'test_stat', float),
+    ('p_value', 'p_value', float),
+    ('q_value', 'q_value', float),
+    ('significant', 'significant', bool),
+)
+
+#The isoform_exp.diff and tss_group_exp.diff files have the same layout as a gene_exp.diff, but the test_id is the isoform or TSS group.
+CUFFLINKS_ISOFORM_COLUMNS = (('isoform', 'test_id', None), ('internal_id', 'gene_id', None)) + tuple(
+    column for column in CUFFLINKS_GENE_COLUMNS if column[0] != 'internal_id')
+CUFFLINKS_TSS_GROUP_COLUMNS = (('tss_group', 'test_id', None), ('internal_id', 'gene_id', None)) + tuple(
+    column for column in CUFFLINKS_GENE_COLUMNS if column[0] != 'internal_id')
+
+#The model and columns for each of the CUFFLINKS_DATA_TYPES.
+CUFFLINKS_FILES = {
+    'gene': (GeneExperimentData, CUFFLINKS_GENE_COLUMNS),
+    'isoform': (IsoformExperimentData, CUFFLINKS_ISOFORM_COLUMNS),
+    'tss_group': (TSSGroupExperimentData, CUFFLINKS_TSS_GROUP_COLUMNS),
+}
+
+#The fields which identify a row of each model within an experiment, used to match rows when upserting.
+#A cuffdiff file of more than two samples has a row for each gene and Comparison of two samples.
+DATA_KEYS = {
+    GeneExperimentData: ('gene', 'comparison'),
+    IsoformExperimentData: ('gene', 'comparison', 'isoform'),
+    TSSGroupExperimentData: ('gene', 'comparison', 'tss_group'),
+}
+
+#The GeneExperimentData field and column name in a limma topTable or GEO2R table, used by read_microarray_table unless other columns are given.
+LIMMA_COLUMNS = {
+    'internal_id': 'ID',
+    'gene_id': 'Gene.symbol',
+    'fold_change': 'logFC',
+    'test_statistic': 't',
+    'p_value': 'P.Value',
+    'q_value': 'adj.P.Val',
+}
+
+#The GeneExperimentData fields which can be read from a microarray table as numbers.
+MICROARRAY_NUMERIC_FIELDS = ('amount_1', 'amount_2', 'fold_change', 'test_statistic', 'p_value', 'q_value')
+
+#A gene is significant if its q value is below this threshold.
+SIGNIFICANCE_THRESHOLD = 0.05
+
+#The test status codes written by cuffdiff, only OK rows were tested.
+CUFFLINKS_STATUSES = ('OK', 'NOTEST', 'LOWDATA', 'HIDATA', 'FAIL')
+
+def batch_size(model, using=DEFAULT_DB_ALIAS):
+    '''This function returns how many rows of a model can be sent in a single INSERT statement.
+
+    SQLite limits a statement to 999 parameters and 500 compound selects, other backends use **BATCH_SIZE**.
     '''
-    
-    import decimal
-    
-    experiment = mRNASeqExperiment.objects.get(pk=experiment_id)
+
+    if connections[using].vendor == 'sqlite':
+        return max(1, min(500, 999 // len(model._meta.local_fields)))
+    return BATCH_SIZE
+
+def batches(iterable, size):
+    '''This generator splits an iterable into lists of at most size items.'''
+
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def bulk_insert(model, objects, using=DEFAULT_DB_ALIAS):
+    '''This function inserts an iterable of unsaved model instances with batched INSERT statements.
+
+    No signals are sent and primary keys are not set on the instances.
+    Returns the number of inserted rows.
+    '''
+
+    count = 0
+    for batch in batches(objects, batch_size(model, using)):
+        model.objects.using(using).bulk_create(batch)
+        count += len(batch)
+    return count
+
+def insert_rows(model, fields, rows, using=DEFAULT_DB_ALIAS):
+    '''This function inserts rows of values which are already in database form, with batched multi-row INSERT statements.
+
+    Each row is a tuple of values in the order of the field attribute names given in fields, such as *gene_id*.
+    Unlike :func:`~data.utilities.bulk_insert`, no model instances are created and values are not converted by the model fields,
+    so the values must already be valid, for example foreign keys given as the primary key of the related object.
+    Returns the number of inserted rows.
+    '''
+
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    columns = dict((field.attname, field.column) for field in model._meta.local_fields)
+    sql = "INSERT INTO %s (%s) VALUES " % (quote_name(model._meta.db_table), ", ".join(quote_name(columns[field]) for field in fields))
+    placeholder = "(%s)" % ", ".join(["%s"] * len(fields))
+    cursor = connection.cursor()
+    count = 0
+    for batch in batches(rows, batch_size(model, using)):
+        cursor.execute(sql + ", ".join([placeholder] * len(batch)), [value for row in batch for value in row])
+        count += len(batch)
+    transaction.commit_unless_managed(using=using)
+    return count
+
+def create_missing_genes(names, known_genes):
+    '''This function creates a :class:`~genes.models.Gene` for every name which is not in the set known_genes.
+
+    The genes are inserted in batches.  If another import has created some of them in the meantime the insert fails,
+    and it is rolled back to a savepoint and the genes are created one at a time instead, skipping those which exist.
+    The set known_genes is updated with the created names.
+    Returns the number of genes created.
+    '''
+
+    missing = sorted(set(names) - known_genes)
+    if not missing:
+        return 0
+    savepoint = transaction.savepoint()
+    try:
+        created = bulk_insert(Gene, [Gene(name=name) for name in missing])
+        transaction.savepoint_commit(savepoint)
+    except IntegrityError:
+        transaction.savepoint_rollback(savepoint)
+        created = sum(Gene.objects.get_or_create(name=name)[1] for name in missing)
+    known_genes.update(missing)
+    invalidate_gene_search()
+    return created
+
+class InvalidRowsError(ValueError):
+    '''This error is raised when rows of an imported file cannot be converted, the errors attribute lists every problem found.'''
+
+    def __init__(self, errors):
+        self.errors = errors
+        message = "; ".join(errors[:10])
+        if len(errors) > 10:
+            message += "; and %i more errors" % (len(errors) - 10)
+        super(InvalidRowsError, self).__init__(message)
+
+def _float_column(values, column, line_numbers, errors):
+    '''This function converts a list of strings to a NumPy float array in one pass.
+
+    Empty cells become NaN, as do cells which are not numbers, which are also added to errors as (line, message) pairs.
+    '''
+
+    strings = numpy.char.strip(numpy.array(values, dtype=str))
+    strings = numpy.where(strings == '', 'nan', strings)
+    try:
+        return strings.astype(numpy.float64)
+    except ValueError:
+        result = numpy.empty(len(strings))
+        for index, value in enumerate(strings):
+            try:
+                result[index] = float(value)
+            except ValueError:
+                errors.append((line_numbers[index], "invalid value %r in column %s" % (values[index], column)))
+                result[index] = numpy.nan
+        return result
+
+def _check_column(values, column, invalid, line_numbers, errors):
+    '''This function adds a (line, message) error for every row where the boolean array invalid is set.'''
+
+    for index in numpy.flatnonzero(invalid):
+        errors.append((line_numbers[index], "invalid value %r in column %s" % (values[index], column)))
+
+def _read_table_chunks(lines, columns, delimiter='\t', size=BATCH_SIZE):
+    '''This generator reads the given columns of a delimited table with a header line, in chunks of at most size rows.
+
+    The columns are (field, column name) pairs.
+    Yields a dictionary of field to a list of the text values, the line number of each row and a list of (line, message) errors for each chunk.
+    An :class:`~data.utilities.InvalidRowsError` is raised at once if a column is missing.
+    '''
+
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = next(reader, [])
+    missing = [column for field, column in columns if column not in header]
+    if missing:
+        raise InvalidRowsError(["Line 1: missing column %s" % column for column in missing])
+    indices = [header.index(column) for field, column in columns]
+    for rows in batches(((reader.line_num, row) for row in reader if row), size):
+        values = [[] for column in columns]
+        line_numbers = []
+        errors = []
+        for line_number, row in rows:
+            if len(row) != len(header):
+                errors.append((line_number, "expected %i columns but found %i" % (len(header), len(row))))
+                continue
+            line_numbers.append(line_number)
+            for column, index in zip(values, indices):
+                column.append(row[index])
+        yield dict((field, column) for (field, name), column in zip(columns, values)), line_numbers, errors
+
+def _read_table(lines, columns, delimiter='\t'):
+    '''This function reads the given columns of a whole delimited table with a header line, as for :func:`~data.utilities._read_table_chunks`.
+
+    Returns a dictionary of field to a list of the text values, the line number of each row and a list of (line, message) errors.
+    '''
+
+    values = dict((field, []) for field, column in columns)
+    line_numbers = []
+    errors = []
+    for chunk_values, chunk_line_numbers, chunk_errors in _read_table_chunks(lines, columns, delimiter):
+        for field, column in chunk_values.items():
+            values[field].extend(column)
+        line_numbers.extend(chunk_line_numbers)
+        errors.extend(chunk_errors)
+    return values, line_numbers, errors
+
+class RereadableLines(object):
+    '''This class wraps the lines of a file so that they can be read more than once, as for the two passes of :func:`~data.utilities.cufflinks_diff_import`.
+
+    Lists and tuples are read as they are, and files, including uploaded files, are read again from their starting position.
+    Other iterables, which can only be read once, are copied to a temporary file as they are first read, so the lines are never all held in memory.
+    '''
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.start = None
+        if isinstance(lines, (list, tuple)):
+            return
+        try:
+            self.start = lines.tell()
+            lines.seek(self.start)
+        except (AttributeError, IOError):
+            self.lines = tempfile.TemporaryFile()
+            self.lines.writelines(lines)
+            self.start = 0
+
+    def __iter__(self):
+        if self.start is not None:
+            self.lines.seek(self.start)
+        return iter(self.lines)
+
+def read_cufflinks_gene_diff(lines, columns=CUFFLINKS_GENE_COLUMNS):
+    '''This function reads the lines of a gene_exp.diff file into columns and validates them.
+
+    Other cuffdiff files with the same layout, such as isoform_exp.diff, are read by passing their columns from **CUFFLINKS_FILES**.
+    Returns a dictionary of :class:`~data.models.GeneExperimentData` field names to columns.
+    Text columns are lists, the numeric columns are NumPy float arrays and significant is a NumPy boolean array of whether it is yes, which are converted and checked in bulk:
+
+    * empty cells, nan and inf are accepted as numbers.
+    * the status must be one of **CUFFLINKS_STATUSES**.
+    * p and q values must be between 0 and 1, amounts must be positive and finite.
+    * a missing p value, q value or fold change is only allowed for rows which were not tested (any status except OK), and is set to 1, 1 or 0.
+
+    An :class:`~data.utilities.InvalidRowsError` listing every invalid row is raised before anything is returned.
+    This function does not use the database, so it can be run in another process.
+    The whole file is held in memory, see :func:`~data.utilities.read_cufflinks_gene_diff_chunks` to read it a chunk at a time.
+    '''
+
+    values, line_numbers, errors = _read_table(lines, [(field, column) for field, column, convert in columns])
+    values = _convert_cufflinks_columns(values, columns, line_numbers, errors)
+    if errors:
+        raise InvalidRowsError(["Line %i: %s" % error for error in sorted(errors)])
+    return values
+
+def read_cufflinks_gene_diff_chunks(lines, columns=CUFFLINKS_GENE_COLUMNS, size=BATCH_SIZE):
+    '''This generator reads the lines of a gene_exp.diff file in chunks of at most size rows, yielding each as validated columns as from :func:`~data.utilities.read_cufflinks_gene_diff`.
+
+    Only one chunk is held in memory at a time.
+    An :class:`~data.utilities.InvalidRowsError` is raised for the first chunk with invalid rows,
+    so the file is checked with :func:`~data.utilities.check_cufflinks_gene_diff` before anything read from it is written.
+    '''
+
+    for values, line_numbers, errors in _read_table_chunks(lines, [(field, column) for field, column, convert in columns], size=size):
+        values = _convert_cufflinks_columns(values, columns, line_numbers, errors)
+        if errors:
+            raise InvalidRowsError(["Line %i: %s" % error for error in sorted(errors)])
+        yield values
+
+def check_cufflinks_gene_diff(lines, columns=CUFFLINKS_GENE_COLUMNS, size=BATCH_SIZE):
+    '''This function validates every row of a gene_exp.diff file a chunk at a time, without keeping the rows.
+
+    Returns the set of gene names and the set of (sample_1, sample_2) names of the rows,
+    or raises an :class:`~data.utilities.InvalidRowsError` listing every invalid row, as :func:`~data.utilities.read_cufflinks_gene_diff` does.
+    '''
+
+    file_columns = [(field, column) for field, column, convert in columns]
+    genes, samples, errors = set(), set(), []
+    for values, line_numbers, chunk_errors in _read_table_chunks(lines, file_columns, size=size):
+        _convert_cufflinks_columns(values, columns, line_numbers, chunk_errors)
+        errors.extend(chunk_errors)
+        genes.update(values['gene_id'])
+        samples.update(itertools.izip(values['sample_1'], values['sample_2']))
+    if errors:
+        raise InvalidRowsError(["Line %i: %s" % error for error in sorted(errors)])
+    return genes, samples
+
+def _convert_cufflinks_columns(columns, file_columns, line_numbers, errors):
+    '''This function converts and checks the text columns of rows of a cuffdiff file in bulk, for :func:`~data.utilities.read_cufflinks_gene_diff`.
+
+    The file_columns are the (field, column, type) columns of the file, and the line_numbers are those of the rows.
+    Returns the converted columns, adding a (line, message) pair to errors for each invalid value.
+    '''
+
+    names = dict((field, column) for field, column, convert in file_columns)
+    for field, column, convert in file_columns:
+        if convert is float:
+            columns[field] = _float_column(columns[field], column, line_numbers, errors)
+        elif convert is bool:
+            columns[field] = numpy.char.strip(numpy.array(columns[field], dtype=str)) == 'yes'
+
+    with numpy.errstate(invalid='ignore'):
+        tested = numpy.array(columns['status'], dtype=str) == 'OK'
+        _check_column(columns['status'], names['status'], ~numpy.in1d(columns['status'], CUFFLINKS_STATUSES), line_numbers, errors)
+        for field in ('amount_1', 'amount_2'):
+            _check_column(columns[field], names[field], (columns[field] < 0) | numpy.isinf(columns[field]), line_numbers, errors)
+        for field, untested_value in (('p_value', 1.0), ('q_value', 1.0), ('fold_change', 0.0)):
+            missing = numpy.isnan(columns[field])
+            invalid = missing & tested
+            if field != 'fold_change':
+                invalid |= (columns[field] < 0) | (columns[field] > 1)
+            _check_column(columns[field], names[field], invalid, line_numbers, errors)
+            columns[field][missing & ~tested] = untested_value
+    return columns
+
+def read_microarray_table(lines, columns=None, sample_1=None, sample_2=None, delimiter='\t'):
+    '''This function reads the lines of a microarray results table, such as a limma topTable or GEO2R output, into validated columns.
+
+    The columns argument maps :class:`~data.models.GeneExperimentData` fields to column names, updating **LIMMA_COLUMNS**.
+    A field mapped to None is not read.
+    Numeric columns are converted and checked in bulk as for :func:`~data.utilities.read_cufflinks_gene_diff`,
+    p and q values must be between 0 and 1 and the fold change must be a number.
+
+    Probes without a gene are skipped.
+    Probes are collapsed to genes by keeping the probe with the smallest p value for each gene, its probe id is stored as the internal_id.
+    The status is set to OK, significant to whether the q value is below **SIGNIFICANCE_THRESHOLD**, and the sample names to those given.
+    Returns a dictionary of field names to columns, or raises an :class:`~data.utilities.InvalidRowsError` listing every invalid row.
+    '''
+
+    mapping = dict(LIMMA_COLUMNS)
+    mapping.update(columns or {})
+    mapping = [(field, column) for field, column in sorted(mapping.items()) if column]
+    for field in ('internal_id', 'gene_id', 'fold_change', 'p_value', 'q_value'):
+        if field not in dict(mapping):
+            raise ValueError("The %s field must be mapped to a column" % field)
+    columns, line_numbers, errors = _read_table(lines, mapping, delimiter)
+    for field, column in mapping:
+        if field in MICROARRAY_NUMERIC_FIELDS:
+            columns[field] = _float_column(columns[field], column, line_numbers, errors)
+
+    with numpy.errstate(invalid='ignore'):
+        names = dict(mapping)
+        for field in ('p_value', 'q_value'):
+            _check_column(columns[field], names[field], ~((columns[field] >= 0) & (columns[field] <= 1)), line_numbers, errors)
+        _check_column(columns['fold_change'], names['fold_change'], numpy.isnan(columns['fold_change']), line_numbers, errors)
+        for field in ('amount_1', 'amount_2'):
+            if field in columns:
+                _check_column(columns[field], names[field], (columns[field] < 0) | numpy.isinf(columns[field]), line_numbers, errors)
+    if errors:
+        raise InvalidRowsError(["Line %i: %s" % error for error in sorted(errors)])
+
+    genes = numpy.char.strip(numpy.array(columns['gene_id'], dtype=str))
+    order = numpy.lexsort((columns['p_value'], genes))
+    first = numpy.ones(len(order), dtype=bool)
+    first[1:] = genes[order][1:] != genes[order][:-1]
+    keep = numpy.sort(order[first & (genes[order] != '')])
+    for field, column in columns.items():
+        if isinstance(column, numpy.ndarray):
+            columns[field] = column[keep]
+        else:
+            columns[field] = numpy.array(column, dtype=object)[keep].tolist()
+    columns['gene_id'] = genes[keep].tolist()
+    with numpy.errstate(invalid='ignore'):
+        columns['significant'] = columns['q_value'] < SIGNIFICANCE_THRESHOLD
+    columns['status'] = ['OK'] * len(keep)
+    columns['sample_1'] = [sample_1] * len(keep)
+    columns['sample_2'] = [sample_2] * len(keep)
+    return columns
+
+def gene_data_rows(columns, model=GeneExperimentData):
+    '''This generator turns columns, such as those from :func:`~data.utilities.read_cufflinks_gene_diff`, into dictionaries of field values for each row.
+
+    NaN in the optional numeric fields is stored as NULL, as not every database can store NaN, while infinite values are kept,
+    so the values can be written with :func:`~data.utilities.insert_rows` without being converted again.
+    '''
+
+    fields = sorted(columns)
+    values = []
+    for field in fields:
+        column = columns[field]
+        if isinstance(column, numpy.ndarray):
+            model_field = model._meta.get_field(field)
+            if model_field.null:
+                missing = numpy.isnan(column)
+                column = column.astype(object)
+                column[missing] = None
+            column = column.tolist()
+        values.append(column)
+    for row in itertools.izip(*values):
+        yield dict(itertools.izip(fields, row))
+
+def parse_cufflinks_gene_diff(lines):
+    '''This function parses the lines of a gene_exp.diff file into dictionaries of typed :class:`~data.models.GeneExperimentData` field values.
+
+    The whole file is validated by :func:`~data.utilities.check_cufflinks_gene_diff` first, so an invalid file fails before any row is returned,
+    and the rows are then read a chunk at a time by :func:`~data.utilities.read_cufflinks_gene_diff_chunks`.
+    '''
+
+    lines = RereadableLines(lines)
+    check_cufflinks_gene_diff(lines)
+    return _cufflinks_rows(lines)
+
+def _cufflinks_rows(lines, columns=CUFFLINKS_GENE_COLUMNS, model=GeneExperimentData):
+    '''This generator yields the rows of a checked cuffdiff file as dictionaries of field values, reading a chunk at a time.'''
+
+    for chunk in read_cufflinks_gene_diff_chunks(lines, columns):
+        for row in gene_data_rows(chunk, model):
+            yield row
+
+def delete_experiment_data(model, experiment, using=DEFAULT_DB_ALIAS):
+    '''This function deletes all rows of a :class:`~data.models.BaseData` model for an experiment with a single DELETE statement.
+
+    Unlike QuerySet.delete the rows are not loaded first and no signals are sent.
+    The version of the experiment is changed, except when deleting the :class:`~data.models.RankedGene` lists, which are rebuilt from unchanged data.
+    Returns the number of deleted rows.
+    '''
+
+    connection = connections[using]
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM %s WHERE experiment_type_id = %%s AND experiment_id = %%s" % connection.ops.quote_name(model._meta.db_table),
+        [experiment_type.pk, experiment.pk])
+    transaction.commit_unless_managed(using=using)
+    if model is GeneExperimentData:
+        invalidate_experiment_columns(experiment_type.pk, experiment.pk)
+        delete_experiment_data(RankedGene, experiment, using)
+        ExperimentSummary.objects.db_manager(using).mark_stale(experiment_type.pk, experiment.pk)
+    if model is not RankedGene:
+        invalidate_experiment(experiment_type.pk, experiment.pk)
+    return cursor.rowcount
+
+def delete_rows(model, pks, using=DEFAULT_DB_ALIAS):
+    '''This function deletes the rows of a model with the given primary keys with batched DELETE statements.
+
+    As for :func:`~data.utilities.delete_experiment_data` the rows are not loaded and no signals are sent.
+    Returns the number of deleted rows.
+    '''
+
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    sql = "DELETE FROM %s WHERE %s IN " % (quote_name(model._meta.db_table), quote_name(model._meta.pk.column))
+    cursor = connection.cursor()
+    count = 0
+    for batch in batches(pks, batch_size(model, using)):
+        cursor.execute(sql + "(%s)" % ", ".join(["%s"] * len(batch)), batch)
+        count += cursor.rowcount
+    transaction.commit_unless_managed(using=using)
+    return count
+
+def query_plan(queryset):
+    '''This function returns the lines of the database query plan for a QuerySet, to check which indexes a query uses.
+
+    This uses EXPLAIN QUERY PLAN on SQLite and EXPLAIN on other databases.
+    The SQLite driver commits any open transaction before running EXPLAIN.
+    '''
+
+    connection = connections[queryset.db]
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    explain = connection.vendor == 'sqlite' and 'EXPLAIN QUERY PLAN' or 'EXPLAIN'
+    cursor = connection.cursor()
+    cursor.execute('%s %s' % (explain, sql), params)
+    return [' '.join(unicode(value) for value in row) for row in cursor.fetchall()]
+
+def resolve_comparisons(experiment, rows, comparisons):
+    '''This function replaces the sample_1 and sample_2 names of each row with the comparison_id of the :class:`~data.models.Comparison` of those samples in an experiment.
+
+    The comparisons are a dictionary of (sample_1, sample_2) names to the id of their comparison, which is updated as comparisons are looked up or created.
+    Rows without sample names get no comparison, and rows without sample_1 and sample_2 fields are left as they are.
+    '''
+
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    for row in rows:
+        if 'sample_1' not in row and 'sample_2' not in row:
+            continue
+        samples = (row.pop('sample_1', None) or None, row.pop('sample_2', None) or None)
+        if samples not in comparisons:
+            comparisons[samples] = None
+            if samples != (None, None):
+                comparisons[samples] = Comparison.objects.get_or_create(experiment_type=experiment_type, experiment_id=experiment.pk,
+                    sample_1=samples[0], sample_2=samples[1])[0].pk
+        row['comparison_id'] = comparisons[samples]
+
+def _db_values(model, values, using=DEFAULT_DB_ALIAS):
+    '''This function converts a dictionary of field values to the values stored in the database, so that parsed and stored values can be compared.'''
+
+    connection = connections[using]
+    opts = model._meta
+    return dict((name, opts.get_field(name).get_db_prep_save(value, connection=connection)) for name, value in values.items())
+
+def _stored_data(model, experiment, keys, fields):
+    '''This function loads the stored rows of an experiment as a dictionary of the key field values to (primary key, database values).
+
+    The keys are field names such as gene, and the values are read for the given fields.
+    If there is more than one row for a key, the primary keys of the extra rows are returned as a list of duplicates.
+    '''
+
+    stored = {}
+    duplicates = []
+    rows = model.objects.for_experiment(experiment).order_by('gene', 'pk').values('pk', *(list(keys) + fields))
+    for row in rows.iterator():
+        pk, key = row.pop('pk'), tuple(row.pop(name) for name in keys)
+        if key in stored:
+            duplicates.append(pk)
+        else:
+            stored[key] = (pk, _db_values(model, row))
+    return stored, duplicates
+
+def write_gene_experiment_data(experiment, rows, progress=None, known_genes=None, mode='append', model=GeneExperimentData, genes=None, samples=None):
+    '''This function writes parsed rows for an experiment as :class:`~data.models.GeneExperimentData` objects, or objects of another :class:`~data.models.BaseData` model.
+
+    The rows are dictionaries of field values in database form, as generated by :func:`~data.utilities.parse_cufflinks_gene_diff`,
+    or a dictionary of columns, such as those from :func:`~data.utilities.read_cufflinks_gene_diff`, which are turned into rows by :func:`~data.utilities.gene_data_rows`.
+    The sample names of the rows are stored as a :class:`~data.models.Comparison` of the experiment, see :func:`~data.utilities.resolve_comparisons`.
+    Genes are resolved against known_genes, a set of existing :class:`~genes.models.Gene` names which is loaded if not passed.
+    The data are inserted in batches within one transaction, so readers never see a partly written experiment.
+    Given columns, or the gene names and (sample_1, sample_2) names of every row as genes and samples, the missing genes and the comparisons are created and committed before that transaction,
+    so imports running at the same time do not wait on each other to create the same genes.
+    Otherwise they are created in each batch, see :func:`~data.utilities.create_missing_genes`.
+    The version of the experiment is changed in the same transaction, so its cached responses are no longer used, see :mod:`data.cache`.
+    The columns and rankings of gene level data are then rebuilt for the new version with :func:`~data.columns.build_experiment_columns` and :func:`~data.rankings.compute_rankings`.
+    The :class:`~data.models.ExperimentSummary` of gene level data is added up from the rows as they are written, in the same transaction,
+    except for upserts, after which it is computed again from the data, see :mod:`data.summaries`.
+    If a progress function is passed it is called with the number of rows processed so far after each batch.
+
+    The mode is one of **IMPORT_MODES**:
+
+    * append adds the rows to any existing data for the experiment.
+      Models with a unique row for each of their **DATA_KEYS**, isoform and TSS group data, can only be appended to an experiment without them, and a ValueError is raised otherwise.
+    * replace deletes the existing data for the experiment with a single statement before inserting the rows.
+    * upsert compares the rows to the stored data for each gene and comparison (or the fields in **DATA_KEYS** for the model), inserting new rows and removing duplicated rows.
+      Changed rows are deleted and inserted again in each batch with :func:`~data.utilities.delete_rows`, rather than updated one at a time.
+      If the rows repeat a key only the first of them is used, as for the stored rows.
+    '''
+
+    if mode not in dict(IMPORT_MODES):
+        raise ValueError("%s is not an import mode" % mode)
+    if mode == 'append' and model._meta.unique_together and model.objects.for_experiment(experiment).exists():
+        raise ValueError("%s already has %s, use the replace or upsert mode to import it again" % (experiment, model._meta.verbose_name_plural.lower()))
+    experiment_type = ContentType.objects.get_for_model(experiment)
+    if known_genes is None:
+        known_genes = set(Gene.objects.values_list('pk', flat=True))
+    keys = DATA_KEYS[model]
+    key_fields = [model._meta.get_field(name).attname for name in keys]
+    names = dict((field.attname, field.name) for field in model._meta.local_fields)
+    comparisons = {}
+    processed = 0
+    measurements = 0
+    updated = 0
     new_genes = 0
-    updated_genes =0
-    with open(filename, 'r') as inputfile:
-        for row in csv.DictReader(inputfile, delimiter='\t'):
-            try: 
-                datum = GeneExperimentData(
-                     experiment=experiment,
-        			 gene=Gene.objects.get(pk=row['gene']),
-        			 fold_change = row['log2(fold_change)'],
-        			 p_value = row['p_value'],
-        			 q_value = row['q_value'],
-        			 locus = row['locus'],
-        			 internal_id = row['test_id'],
-        			 sample_1 = row['sample_1'],
-        			 sample_2 = row['sample_2'],
-        			 amount_1 = row['value_1'],
-        			 amount_2 = row['value_2'],
-        			 status = row['status'],
-        			 test_statistic = row['test_stat'],
-        			 significant = row['significant'])
-                datum.save()
-                updated_genes += 1
-            except Gene.DoesNotExist:
-                #create a new gene with that name
-                new_gene = Gene(name=row['gene'])
-                new_gene.save()
-                datum = GeneExperimentData(
-                     experiment=experiment,
-        			 gene=new_gene,
-        			 fold_change = row['log2(fold_change)'],
-        			 p_value = row['p_value'],
-        			 q_value = row['q_value'],
-        			 locus = row['locus'],
-        			 internal_id = row['test_id'],
-        			 sample_1 = row['sample_1'],
-        			 sample_2 = row['sample_2'],
-        			 amount_1 = row['value_1'],
-        			 amount_2 = row['value_2'],
-        			 status = row['status'],
-        			 test_statistic = row['test_stat'],
-        			 significant = row['significant'])
-                datum.save()
-                new_genes +=1
-    return "Added %i measurements and created %i new genes." %(updated_genes+new_genes, new_genes)              
-                
\ No newline at end of file
+    if isinstance(rows, dict):
+        columns, rows = rows, gene_data_rows(rows, model)
+        genes = columns['gene_id']
+        if 'sample_1' in columns and 'sample_2' in columns:
+            samples = set(zip(columns['sample_1'], columns['sample_2']))
+    if genes is not None:
+        with transaction.commit_on_success():
+            new_genes += create_missing_genes(genes, known_genes)
+            if samples:
+                resolve_comparisons(experiment, [{'sample_1': sample_1, 'sample_2': sample_2} for sample_1, sample_2 in samples], comparisons)
+    with transaction.commit_on_success():
+        if mode == 'replace':
+            removed = delete_experiment_data(model, experiment)
+        summary = None
+        if model is GeneExperimentData and mode == 'replace':
+            summary = SummaryCounter()
+        elif model is GeneExperimentData and mode == 'append':
+            summary = stored_counter(experiment)
+        elif mode == 'upsert':
+            stored, duplicates = None, []
+        for rows in batches(rows, batch_size(model)):
+            new_genes += create_missing_genes([row['gene_id'] for row in rows], known_genes)
+            resolve_comparisons(experiment, rows, comparisons)
+            processed += len(rows)
+            if mode == 'upsert':
+                if stored is None:
+                    fields = [names[name] for name in rows[0] if name not in key_fields]
+                    stored, duplicates = _stored_data(model, experiment, keys, fields)
+                new_rows, changed_rows, changed_pks = [], [], []
+                for row in rows:
+                    key = tuple(row.get(name) for name in key_fields)
+                    #rows which have been written by this import are stored without a primary key
+                    pk, stored_values = stored.get(key, (None, None))
+                    if key in stored and pk is None:
+                        continue
+                    stored[key] = (None, None)
+                    if pk is None:
+                        new_rows.append(row)
+                        continue
+                    values = _db_values(model, dict((names[name], value) for name, value in row.items() if name not in key_fields))
+                    if any(value != stored_values[name] for name, value in values.items()):
+                        changed_rows.append(row)
+                        changed_pks.append(pk)
+                delete_rows(model, changed_pks)
+                measurements += len(new_rows)
+                updated += len(changed_rows)
+                rows = new_rows + changed_rows
+            if rows:
+                row_fields = rows[0].keys()
+                inserted = insert_rows(model, ['experiment_type_id', 'experiment_id'] + row_fields,
+                    [[experiment_type.pk, experiment.pk] + [row[field] for field in row_fields] for row in rows])
+                if mode != 'upsert':
+                    measurements += inserted
+                if summary:
+                    summary.add(rows)
+            if progress:
+                progress(processed)
+        if mode == 'upsert':
+            delete_rows(model, duplicates)
+        if summary:
+            summary.save(experiment)
+        elif model is GeneExperimentData:
+            ExperimentSummary.objects.mark_stale(experiment_type.pk, experiment.pk)
+        invalidate_experiment(experiment_type.pk, experiment.pk)
+    if model is GeneExperimentData:
+        build_experiment_columns(experiment, known_genes)
+        compute_rankings(experiment)
+        if not summary:
+            compute_summary(experiment)
+    if mode == 'replace':
+        return "Removed %i measurements. Added %i measurements and created %i new genes." %(removed, measurements, new_genes)
+    if mode == 'upsert':
+        return "Added %i measurements, updated %i measurements and created %i new genes." %(measurements, updated, new_genes)
+    return "Added %i measurements and created %i new genes." %(measurements, new_genes)
+
+def cufflinks_diff_import(experiment_id, source, progress=None, mode='append', data_type='gene'):
+    '''This function imports the data from a cuffdiff gene_exp.diff, isoform_exp.diff or tss_group_exp.diff file.
+
+    The data_type is one of **CUFFLINKS_DATA_TYPES** and selects the model and columns from **CUFFLINKS_FILES**.
+    The source is either a filename or an iterable of lines, such as an open file or an :class:`~django.core.files.uploadedfile.UploadedFile`.
+    The file is read twice, a chunk of **BATCH_SIZE** rows at a time, so memory use does not grow with its size, see :class:`~data.utilities.RereadableLines`.
+    The first pass validates every row and collects the genes and samples with :func:`~data.utilities.check_cufflinks_gene_diff`, so an invalid file fails before anything is written.
+    The second pass converts each chunk with :func:`~data.utilities.read_cufflinks_gene_diff_chunks`,
+    and the rows are written in batches by :func:`~data.utilities.write_gene_experiment_data` with the progress function and mode.
+    '''
+
+    if isinstance(source, basestring):
+        with open(source, 'r') as inputfile:
+            return cufflinks_diff_import(experiment_id, inputfile, progress, mode, data_type)
+
+    model, columns = CUFFLINKS_FILES[data_type]
+    experiment = mRNASeqExperiment.objects.get(pk=experiment_id)
+    lines = RereadableLines(source)
+    genes, samples = check_cufflinks_gene_diff(lines, columns)
+    return write_gene_experiment_data(experiment, _cufflinks_rows(lines, columns, model), progress, mode=mode, model=model, genes=genes, samples=samples)
+
+def cufflinks_gene_diff_import(experiment_id, source, progress=None, mode='append'):
+    '''This function imports the data from a gene_exp.diff into :class:`~data.models.GeneExperimentData` objects.
+
+    This function requires a valid experiment_id and a source.
+    The source is either a filename or an iterable of lines, such as an open file or an :class:`~django.core.files.uploadedfile.UploadedFile`.
+    The file is validated and then written a chunk at a time, so it is never held in memory as a whole, see :func:`~data.utilities.cufflinks_diff_import`.
+    All gene names are resolved against a set of the existing :class:`~genes.models.Gene` names loaded in a single query.
+    Missing genes and the comparisons are created and committed first, so imports running at the same time do not wait on each other to create them,
+    then the data are inserted in batches within one transaction, see :func:`~data.utilities.write_gene_experiment_data`.
+    If a progress function is passed it is called with the number of rows processed so far after each batch.
+    The mode controls what happens to data already stored for the experiment, see :func:`~data.utilities.write_gene_experiment_data`.
+    '''
+
+    return cufflinks_diff_import(experiment_id, source, progress, mode, 'gene')
+
+def microarray_import(experiment_id, source, progress=None, mode='append', columns=None, sample_1=None, sample_2=None):
+    '''This function imports a microarray results table into :class:`~data.models.GeneExperimentData` objects for a :class:`~experiments.models.MicroArrayExperiment`.
+
+    The source is either a filename or an iterable of lines.
+    The table is read, validated and collapsed from probes to genes by :func:`~data.utilities.read_microarray_table`, using the columns mapping and sample names.
+    The genes are then written in batches by :func:`~data.utilities.write_gene_experiment_data` with the progress function and mode.
+    '''
+
+    if isinstance(source, basestring):
+        with open(source, 'r') as inputfile:
+            return microarray_import(experiment_id, inputfile, progress, mode, columns, sample_1, sample_2)
+
+    experiment = MicroArrayExperiment.objects.get(pk=experiment_id)
+    return write_gene_experiment_data(experiment, read_microarray_table(source, columns, sample_1, sample_2), progress, mode=mode)
+
+def _parse_cufflinks_file(task):
+    '''This function parses one (experiment_id, filename, columns) task in a worker process of :func:`~data.utilities.parallel_cufflinks_gene_diff_import`.
+
+    Returns the parsed columns, which are mostly NumPy arrays and so quick to send between processes, or the error message if the file is invalid.
+    '''
+
+    experiment_id, filename, columns = task
+    try:
+        with open(filename, 'r') as inputfile:
+            return read_cufflinks_gene_diff(inputfile, columns), None
+    except (IOError, ValueError) as error:
+        return None, "%s" % error
+
+def parallel_cufflinks_gene_diff_import(tasks, processes=None, mode='append', data_type='gene'):
+    '''This function imports many gene_exp.diff (or other cuffdiff) files, each into its own :class:`~experiments.models.mRNASeqExperiment`.
+
+    The tasks are (experiment_id, filename) pairs.
+    The files are parsed and validated on a pool of processes (one per core unless processes is given), while this process writes the parsed rows of each file in turn with :func:`~data.utilities.write_gene_experiment_data`.
+    An invalid file is skipped without affecting the others.
+    The mode is passed to :func:`~data.utilities.write_gene_experiment_data` for every file.
+    All files must be of the same data_type, one of **CUFFLINKS_DATA_TYPES**.
+    Returns a list of (experiment_id, filename, summary, error) tuples in the order of the tasks.
+    '''
+
+    from multiprocessing import Pool
+
+    tasks = list(tasks)
+    experiments = mRNASeqExperiment.objects.in_bulk([experiment_id for experiment_id, filename in tasks])
+    for experiment_id, filename in tasks:
+        if int(experiment_id) not in experiments:
+            raise mRNASeqExperiment.DoesNotExist("There is no experiment %s for %s" % (experiment_id, filename))
+
+    model, file_columns = CUFFLINKS_FILES[data_type]
+    known_genes = set(Gene.objects.values_list('pk', flat=True))
+    results = []
+    pool = Pool(processes)
+    try:
+        parsed = pool.imap(_parse_cufflinks_file, [(experiment_id, filename, file_columns) for experiment_id, filename in tasks])
+        for (experiment_id, filename), (columns, error) in zip(tasks, parsed):
+            summary = None
+            if error is None:
+                summary = write_gene_experiment_data(experiments[int(experiment_id)], columns,
+                    known_genes=known_genes, mode=mode, model=model)
+            results.append((experiment_id, filename, summary, error))
+    finally:
+        pool.terminate()
+    return results
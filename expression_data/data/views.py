@@ -2,37 +2,313 @@
 
 '''
 
+from django.contrib.contenttypes.models import ContentType
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.views.generic.base import View
+from django.views.generic.detail import DetailView
 from django.views.generic.edit import FormView
 
-from data.forms import CufflinksImportForm
+from braces.views import LoginRequiredMixin
+
+from data.cache import CachedResponseMixin, experiment_version_key
+from data.columns import SIGNIFICANT_Q_VALUE
+from data.correlations import correlated_genes
+from data.forms import CufflinksImportForm, MicroArrayImportForm
+from data.models import ImportJob
+from data.overlaps import compare_experiments
+from data.plots import plot_data, BINS
+from data.summaries import experiment_summaries, experiment_summary, summary_dict
+from data.queries import get_experiment, filter_experiment_data, experiment_data_page, export_experiment_data, encode_json, _format_value, BOOLEAN_FIELDS, DATA_FIELDS
+from data.rankings import top_genes, RANKING_THRESHOLD
+
+def number_parameter(request, parameter, default=None):
+    '''This function returns a numeric GET parameter of a request as a float, or the default if it is not given.  Raises a ValueError if it is not a number.'''
+
+    value = request.GET.get(parameter)
+    if value in (None, ''):
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError("%s must be a number" % parameter)
 
 class CufflinksImportFormView(FormView):
-    '''This view generates and processes the data from a cufflinks genes_exp.diff file.
+    '''This view generates and processes the data from a cufflinks genes_exp.diff, isoform_exp.diff or tss_group_exp.diff file.
     
+    The file is not imported during the request, instead an :class:`~data.models.ImportJob` is queued.
     '''
     form_class = CufflinksImportForm
     template_name = "import_form.html"
-    success_url = "/admin/data"
     
     def form_valid(self, form):
-        '''This function, which is passed only when the form has been validated writes the data from the file into the database.'''
-
-        import os
-
-        from django.core.files.storage import default_storage
-        from django.core.files.base import ContentFile
-        from django.conf import settings
-        
-        from data.utilities import cufflinks_gene_diff_import
-
-        #temporarily saves the file to the disk
-        data = form.cleaned_data['uploaded_file']
-        path = default_storage.save('tmp/genes_exp.diff', ContentFile(data.read()))
-        tmp_file = os.path.join(settings.MEDIA_ROOT, path)
-        #saves the records to the database.
-        import_result = cufflinks_gene_diff_import(form.cleaned_data['experiment'], tmp_file)
-        #deletes the file.
-        path = default_storage.delete('tmp/genes_exp.diff')
+        '''This function, which is passed only when the form has been validated queues the file for import.
+
+        The upload is saved with the job and the user is redirected to the status of that job.'''
+
+        self.job = ImportJob(experiment=form.experiment_model.objects.get(pk=form.cleaned_data['experiment']),
+            uploaded_file=form.cleaned_data['uploaded_file'],
+            data_type=form.cleaned_data.get('data_type', 'gene'),
+            mode=form.cleaned_data['mode'])
+        self.job.save()
         return super(CufflinksImportFormView, self).form_valid(form)
-    
-    
\ No newline at end of file
+
+    def get_success_url(self):
+        '''The success url is the status of the queued job.'''
+        return self.job.get_absolute_url()
+
+class MicroArrayImportFormView(CufflinksImportFormView):
+    '''This view queues the import of a microarray results table into a :class:`~experiments.models.MicroArrayExperiment`.
+
+    The table is imported by :func:`~data.utilities.microarray_import` with the default column mapping.
+    '''
+    form_class = MicroArrayImportForm
+
+class ImportJobStatus(DetailView):
+    '''This view returns the progress of an :class:`~data.models.ImportJob` as JSON.
+
+    The response contains the status, rows processed, throughput in rows per second and any error, see :func:`data.jobs.job_status`.
+    '''
+
+    model = ImportJob
+
+    def render_to_response(self, context, **response_kwargs):
+        '''The job status is serialized as JSON rather than rendered with a template.'''
+
+        from data.jobs import job_status
+
+        return HttpResponse(encode_json(job_status(self.object)), content_type='application/json')
+
+class ExperimentDataView(LoginRequiredMixin, CachedResponseMixin, View):
+    '''This view returns the :class:`~data.models.GeneExperimentData` of an experiment one page at a time, as JSON or TSV.
+
+    The experiment is given by the model name of its type, mrnaseqexperiment or microarrayexperiment, and its primary key in the url.
+    The optional parameters are:
+
+    * **gene**, a comma separated list of gene names.
+    * **q_value**, only rows with a q-value below this are returned.
+    * **fold_change_min** and **fold_change_max**, the range of fold changes returned.
+    * **order**, either gene (the default) or q_value.
+    * **limit**, the number of rows in a page, by default 1000.
+    * **cursor**, the cursor of the next page given with the previous page.
+    * **format**, either json (the default) or tsv.
+
+    The pages use keyset pagination, see :mod:`data.queries`.
+    The JSON response contains the rows as results and the url of the next page as next, which is null on the last page.
+    The TSV response has a header row, and the url of the next page is in a Link header.
+    Responses are cached until the data of the experiment change, see :mod:`data.cache`.
+    This view is restricted to logged in users.
+    '''
+
+    def get(self, request, experiment_type, experiment_id):
+        try:
+            data = self.get_data(experiment_type, experiment_id)
+            rows, cursor = experiment_data_page(data, order=request.GET.get('order', 'gene'),
+                cursor=request.GET.get('cursor'), limit=int(request.GET.get('limit', 1000)))
+        except ValueError, error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        next_url = None
+        if cursor:
+            parameters = request.GET.copy()
+            parameters['cursor'] = cursor
+            next_url = request.build_absolute_uri('%s?%s' % (request.path, parameters.urlencode()))
+        if request.GET.get('format') == 'tsv':
+            lines = ['\t'.join(DATA_FIELDS)] + ['\t'.join(_format_value(row[field], field in BOOLEAN_FIELDS) for field in DATA_FIELDS) for row in rows]
+            response = HttpResponse('\n'.join(lines) + '\n', content_type='text/tab-separated-values')
+            if next_url:
+                response['Link'] = '<%s>; rel="next"' % next_url
+            return response
+        return HttpResponse(encode_json({'results': rows, 'next': next_url}), content_type='application/json')
+
+    def get_cache_versions(self):
+        '''The responses show the data of the experiment in the url.'''
+        try:
+            experiment_type = ContentType.objects.get_by_natural_key('experiments', self.kwargs['experiment_type'])
+        except ContentType.DoesNotExist:
+            return []
+        return [experiment_version_key(experiment_type.pk, self.kwargs['experiment_id'])]
+
+    def get_data(self, experiment_type, experiment_id):
+        '''Returns the data of the experiment, filtered by the request parameters.'''
+        return filter_experiment_data(get_experiment(experiment_type, experiment_id),
+            genes=[gene for gene in self.request.GET.get('gene', '').split(',') if gene],
+            q_value=self.get_number('q_value'),
+            fold_change_min=self.get_number('fold_change_min'),
+            fold_change_max=self.get_number('fold_change_max'))
+
+    def get_number(self, parameter, default=None):
+        '''Returns a numeric parameter as a float, or the default if it is not given.'''
+        return number_parameter(self.request, parameter, default)
+
+class ExperimentDataExport(ExperimentDataView):
+    '''This view downloads all the :class:`~data.models.GeneExperimentData` of an experiment as a TSV or CSV file, ordered by gene.
+
+    The experiment and the gene, q_value, fold_change_min and fold_change_max filters are as for :class:`~data.views.ExperimentDataView`.
+    The **format** parameter is tsv (the default) or csv, and with **gzip** the file is compressed.
+    The rows are streamed into the response as they are read by :func:`~data.queries.export_experiment_data`, so the memory used does not depend on the size of the experiment.
+    The response is not cached.
+    This view is restricted to logged in users.
+    '''
+
+    cache_response = False
+
+    def get(self, request, experiment_type, experiment_id):
+        file_format = request.GET.get('format', 'tsv')
+        compress = bool(request.GET.get('gzip'))
+        try:
+            chunks = export_experiment_data(self.get_data(experiment_type, experiment_id), file_format, compress)
+        except ValueError, error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        filename = '%s_%s.%s' % (experiment_type, experiment_id, file_format)
+        content_type = file_format == 'csv' and 'text/csv' or 'text/tab-separated-values'
+        if compress:
+            filename += '.gz'
+            content_type = 'application/x-gzip'
+        response = HttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename=%s' % filename
+        return response
+
+class TopGenesView(ExperimentDataView):
+    '''This view returns the first genes of a ranked list of the significant genes in an experiment as JSON, see :mod:`data.rankings`.
+
+    The experiment is given in the url as for :class:`~data.views.ExperimentDataView`.
+    The optional parameters are:
+
+    * **ranking**, one of q_value (the default), up or down.
+    * **count**, the number of genes returned, by default 50 and at most 1000.
+    * **q_value**, only genes with a q-value below this are returned, which can not be above the ranking threshold of 0.05.
+
+    The response contains the results as a list of the rank, gene, fold change and q-value of each gene.
+    Responses are cached as for :class:`~data.views.ExperimentDataView`.
+    This view is restricted to logged in users.
+    '''
+
+    def get(self, request, experiment_type, experiment_id):
+        try:
+            count = int(request.GET.get('count', 50))
+            if not 0 < count <= 1000:
+                raise ValueError("The count must be between 1 and 1000")
+            ranked = top_genes(get_experiment(experiment_type, experiment_id), request.GET.get('ranking', 'q_value'), count,
+                self.get_number('q_value', RANKING_THRESHOLD))
+        except ValueError, error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        results = [{'rank': gene.rank, 'gene': gene.gene_id, 'fold_change': gene.fold_change, 'q_value': gene.q_value} for gene in ranked]
+        return HttpResponse(encode_json({'results': results}), content_type='application/json')
+
+class PlotView(ExperimentDataView):
+    '''This view returns the data of a volcano or MA plot of an experiment as JSON, with the bulk of the genes counted in bins, see :mod:`data.plots`.
+
+    The experiment is given in the url as for :class:`~data.views.ExperimentDataView`.
+    The optional parameters are:
+
+    * **plot**, either volcano (the default) or ma.
+    * **q_value**, genes with a q-value below this are sent as points, by default 0.05, up to the 2000 with the smallest q-values.
+    * **gene**, a comma separated list of at most 100 gene names which are also sent as points, to be labelled.
+    * **bins**, the number of bins along each axis, by default 64 and at most 200.
+
+    Responses are cached as for :class:`~data.views.ExperimentDataView`.
+    This view is restricted to logged in users.
+    '''
+
+    def get(self, request, experiment_type, experiment_id):
+        try:
+            data = plot_data(get_experiment(experiment_type, experiment_id), request.GET.get('plot', 'volcano'),
+                self.get_number('q_value', SIGNIFICANT_Q_VALUE), [gene for gene in request.GET.get('gene', '').split(',') if gene],
+                int(request.GET.get('bins', BINS)))
+        except ValueError, error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        return HttpResponse(encode_json(data, separators=(',', ':')), content_type='application/json')
+
+class ExperimentSummaryView(ExperimentDataView):
+    '''This view returns the summary of an experiment as JSON, the counts of its genes and histograms of their fold changes and p-values, see :mod:`data.summaries`.
+
+    The experiment is given in the url as for :class:`~data.views.ExperimentDataView`.
+    This view is restricted to logged in users.
+    '''
+
+    def get(self, request, experiment_type, experiment_id):
+        try:
+            experiment = get_experiment(experiment_type, experiment_id)
+        except ValueError, error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        return HttpResponse(encode_json(summary_dict(experiment_summary(experiment))), content_type='application/json')
+
+class ExperimentSummaryList(LoginRequiredMixin, View):
+    '''This view returns the summaries of every experiment with data as JSON, read from the summary table, see :mod:`data.summaries`.
+
+    This view is restricted to logged in users.
+    '''
+
+    def get(self, request):
+        results = [summary_dict(summary) for summary in experiment_summaries()]
+        return HttpResponse(encode_json({'results': results}), content_type='application/json')
+
+class OverlapView(LoginRequiredMixin, CachedResponseMixin, View):
+    '''This view compares the significant genes of several experiments as JSON, see :mod:`data.overlaps`.
+
+    The parameters are:
+
+    * **experiments**, a comma separated list of experiments, each as the model name of its type and its primary key, such as mrnaseqexperiment:1,microarrayexperiment:2.
+    * **q_value**, genes with a q-value below this are significant, by default 0.05.
+    * **fold_change**, the smallest absolute log(2) fold change of a significant gene, by default 0.
+    * **direction**, either any (the default), up or down.
+
+    The response contains the experiments and the comparison returned by :func:`~data.overlaps.compare_experiments`, where sets are referred to by their position in the experiments.
+    Responses are cached until the data of one of the experiments change.
+    This view is restricted to logged in users.
+    '''
+
+    def get(self, request):
+        try:
+            experiments = [get_experiment(experiment_type, experiment_id) for experiment_type, experiment_id in self.get_experiment_keys()]
+            q_value = self.get_number('q_value', SIGNIFICANT_Q_VALUE)
+            comparison = compare_experiments(experiments, q_value, self.get_number('fold_change', 0), request.GET.get('direction', 'any'))
+        except ValueError, error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        comparison['experiments'] = [{'type': experiment_type, 'id': int(experiment_id), 'name': unicode(experiment)}
+            for (experiment_type, experiment_id), experiment in zip(self.get_experiment_keys(), experiments)]
+        return HttpResponse(encode_json(comparison), content_type='application/json')
+
+    def get_experiment_keys(self):
+        '''Returns the experiments parameter as a list of (type, primary key) pairs.  Raises a ValueError if it can not be parsed.'''
+        keys = []
+        for experiment in self.request.GET.get('experiments', '').split(','):
+            if experiment:
+                experiment_type, separator, experiment_id = experiment.partition(':')
+                if not experiment_id.isdigit():
+                    raise ValueError("%s is not an experiment such as mrnaseqexperiment:1" % experiment)
+                keys.append((experiment_type, experiment_id))
+        return keys
+
+    def get_cache_versions(self):
+        '''The responses show the data of each of the experiments.'''
+        versions = []
+        try:
+            for experiment_type, experiment_id in self.get_experiment_keys():
+                versions.append(experiment_version_key(ContentType.objects.get_by_natural_key('experiments', experiment_type).pk, experiment_id))
+        except (ValueError, ContentType.DoesNotExist):
+            return []
+        return versions
+
+    def get_number(self, parameter, default=None):
+        '''Returns a numeric parameter as a float, or the default if it is not given.'''
+        return number_parameter(self.request, parameter, default)
+
+class CorrelationView(LoginRequiredMixin, View):
+    '''This view returns the genes whose fold changes are most correlated with those of a gene across every experiment as JSON, see :mod:`data.correlations`.
+
+    The gene is given by its name in the url.  The optional parameters are:
+
+    * **method**, either pearson (the default) or spearman.
+    * **direction**, either positive (the default) for the most correlated genes or negative for the most anti-correlated.
+    * **count**, the number of genes returned, by default 50 and at most 1000.
+
+    The response contains the results as a list of the gene, its correlation and the number of experiments it was computed over.
+    This view is restricted to logged in users.
+    '''
+
+    def get(self, request, gene):
+        try:
+            results = correlated_genes(gene, request.GET.get('method', 'pearson'), request.GET.get('direction', 'positive'), int(request.GET.get('count', 50)))
+        except ValueError, error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        return HttpResponse(encode_json({'gene': gene, 'results': results}), content_type='application/json')
@@ -8,4 +8,4 @@ from django import forms
 class SearchForm(forms.Form):
     '''This form is for keyword searches.'''
     
-    gene = forms.CharField(max_length=100, help_text="First letter must be capitalized.")
\ No newline at end of file
+    gene = forms.CharField(max_length=100, help_text="A gene symbol or ENSEMBL ID, in any case.  Similar genes are listed if there is no match.")
\ No newline at end of file
@@ -45,3 +45,19 @@ STATIC_URL = '/static/'
 
 # Make this unique, and don't share it with anybody.
 SECRET_KEY = 't76+zh&amp;*@(p*l3y50$f^el8q79o7gytx)64@uwt280hf=+)x1('
+
+# Absolute filesystem path to the directory holding the memory-mapped expression columns,
+# by default the expression_cache directory in the MEDIA_ROOT.  See data.columns.
+# EXPRESSION_CACHE_ROOT = ''
+
+# The cache of gene pages and experiment data responses, see data.cache.
+# Without this setting each process has its own local memory cache.  The file based cache
+# is shared between processes, so an import in one process is seen by the others.
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#         'LOCATION': '/var/tmp/expression_data_cache',
+#     }
+# }
+# How long responses are cached, in seconds, by default one day.
+# RESPONSE_CACHE_TIMEOUT = 86400
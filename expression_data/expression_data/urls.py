@@ -5,9 +5,9 @@ All URL requests are first routed through here, then if necessary delegated to o
 from django.conf.urls import patterns, include, url
 
 from researchers.views import ResearcherDetail
-from genes.views import GeneDetail
+from genes.views import GeneDetail, GeneAutocomplete, GeneRegion
 from expression_data.views import SearchView
-from data.views import CufflinksImportFormView
+from data.views import CufflinksImportFormView, MicroArrayImportFormView, ImportJobStatus, ExperimentDataView, ExperimentDataExport, TopGenesView, OverlapView, CorrelationView, PlotView, ExperimentSummaryView, ExperimentSummaryList
 
 # Uncomment the next two lines to enable the admin:
 from django.contrib import admin
@@ -17,11 +17,23 @@ urlpatterns = patterns('',
     # Examples:
     # url(r'^$', 'expression_data.views.home', name='home'),
     url(r'^search/?$', SearchView.as_view(), name='search'),
+    url(r'^search/autocomplete/?$', GeneAutocomplete.as_view(), name='gene-autocomplete'),
     url(r'^researcher/(?P<pk>[\d]+)/?$', ResearcherDetail.as_view(), name='researcher-details'),
-    url(r'^genes?/(?P<slug>[\d\w-]+)/?$', GeneDetail.as_view(), name='gene-details'),    
+    url(r'^region/?$', GeneRegion.as_view(), name='gene-region'),
+    url(r'^genes?/(?P<slug>[\w.-]+)/?$', GeneDetail.as_view(), name='gene-details'),    
     # url(r'^expression_data/', include('expression_data.foo.urls')),
     
     url(r'^data/cufflinks_import', CufflinksImportFormView.as_view(), name="cufflinks-import"),
+    url(r'^data/microarray_import', MicroArrayImportFormView.as_view(), name="microarray-import"),
+    url(r'^data/import_jobs/(?P<pk>[\d]+)/?$', ImportJobStatus.as_view(), name="import-job-status"),
+    url(r'^data/summaries/?$', ExperimentSummaryList.as_view(), name="experiment-summaries"),
+    url(r'^data/overlap/?$', OverlapView.as_view(), name="experiment-overlap"),
+    url(r'^data/correlations/(?P<gene>[\w.-]+)/?$', CorrelationView.as_view(), name="gene-correlations"),
+    url(r'^data/(?P<experiment_type>[\w]+)/(?P<experiment_id>[\d]+)/?$', ExperimentDataView.as_view(), name="experiment-data"),
+    url(r'^data/(?P<experiment_type>[\w]+)/(?P<experiment_id>[\d]+)/export/?$', ExperimentDataExport.as_view(), name="experiment-data-export"),
+    url(r'^data/(?P<experiment_type>[\w]+)/(?P<experiment_id>[\d]+)/top/?$', TopGenesView.as_view(), name="experiment-top-genes"),
+    url(r'^data/(?P<experiment_type>[\w]+)/(?P<experiment_id>[\d]+)/plot/?$', PlotView.as_view(), name="experiment-plot"),
+    url(r'^data/(?P<experiment_type>[\w]+)/(?P<experiment_id>[\d]+)/summary/?$', ExperimentSummaryView.as_view(), name="experiment-summary"),
 
     # Uncomment the admin/doc line below to enable admin documentation:
     url(r'^admin/doc/', include('django.contrib.admindocs.urls')),
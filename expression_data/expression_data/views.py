@@ -4,26 +4,26 @@ Currently there is just the :class:`expression_data.views.SearchView` which is u
 '''
 
 from django.views.generic.edit import FormView
-from django.core.urlresolvers import reverse_lazy
-from django.http import Http404
+from django.http import HttpResponseRedirect
+from django.core.urlresolvers import reverse
 
 from expression_data.forms import SearchForm
-from genes.models import Gene
+from genes.search import search_genes
 
 class SearchView(FormView):
     '''This view takes a gene query and directs the user to the detail page for that gene.
     
-    Currently only correct, unique, capitalized gene names are redirected.
+    A gene name or ENSEMBL id matching the query, in any case, is redirected to its **gene-details** page.
+    Otherwise the search form is shown again with the best matching genes from :func:`~genes.search.search_genes`.
     '''
 
     template_name = 'search.html'
     form_class = SearchForm
     
-    def get_success_url(self, *args, **kwargs):
-        '''This function redirects the user to the **gene-detail** page in the case of a match'''
-        query = self.request.POST['gene']
-        try:
-            Gene.objects.get(name=query)
-            return reverse_lazy('gene-details', kwargs={'slug': query})
-        except Gene.DoesNotExist:
-            raise Http404
\ No newline at end of file
+    def form_valid(self, form):
+        '''This function redirects the user to the **gene-details** page in the case of a match, or lists similar genes.'''
+        query = form.cleaned_data['gene'].strip()
+        results = search_genes(query)
+        if results and query.lower() in (results[0][0].lower(), (results[0][1] or '').lower()):
+            return HttpResponseRedirect(reverse('gene-details', kwargs={'slug': results[0][0]}))
+        return self.render_to_response(self.get_context_data(form=form, query=query, results=results))
@@ -0,0 +1,23 @@
+'''This command loads gene annotation from a biomart file, see :func:`genes.utilities.update_genes`.
+
+Only new and changed genes are written, so it can be rerun for each ENSEMBL release::
+
+    python manage.py update_genes genes/datasets/gene_names.txt
+'''
+
+from django.core.management.base import LabelCommand, CommandError
+
+from genes.utilities import update_genes
+
+class Command(LabelCommand):
+    '''Creates or updates genes from one or more annotation files.'''
+
+    args = "<filename filename ...>"
+    label = "filename"
+    help = "Creates or updates genes from ENSEMBL biomart gene annotation files."
+
+    def handle_label(self, filename, **options):
+        try:
+            return "%s: %s" % (filename, update_genes(filename))
+        except (IOError, ValueError) as error:
+            raise CommandError(error)
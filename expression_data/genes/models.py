@@ -1,9 +1,11 @@
 '''This package assigns the database schema for the :app:`~genes` app.
 
-There is one object, :class:`~genes.models.Gene` which is populated from ENSEMBL data.
+There is one object, :class:`~genes.models.Gene` which is populated from ENSEMBL data with the **update_genes** management command.
 '''
 
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 class Gene(models.Model):
     '''This object is for a gene and some associated data regarding this gene.
@@ -34,27 +36,16 @@ class Gene(models.Model):
     @models.permalink
     def get_absolute_url(self):
         '''the permalink for a gene detail page is /gene/<name>'''
-        return ('gene-details', [str(self.name)]) 
-        
-def gene_update():
-    '''This function updates all gene objects from a file'''
-    import csv
-    filename = "/Users/davebrid/Documents/SRC/expression-data-server/expression_data/genes/datasets/gene_names.txt"
-    print "Updating from file %s" % filename
-    with open(filename, 'r') as inputfile:
-        for row in csv.DictReader(inputfile, delimiter='\t'):
-            try:
-                gene = Gene(name = row['Associated Gene Name'],
-                ensemblID = row['Ensembl Gene ID'],
-                chromosome = row['Chromosome Name'],
-                start = row['Gene Start (bp)'],
-                end = row['Gene End (bp)'],
-                strand = row['Strand'],
-                band = row['Band'],
-                transcript_count = row['Transcript count'],
-                type = row['Gene Biotype'],
-                status = row['Status (gene)'])
-                gene.save()
-                print "Updated %s" % row['Associated Gene Name']
-            except IndexError:
-                print "Skipped %s" % row['Associated Gene Name']                                     
\ No newline at end of file
+        return ('gene-details', [str(self.name)])
+
+@receiver(post_save, sender=Gene)
+@receiver(post_delete, sender=Gene)
+def invalidate_search(sender, instance, **kwargs):
+    '''This signal receiver marks the gene search indexes as out of date when a :class:`~genes.models.Gene` is saved or deleted, see :mod:`genes.search`.
+
+    The version of the gene is also changed, so its cached page is no longer used, see :mod:`data.cache`.
+    '''
+    from data.cache import invalidate_genes
+    from genes.search import invalidate_gene_search
+    invalidate_gene_search()
+    invalidate_genes([instance.pk])
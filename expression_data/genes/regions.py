@@ -0,0 +1,129 @@
+'''This package contains an in-memory index of the chromosomal positions of :class:`~genes.models.Gene` objects, for region and nearest gene queries.
+
+For each chromosome the genes are stored in NumPy arrays sorted by start, split into buckets of :data:`BUCKET_SIZE` genes with the largest end of each bucket.
+Genes overlapping a region are found with a binary search over the starts for the last bucket to check,
+then only the genes in the buckets whose largest end reaches the region are checked, rather than every gene on the chromosome.
+A long gene only widens the search by its own bucket, so the cost of a query is bounded by the number of buckets plus the buckets holding overlapping genes.
+
+Like the :mod:`genes.search` index, each worker process builds the index on first use and rebuilds it when the :func:`~genes.search.genes_version` changes.
+'''
+
+import re
+
+import numpy
+
+from genes.models import Gene
+from genes.search import genes_version
+
+#the number of genes, in order of their start, which share a largest end in the index of a chromosome
+BUCKET_SIZE = 64
+
+REGION = re.compile(r'^(?:chr)?(?P<chromosome>[\w.]+):(?P<start>[\d,]+)(?:-(?P<end>[\d,]+))?$', re.IGNORECASE)
+
+def parse_region(region):
+    '''This function parses a region such as chr7:10,000,000-12,000,000 or a position such as 7:10000000.
+
+    The chr prefix and commas are optional.
+    Returns a tuple of chromosome, start and end, where the end is the start for a position.
+    Raises a ValueError if the region can not be parsed.
+    '''
+
+    match = REGION.match(region.strip())
+    if not match:
+        raise ValueError("%s is not a region such as chr7:10,000,000-12,000,000" % region)
+    start = int(match.group('start').replace(',', ''))
+    end = match.group('end') and int(match.group('end').replace(',', '')) or start
+    if end < start:
+        raise ValueError("The region %s ends before it starts" % region)
+    return match.group('chromosome'), start, end
+
+class ChromosomeIndex(object):
+    '''This class is the index of the genes on one chromosome.
+
+    The names, starts, ends and strands are arrays sorted by start.
+    The bucket_max_ends array holds the largest end of each bucket of :data:`~genes.regions.BUCKET_SIZE` genes, for overlap queries,
+    and end_order the positions of the genes sorted by their end, for nearest gene queries.
+    '''
+
+    def __init__(self, genes):
+        '''The genes are a list of (name, start, end, strand) tuples.'''
+        genes = sorted(genes, key=lambda gene: (gene[1], gene[2]))
+        self.names = [gene[0] for gene in genes]
+        self.starts = numpy.array([gene[1] for gene in genes], dtype=numpy.int64)
+        self.ends = numpy.array([gene[2] for gene in genes], dtype=numpy.int64)
+        self.strands = [gene[3] for gene in genes]
+        self.bucket_max_ends = numpy.maximum.reduceat(self.ends, numpy.arange(0, len(genes), BUCKET_SIZE)) if genes else self.ends
+        self.end_order = numpy.argsort(self.ends, kind='mergesort')
+        self.sorted_ends = self.ends[self.end_order]
+
+    def __len__(self):
+        return len(self.names)
+
+    def overlapping(self, start, end):
+        '''Returns the positions of the genes overlapping the region from start to end, in order of their start.'''
+        last = numpy.searchsorted(self.starts, end, side='right')
+        buckets = numpy.flatnonzero(self.bucket_max_ends[:(last + BUCKET_SIZE - 1) // BUCKET_SIZE] >= start)
+        positions = (buckets[:, numpy.newaxis] * BUCKET_SIZE + numpy.arange(BUCKET_SIZE)).ravel()
+        positions = positions[positions < last]
+        return positions[self.ends[positions] >= start]
+
+    def nearest(self, position, count=1):
+        '''Returns up to count (position in the index, distance) tuples of the genes nearest to a position on the chromosome, closest first.
+
+        Genes overlapping the position have a distance of 0.
+        The other candidates are the count genes ending before and the count genes starting after the position.
+        '''
+        candidates = [(0, int(gene)) for gene in self.overlapping(position, position)]
+        following = numpy.searchsorted(self.starts, position, side='right')
+        candidates += [(int(self.starts[gene] - position), gene) for gene in range(following, min(len(self), following + count))]
+        preceding = numpy.searchsorted(self.sorted_ends, position, side='left')
+        candidates += [(int(position - self.ends[gene]), int(gene)) for gene in self.end_order[max(0, preceding - count):preceding]]
+        return [(gene, distance) for distance, gene in sorted(candidates)[:count]]
+
+    def gene(self, position, distance=None):
+        '''Returns the gene at a position in the index as a dictionary.'''
+        gene = {'name': self.names[position], 'start': int(self.starts[position]), 'end': int(self.ends[position]), 'strand': self.strands[position]}
+        if distance is not None:
+            gene['distance'] = distance
+        return gene
+
+class RegionIndex(object):
+    '''This class is the index of gene positions, with a :class:`~genes.regions.ChromosomeIndex` for each chromosome.'''
+
+    def __init__(self, genes):
+        '''The genes are an iterable of (name, chromosome, start, end, strand) tuples, genes without a chromosome, start or end are left out.'''
+        chromosomes = {}
+        for name, chromosome, start, end, strand in genes:
+            if chromosome and start is not None and end is not None:
+                chromosomes.setdefault(chromosome.lower(), []).append((name, start, end, strand))
+        self.chromosomes = dict((chromosome, ChromosomeIndex(genes)) for chromosome, genes in chromosomes.items())
+
+    def chromosome(self, chromosome):
+        '''Returns the index of a chromosome, ignoring case.  Raises a KeyError for an unknown chromosome.'''
+        try:
+            return self.chromosomes[chromosome.lower()]
+        except KeyError:
+            raise KeyError("There are no genes on chromosome %s" % chromosome)
+
+    def region(self, chromosome, start, end):
+        '''Returns the genes overlapping a region as dictionaries of their name, start, end and strand, in order of their start.'''
+        index = self.chromosome(chromosome)
+        return [index.gene(position) for position in index.overlapping(start, end)]
+
+    def nearest(self, chromosome, position, count=1):
+        '''Returns up to count genes nearest to a position, closest first, as dictionaries which also contain their distance to the position.'''
+        index = self.chromosome(chromosome)
+        return [index.gene(gene, distance) for gene, distance in index.nearest(position, count)]
+
+_index = None
+_index_version = None
+
+def region_index():
+    '''This function returns the region index of this process, building it if it does not exist or genes have changed since it was built.'''
+
+    global _index, _index_version
+    version = genes_version()
+    if _index is None or _index_version != version:
+        _index = RegionIndex(Gene.objects.values_list('name', 'chromosome', 'start', 'end', 'strand').iterator())
+        _index_version = version
+    return _index
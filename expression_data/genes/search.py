@@ -0,0 +1,135 @@
+'''This package contains an in-memory search index over the names and ENSEMBL ids of :class:`~genes.models.Gene` objects.
+
+The index supports case-insensitive prefix matches on names and ENSEMBL ids and fuzzy matches on names within an edit distance of **MAX_DISTANCE**.
+Fuzzy matches are found through a dictionary of the names with one character deleted, so a search does not compare the query to every gene.
+
+Each worker process builds the index once, on the first search, with :func:`~genes.search.gene_search_index`.
+Changes to genes store a new version in the database, see :mod:`data.cache`, and each process rebuilds its index on its next search after the version changes.
+'''
+
+from bisect import bisect_left
+from itertools import islice
+
+from data.cache import change_versions, get_versions
+from genes.models import Gene
+
+MAX_DISTANCE = 1
+PREFIX_LIMIT = 500
+VERSION_KEY = 'version:genes'
+
+def edit_distance(first, second):
+    '''This function returns the number of insertions, deletions, substitutions and transpositions of adjacent characters needed to change one string into the other.'''
+
+    previous, current = None, range(len(second) + 1)
+    for i in range(1, len(first) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[len(second)]
+
+def _deletions(word):
+    '''This function returns the set of strings made by deleting one character from the word, and the word itself.'''
+
+    return set([word] + [word[:i] + word[i + 1:] for i in range(len(word))])
+
+class GeneSearchIndex(object):
+    '''This class is a search index over gene names and ENSEMBL ids.
+
+    The names and ids are stored lower case in a sorted list for prefix matches.
+    The lower case names with up to one character deleted are stored in a dictionary for fuzzy matches.
+    '''
+
+    def __init__(self, genes):
+        '''The genes are an iterable of (name, ensemblID) pairs.'''
+        self.ensembl_ids = {}
+        self.keys = []
+        self.deletions = {}
+        for name, ensembl_id in genes:
+            self.keys.append((name.lower(), name))
+            if ensembl_id:
+                self.ensembl_ids[name] = ensembl_id
+                self.keys.append((ensembl_id.lower(), name))
+            for deletion in _deletions(name.lower()):
+                self.deletions.setdefault(deletion, []).append(name)
+        self.keys.sort()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def prefix_matches(self, query, limit=PREFIX_LIMIT):
+        '''Returns the names of up to limit genes with a name or ENSEMBL id starting with the query, ignoring case, in alphabetical order.'''
+        query = query.lower()
+        matches = []
+        start = bisect_left(self.keys, (query, u''))
+        for key, name in islice(self.keys, start, start + limit):
+            if not key.startswith(query):
+                break
+            matches.append(name)
+        return matches
+
+    def fuzzy_matches(self, query, max_distance=MAX_DISTANCE):
+        '''Returns a dictionary of the names of genes within max_distance edits of the query, ignoring case, to their edit distance.'''
+        query = query.lower()
+        candidates = set()
+        for deletion in _deletions(query):
+            candidates.update(self.deletions.get(deletion, ()))
+        distances = {}
+        for name in candidates:
+            distance = edit_distance(query, name.lower())
+            if distance <= max_distance:
+                distances[name] = distance
+        return distances
+
+    def search(self, query, limit=10):
+        '''Returns up to limit gene names matching the query, as a list of (name, ENSEMBL id) pairs, best match first.
+
+        The ranking is an exact match of the name, then an exact match of the name or ENSEMBL id ignoring case, then prefix matches with the shortest names first,
+        then fuzzy matches with the fewest edits first.
+        '''
+        query = query.strip()
+        if not query:
+            return []
+        lower = query.lower()
+        ranks = {}
+        for name in self.prefix_matches(query):
+            exact = name == query and 0 or (name.lower() == lower or self.ensembl_ids.get(name, '').lower() == lower) and 1 or 2
+            ranks[name] = min(ranks.get(name, exact), exact)
+        for name, distance in self.fuzzy_matches(query).items():
+            ranks.setdefault(name, 2 + distance)
+        results = sorted(ranks, key=lambda name: (ranks[name], len(name), name))[:limit]
+        return [(name, self.ensembl_ids.get(name)) for name in results]
+
+def genes_version():
+    '''This function returns the version of the genes, a token which changes whenever genes are added, changed or deleted.
+
+    Indexes of the genes kept in memory, such as this search index and the :mod:`genes.regions` index, are rebuilt when it changes.
+    '''
+
+    return get_versions([VERSION_KEY])[0]
+
+_index = None
+_index_version = None
+
+def gene_search_index():
+    '''This function returns the search index of this process, building it if it does not exist or genes have changed since it was built.'''
+
+    global _index, _index_version
+    version = genes_version()
+    if _index is None or _index_version != version:
+        _index = GeneSearchIndex(Gene.objects.values_list('name', 'ensemblID').iterator())
+        _index_version = version
+    return _index
+
+def search_genes(query, limit=10):
+    '''This function returns up to limit (name, ENSEMBL id) pairs of the genes best matching the query, see :meth:`~genes.search.GeneSearchIndex.search`.'''
+
+    return gene_search_index().search(query, limit)
+
+def invalidate_gene_search():
+    '''This function changes the :func:`~genes.search.genes_version`, so the gene indexes of all processes are rebuilt on their next use.'''
+
+    change_versions([VERSION_KEY])
+
@@ -5,15 +5,27 @@ There are tests for the model :class:`~genes.models.Gene`:
 
 * :class:`~researchers.tests.GeneModelTests`
 * :class:`~researchers.tests.GeneViewTests`
+
+and for the annotation loader in :mod:`genes.utilities` as :class:`~genes.tests.GeneUtilityTests`
+the gene search in :mod:`genes.search` as :class:`~genes.tests.GeneSearchTests`
+and the region queries in :mod:`genes.regions` as :class:`~genes.tests.GeneRegionTests`.
 """
 
+import json
+
+from django.core.cache import cache
 from django.test import TestCase
 from django.test.client import Client
 from django.contrib.auth.models import User
 
 from genes.models import Gene
+from genes.utilities import update_genes
+from genes.search import GeneSearchIndex, search_genes, edit_distance
+from genes.regions import RegionIndex, region_index, parse_region
+from data.models import GeneExperimentData, Comparison
+from experiments.models import mRNASeqExperiment, MicroArrayExperiment
 
-MODELS = [Gene,]
+MODELS = [GeneExperimentData, Gene,]
 
 class GeneModelTests(TestCase):
     '''This class tests various aspects of the :class:`~genes.models.Gene` model.'''
@@ -91,8 +103,9 @@ class GeneViewTests(TestCase):
     fixtures = ['gene_test_fixture',]
 
     def setUp(self):
-        """Instantiate the test client.  Creates a test user."""
+        """Instantiate the test client.  Creates a test user and empties the cache of responses."""
         
+        cache.clear()
         self.client = Client()
         self.test_user = User.objects.create_user('testuser', 'blah@blah.com', 'testpassword')
         self.test_user.is_superuser = True
@@ -122,3 +135,236 @@ class GeneViewTests(TestCase):
         #tests a nonfunctional url
         test_response = self.client.get('/gene/Pikfour')
         self.assertEqual(test_response.status_code, 404)
+
+    def add_expression_data(self, experiment):
+        '''Adds a :class:`~data.models.GeneExperimentData` for Pikfyve to an experiment.'''
+        comparison = Comparison.objects.create(experiment=experiment, sample_1='Control', sample_2='Knockdown')
+        return GeneExperimentData.objects.create(experiment=experiment, gene_id='Pikfyve', comparison=comparison,
+            amount_1=1, amount_2=2, status='OK', fold_change=1, p_value=0.01, q_value=0.02, significant=True)
+
+    def test_gene_detail_expression_data(self):
+        """This tests that the gene-detail view lists the expression data from every experiment in a constant number of queries."""
+
+        test_response = self.client.get('/gene/Pikfyve')
+        self.assertContains(test_response, 'There is no expression data for Pikfyve.')
+        self.add_expression_data(mRNASeqExperiment.objects.create(name="First Experiment"))
+        self.add_expression_data(MicroArrayExperiment.objects.create(name="First Array", platform="GPL1261"))
+        with self.assertNumQueries(8):
+            test_response = self.client.get('/gene/Pikfyve')
+        self.assertContains(test_response, 'First Experiment')
+        self.assertContains(test_response, 'First Array')
+        self.assertContains(test_response, 'Control / Knockdown')
+        for i in range(10):
+            self.add_expression_data(mRNASeqExperiment.objects.create(name="Experiment %i" % i))
+            self.add_expression_data(MicroArrayExperiment.objects.create(name="Array %i" % i, platform="GPL1261"))
+        with self.assertNumQueries(8):
+            test_response = self.client.get('/gene/Pikfyve')
+        self.assertEqual(len(test_response.context['expression_data']), 22)
+        self.assertContains(test_response, 'Array 9')
+
+    def test_gene_detail_cached(self):
+        """This tests that the gene-detail page is cached until the gene, its expression data or their experiments change."""
+
+        experiment = mRNASeqExperiment.objects.create(name="First Experiment")
+        datum = self.add_expression_data(experiment)
+        self.client.get('/gene/Pikfyve')
+        with self.assertNumQueries(4): #the session, the user, the experiments with data for the gene and their versions
+            test_response = self.client.get('/gene/Pikfyve')
+        self.assertEqual(test_response.context, None)
+        self.assertContains(test_response, 'First Experiment')
+        experiment.name = "Renamed Experiment"
+        experiment.save()
+        self.assertContains(self.client.get('/gene/Pikfyve'), 'Renamed Experiment')
+        datum.fold_change = 7.5
+        datum.save()
+        self.assertContains(self.client.get('/gene/Pikfyve'), '7.5')
+        self.add_expression_data(MicroArrayExperiment.objects.create(name="First Array", platform="GPL1261"))
+        self.assertContains(self.client.get('/gene/Pikfyve'), 'First Array')
+        gene = Gene.objects.get(pk='Pikfyve')
+        gene.ensemblID = 'ENSMUSG00000099999'
+        gene.save()
+        self.assertContains(self.client.get('/gene/Pikfyve'), 'ENSMUSG00000099999')
+
+class GeneUtilityTests(TestCase):
+    '''This class tests the functions in the :mod:`genes.utilities` package.'''
+
+    fixtures = ['gene_test_fixture',]
+
+    def setUp(self):
+        '''Reads the first lines of the gene annotation file.'''
+        with open("genes/datasets/gene_names.txt") as inputfile:
+            self.lines = [inputfile.readline() for i in range(6)]
+        self.lines.append("Pikfyve\tENSMUSG00000025949\t1\t65186750\t65274012\t1\tC2\t1\tprotein_coding\tKNOWN\n")
+
+    def test_update_genes(self):
+        '''This tests that :func:`genes.utilities.update_genes` only writes new and changed genes.'''
+        self.assertEqual(update_genes(self.lines), "Created 5 genes and updated 0 genes, 1 genes were unchanged.")
+        self.assertEqual(Gene.objects.get(pk='mt-Nd4').start, 10167)
+        self.assertEqual(Gene.objects.get(pk='mt-Nd4').band, None)
+        self.assertEqual(update_genes(self.lines), "Created 0 genes and updated 0 genes, 6 genes were unchanged.")
+        self.lines[1] = self.lines[1].replace('11544', '11545')
+        self.assertEqual(update_genes(self.lines), "Created 0 genes and updated 1 genes, 5 genes were unchanged.")
+        self.assertEqual(Gene.objects.get(pk='mt-Nd4').end, 11545)
+        self.assertEqual(update_genes(self.lines[:2]), "Created 0 genes and updated 0 genes, 1 genes were unchanged.")
+
+    def test_update_genes_invalid(self):
+        '''This tests that a row with an invalid value or too few columns raises a ValueError with its line number.'''
+        self.assertRaisesRegexp(ValueError, 'Line 3', update_genes, self.lines[:2] + [self.lines[2].replace('\t1\t', '\tone\t', 1)])
+        self.assertRaisesRegexp(ValueError, 'Line 3', update_genes, self.lines[:2] + ['Actb\tENSMUSG00000029580\n'])
+
+class GeneSearchTests(TestCase):
+    '''This class tests the gene search index in :mod:`genes.search` and the views using it.'''
+
+    fixtures = ['gene_test_fixture',]
+
+    def setUp(self):
+        '''Instantiate the test client and adds some genes.'''
+        self.client = Client()
+        Gene.objects.create(name='Pik3ca', ensemblID='ENSMUSG00000027665')
+        Gene.objects.create(name='Pik3c2a', ensemblID='ENSMUSG00000030660')
+        Gene.objects.create(name='Gapdh', ensemblID='ENSMUSG00000057666')
+
+    def test_edit_distance(self):
+        '''This tests the edit distance, counting a transposition as one edit.'''
+        self.assertEqual(edit_distance('gapdh', 'gapdh'), 0)
+        self.assertEqual(edit_distance('gapdh', 'gpadh'), 1)
+        self.assertEqual(edit_distance('gapdh', 'gapd'), 1)
+        self.assertEqual(edit_distance('gapdh', 'gbpdx'), 2)
+
+    def test_search_index(self):
+        '''This tests that the :class:`~genes.search.GeneSearchIndex` finds exact, prefix, ENSEMBL id and fuzzy matches ignoring case, best first.'''
+        index = GeneSearchIndex(Gene.objects.values_list('name', 'ensemblID'))
+        self.assertEqual(index.search('Pikfyve')[0], ('Pikfyve', 'ENSMUSG00000025949'))
+        self.assertEqual([name for name, ensembl_id in index.search('pik')], ['Pik3ca', 'Pik3c2a', 'Pikfyve'])
+        self.assertEqual(index.search('ensmusg00000057666'), [('Gapdh', 'ENSMUSG00000057666')])
+        self.assertEqual(index.search('GAPHD'), [('Gapdh', 'ENSMUSG00000057666')])
+        self.assertEqual(index.search('Pik3cx'), [('Pik3ca', 'ENSMUSG00000027665')])
+        self.assertEqual(index.search('pik', limit=1), [('Pik3ca', 'ENSMUSG00000027665')])
+        self.assertEqual(index.search('Actb'), [])
+        self.assertEqual(index.search(' '), [])
+
+    def test_search_refreshed(self):
+        '''This tests that the index of this process is rebuilt when a gene is added or deleted.'''
+        self.assertEqual(search_genes('Actb'), [])
+        Gene.objects.create(name='Actb')
+        self.assertEqual(search_genes('Actb'), [('Actb', None)])
+        Gene.objects.get(pk='Actb').delete()
+        self.assertEqual(search_genes('Actb'), [])
+        with open("genes/datasets/gene_names.txt") as inputfile:
+            header = inputfile.readline()
+        update_genes([header, "Actb\tENSMUSG00000029580\t5\t142903115\t142906754\t-1\tG2\t6\tprotein_coding\tKNOWN\n"])
+        self.assertEqual(search_genes('Actb'), [('Actb', 'ENSMUSG00000029580')])
+
+    def test_search_view(self):
+        '''This tests that the search view redirects a match in any case to the gene page, and otherwise lists similar genes.'''
+        test_response = self.client.get('/search/')
+        self.assertEqual(test_response.status_code, 200)
+        self.assertTemplateUsed(test_response, 'search.html')
+        test_response = self.client.post('/search/', {'gene': 'pikfyve'})
+        self.assertRedirects(test_response, '/gene/Pikfyve', target_status_code=302)
+        test_response = self.client.post('/search/', {'gene': 'ENSMUSG00000057666'})
+        self.assertRedirects(test_response, '/gene/Gapdh', target_status_code=302)
+        test_response = self.client.post('/search/', {'gene': 'Pik3'})
+        self.assertEqual(test_response.status_code, 200)
+        self.assertEqual([name for name, ensembl_id in test_response.context['results']], ['Pik3ca', 'Pik3c2a'])
+        self.assertContains(test_response, '/gene/Pik3c2a')
+        test_response = self.client.post('/search/', {'gene': 'Actb'})
+        self.assertContains(test_response, 'No genes match Actb.')
+
+    def test_autocomplete_view(self):
+        '''This tests that the gene-autocomplete view returns the matching genes as JSON.'''
+        test_response = self.client.get('/search/autocomplete', {'q': 'pik3', 'limit': 1})
+        self.assertEqual(test_response.status_code, 200)
+        self.assertEqual(test_response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(test_response.content), [{'name': 'Pik3ca', 'ensemblID': 'ENSMUSG00000027665', 'url': '/gene/Pik3ca'}])
+        test_response = self.client.get('/search/autocomplete')
+        self.assertEqual(json.loads(test_response.content), [])
+
+class GeneRegionTests(TestCase):
+    '''This class tests the region index in :mod:`genes.regions` and the gene-region view.'''
+
+    fixtures = ['gene_test_fixture',]
+
+    def setUp(self):
+        '''Instantiate the test client.  Creates a test user and some genes on chromosome 1.'''
+        self.client = Client()
+        self.test_user = User.objects.create_user('testuser', 'blah@blah.com', 'testpassword')
+        login = self.client.login(username='testuser', password='testpassword')
+        self.failUnless(login, 'Could not log in')
+        Gene.objects.create(name='Long', chromosome='1', start=1000, end=100000, strand=1)
+        Gene.objects.create(name='Short', chromosome='1', start=2000, end=3000, strand=-1)
+        Gene.objects.create(name='Later', chromosome='1', start=50000, end=60000, strand=1)
+        Gene.objects.create(name='Other', chromosome='X', start=2000, end=3000, strand=1)
+        Gene.objects.create(name='Unplaced')
+
+    def test_parse_region(self):
+        '''This tests that regions and positions are parsed with or without the chr prefix and commas.'''
+        self.assertEqual(parse_region('chr7:10,000,000-12,000,000'), ('7', 10000000, 12000000))
+        self.assertEqual(parse_region('X:2000'), ('X', 2000, 2000))
+        self.assertRaises(ValueError, parse_region, 'chr7')
+        self.assertRaises(ValueError, parse_region, 'chr7:200-100')
+
+    def test_region(self):
+        '''This tests that the genes overlapping a region are found, in order of their start.'''
+        index = region_index()
+        self.assertEqual([gene['name'] for gene in index.region('1', 2500, 2600)], ['Long', 'Short'])
+        self.assertEqual([gene['name'] for gene in index.region('1', 3001, 49999)], ['Long'])
+        self.assertEqual([gene['name'] for gene in index.region('1', 59000, 200000)], ['Long', 'Later'])
+        self.assertEqual(index.region('1', 100001, 200000), [])
+        self.assertEqual([gene['name'] for gene in index.region('x', 1, 200000)], ['Other'])
+        self.assertRaises(KeyError, index.region, '2', 1, 2)
+
+    def test_region_buckets(self):
+        '''This tests that the genes overlapping a region are found across several buckets, with a long gene early on the chromosome.'''
+        genes = [('Long', '1', 1, 10000000, 1)] + [('Gene%d' % number, '1', number * 1000, number * 1000 + 1500, 1) for number in range(1, 500)]
+        index = RegionIndex(genes)
+        chromosome = index.chromosome('1')
+        self.assertEqual(len(chromosome.bucket_max_ends), 8)
+        for start, end in [(1, 1), (100500, 100700), (63900, 130200), (499000, 600000), (10000000, 20000000), (10000001, 20000000)]:
+            expected = [name for name, _, gene_start, gene_end, _ in genes if gene_start <= end and gene_end >= start]
+            self.assertEqual([gene['name'] for gene in index.region('1', start, end)], expected)
+
+    def test_nearest(self):
+        '''This tests that the nearest genes to a position are found with their distance.'''
+        index = RegionIndex([('A', '1', 100, 200, 1), ('B', '1', 1000, 50000, 1), ('C', '1', 400, 500, -1)])
+        self.assertEqual([(gene['name'], gene['distance']) for gene in index.nearest('1', 50, 3)], [('A', 50), ('C', 350), ('B', 950)])
+        self.assertEqual([(gene['name'], gene['distance']) for gene in index.nearest('1', 350, 2)], [('C', 50), ('A', 150)])
+        self.assertEqual([(gene['name'], gene['distance']) for gene in index.nearest('1', 60000)], [('B', 10000)])
+        self.assertEqual([(gene['name'], gene['distance']) for gene in index.nearest('1', 150, 1)], [('A', 0)])
+
+    def test_region_refreshed(self):
+        '''This tests that the index of this process is rebuilt when a gene changes.'''
+        self.assertEqual(len(region_index().region('1', 1, 200000)), 3)
+        Gene.objects.filter(pk='Unplaced').update(chromosome='1', start=10, end=20)
+        Gene.objects.get(pk='Unplaced').save()
+        self.assertEqual(len(region_index().region('1', 1, 200000)), 4)
+
+    def invalid_json_constant(self, constant):
+        '''Raises a ValueError for the constants Infinity, -Infinity and NaN, which json.loads accepts but are not valid JSON.'''
+        raise ValueError("%s is not valid JSON" % constant)
+
+    def test_gene_region_view(self):
+        '''This tests that the gene-region view returns the genes in a region or nearest a position, with their expression in an experiment as valid JSON.'''
+        experiment = mRNASeqExperiment.objects.create(name="Region Experiment")
+        GeneExperimentData.objects.create(experiment=experiment, gene_id='Short', fold_change=1.5, p_value=0.01, q_value=0.02, significant=True)
+        test_response = self.client.get('/region', {'region': 'chr1:2,500-2,600', 'experiment': experiment.pk})
+        self.assertEqual(test_response.status_code, 200)
+        result = json.loads(test_response.content)
+        self.assertEqual(result['start'], 2500)
+        self.assertEqual([gene['name'] for gene in result['genes']], ['Long', 'Short'])
+        self.assertEqual(result['genes'][0]['expression'], None)
+        self.assertEqual(result['genes'][1]['expression']['fold_change'], 1.5)
+        self.assertEqual(result['genes'][1]['expression']['q_value'], 0.02)
+        test_response = self.client.get('/region', {'position': 'chrX:5000', 'count': 2})
+        self.assertEqual(json.loads(test_response.content)['genes'], [{'name': 'Other', 'start': 2000, 'end': 3000, 'strand': 1, 'distance': 2000}])
+        test_response = self.client.get('/region', {'region': 'chr1'})
+        self.assertEqual(test_response.status_code, 400)
+        test_response = self.client.get('/region', {'region': 'chr1:1-2', 'experiment': 1, 'experiment_type': 'gene'})
+        self.assertEqual(test_response.status_code, 400)
+        GeneExperimentData.objects.filter(gene='Short').update(fold_change=float('inf'))
+        test_response = self.client.get('/region', {'region': 'chr1:2,500-2,600', 'experiment': experiment.pk})
+        result = json.loads(test_response.content, parse_constant=self.invalid_json_constant)
+        self.assertEqual(result['genes'][1]['expression']['fold_change'], 'inf')
+        self.client.logout()
+        test_response = self.client.get('/region', {'region': 'chr1:2,500-2,600'})
+        self.assertEqual(test_response.status_code, 302)
@@ -0,0 +1,102 @@
+'''This package contains utility functions for the :mod:`genes` app.
+
+The :class:`~genes.models.Gene` table is populated from an ENSEMBL biomart export such as **genes/datasets/gene_names.txt**.
+'''
+
+import csv
+import hashlib
+
+from django.db import transaction
+
+from data.cache import invalidate_genes
+from data.utilities import batches, bulk_insert
+from genes.models import Gene
+from genes.search import invalidate_gene_search
+
+#The Gene field, biomart column and conversion function for each column in a gene annotation file.
+ENSEMBL_GENE_COLUMNS = (
+    ('name', 'Associated Gene Name', None),
+    ('ensemblID', 'Ensembl Gene ID', None),
+    ('chromosome', 'Chromosome Name', None),
+    ('start', 'Gene Start (bp)', int),
+    ('end', 'Gene End (bp)', int),
+    ('strand', 'Strand', int),
+    ('band', 'Band', None),
+    ('transcript_count', 'Transcript count', int),
+    ('type', 'Gene Biotype', None),
+    ('status', 'Status (gene)', None),
+)
+
+UPDATE_BATCH_SIZE = 1000
+
+def gene_hash(values):
+    '''This function returns a digest of the annotation fields of a gene, given in the order of **ENSEMBL_GENE_COLUMNS**.
+
+    Empty values and None hash the same, so a row from a file can be compared with a row from the database.
+    '''
+
+    text = u'\t'.join(u'' if value is None else unicode(value) for value in values)
+    return hashlib.md5(text.encode('utf-8')).digest()
+
+def parse_ensembl_genes(lines):
+    '''This generator parses the lines of a biomart gene annotation file into dictionaries of :class:`~genes.models.Gene` field values.
+
+    Empty cells are converted to None and rows without a gene name are skipped.
+    A ValueError giving the line number is raised for a row with too few columns or an invalid value.
+    '''
+
+    reader = csv.DictReader(lines, delimiter='\t')
+    for row in reader:
+        gene = {}
+        for field, column, convert in ENSEMBL_GENE_COLUMNS:
+            if row.get(column) is None:
+                raise ValueError("Line %i: missing column %s" % (reader.line_num, column))
+            value = row[column].decode('utf-8').strip()
+            try:
+                gene[field] = convert(value) if convert and value else value or None
+            except ValueError:
+                raise ValueError("Line %i: invalid value %r in column %s" % (reader.line_num, value, column))
+        if gene['name']:
+            yield gene
+
+def update_genes(source):
+    '''This function creates or updates :class:`~genes.models.Gene` objects from a biomart gene annotation file.
+
+    The source is either a filename or an iterable of lines.
+    Each row is hashed and compared with a hash of the stored gene, so only new and changed genes are written.
+    New genes are inserted in batches and changed genes updated in transactions of **UPDATE_BATCH_SIZE** genes.
+    If a gene name occurs more than once the last row is used.
+    Returns a summary of the changes.
+    '''
+
+    if isinstance(source, basestring):
+        with open(source, 'r') as inputfile:
+            return update_genes(inputfile)
+
+    fields = [field for field, column, convert in ENSEMBL_GENE_COLUMNS]
+    stored = dict((values[0], gene_hash(values[1:])) for values in Gene.objects.values_list(*fields).iterator())
+    new_genes = {}
+    changed_genes = {}
+    unchanged_genes = set()
+    for gene in parse_ensembl_genes(source):
+        digest = gene_hash([gene[field] for field in fields[1:]])
+        if gene['name'] not in stored:
+            new_genes[gene['name']] = gene
+        elif stored[gene['name']] != digest:
+            changed_genes[gene['name']] = gene
+            unchanged_genes.discard(gene['name'])
+        else:
+            changed_genes.pop(gene['name'], None)
+            unchanged_genes.add(gene['name'])
+
+    with transaction.commit_on_success():
+        bulk_insert(Gene, [Gene(**gene) for gene in new_genes.values()])
+    for genes in batches(changed_genes.values(), UPDATE_BATCH_SIZE):
+        with transaction.commit_on_success():
+            for gene in genes:
+                Gene.objects.filter(pk=gene['name']).update(**gene)
+    if new_genes or changed_genes:
+        invalidate_gene_search()
+    invalidate_genes(changed_genes.keys())
+    return "Created %i genes and updated %i genes, %i genes were unchanged." % (
+        len(new_genes), len(changed_genes), len(unchanged_genes))
@@ -1,23 +1,104 @@
 """
 This package contains the views for the :mod:`~genes` app.
 
-The only view in this package currently is :class:`~genes.models.GeneDetail`
+The views in this package are :class:`~genes.views.GeneDetail`, the :class:`~genes.views.GeneAutocomplete` JSON search
+and the :class:`~genes.views.GeneRegion` JSON region query.
 """
 
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.views.generic.base import View
 from django.views.generic.detail import DetailView
 
 from braces.views import LoginRequiredMixin 
 
 from genes.models import Gene
+from genes.search import search_genes
+from genes.regions import region_index, parse_region
+from data.cache import CachedResponseMixin, gene_version_key, experiment_version_key
+from data.models import GeneExperimentData
+from data.utilities import batches
+from data.queries import get_experiment, encode_json
 
-class GeneDetail(LoginRequiredMixin,DetailView):
+class GeneDetail(LoginRequiredMixin, CachedResponseMixin, DetailView):
     '''This view generates a page with details about a :class:`~genes.models.Gene`.
     
     This view is restricted to logged in users
     This view passes a gene object to the gene-detail.html template.
+    The :class:`~data.models.GeneExperimentData` for the gene in every experiment are passed as expression_data.
+    The page is cached until the gene or any experiment with data for it changes, see :mod:`data.cache`.
     '''
 
     model = Gene
     slug_field = 'name'
     context_object_name = 'gene'
     template_name = 'gene-detail.html'
+
+    def get_cache_versions(self):
+        '''The page shows the gene and its data in each experiment, which are found from the (gene, experiment) index without reading the data.'''
+        experiments = GeneExperimentData.objects.filter(gene=self.kwargs['slug']).values_list('experiment_type', 'experiment_id').distinct()
+        return [gene_version_key(self.kwargs['slug'])] + [experiment_version_key(*experiment) for experiment in sorted(experiments)]
+
+    def get_context_data(self, **kwargs):
+        '''Adds the expression data for this gene.
+
+        The experiments are prefetched with one query per experiment type, so the number of queries does not depend on the number of experiments.
+        '''
+        context = super(GeneDetail, self).get_context_data(**kwargs)
+        context['expression_data'] = GeneExperimentData.objects.for_gene(self.object).select_related('comparison').prefetch_related('experiment')
+        return context
+
+class GeneAutocomplete(View):
+    '''This view returns the genes best matching a query as JSON, for completing gene names as they are typed.
+
+    The query is the **q** parameter and the number of genes the optional **limit** parameter, up to 50.
+    Each gene is an object with its name, ensemblID and url, see :func:`~genes.search.search_genes`.
+    '''
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.GET.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        genes = [{'name': name, 'ensemblID': ensembl_id, 'url': reverse('gene-details', kwargs={'slug': name})}
+            for name, ensembl_id in search_genes(request.GET.get('q', ''), limit)]
+        return HttpResponse(encode_json(genes), content_type='application/json')
+
+class GeneRegion(LoginRequiredMixin, View):
+    '''This view returns the genes in a chromosomal region, or nearest to a position, as JSON, see :mod:`genes.regions`.
+
+    The **region** parameter is a region such as chr7:10,000,000-12,000,000, and the genes overlapping it are returned in order of their start.
+    Alternatively the **position** parameter is a position such as chr7:10,000,000, and the **count** (default 1, up to 100) nearest genes are returned with their distance.
+    If an **experiment** id is given, each gene includes its expression data in that experiment,
+    which is a mRNA-Seq experiment unless **experiment_type** is microarrayexperiment.
+    This view is restricted to logged in users.
+    '''
+
+    EXPRESSION_FIELDS = ('fold_change', 'p_value', 'q_value', 'amount_1', 'amount_2', 'significant')
+
+    def get(self, request, *args, **kwargs):
+        try:
+            if 'position' in request.GET:
+                chromosome, position, end = parse_region(request.GET['position'])
+                count = min(max(int(request.GET.get('count', 1)), 1), 100)
+                genes = region_index().nearest(chromosome, position, count)
+                result = {'chromosome': chromosome, 'position': position, 'genes': genes}
+            else:
+                chromosome, start, end = parse_region(request.GET.get('region', ''))
+                genes = region_index().region(chromosome, start, end)
+                result = {'chromosome': chromosome, 'start': start, 'end': end, 'genes': genes}
+            if request.GET.get('experiment'):
+                self.add_expression(genes, request.GET.get('experiment_type', 'mrnaseqexperiment'), request.GET['experiment'])
+        except (ValueError, KeyError), error:
+            return HttpResponseBadRequest(encode_json({'error': error.args[0]}), content_type='application/json')
+        return HttpResponse(encode_json(result), content_type='application/json')
+
+    def add_expression(self, genes, experiment_type, experiment_id):
+        '''Adds the :class:`~data.models.GeneExperimentData` of the experiment for each gene as its expression, or None if there is none.'''
+        experiment = get_experiment(experiment_type, experiment_id)
+        expression = {}
+        for names in batches([gene['name'] for gene in genes], 500):
+            for datum in GeneExperimentData.objects.for_experiment(experiment).filter(gene__in=names).values('gene', *self.EXPRESSION_FIELDS):
+                expression.setdefault(datum.pop('gene'), datum)
+        for gene in genes:
+            gene['expression'] = expression.get(gene['name'])